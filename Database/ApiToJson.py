@@ -1,81 +1,269 @@
-import requests
-import json
-
-
-API_BASE_URL = "https://api-oa.com/api/v2/project/api-dev-oa/"
-API_KEY = "yourtest-outdoora-ctiveapi"
-
-
-def fetch_ids():
-    endpoint = "contents"
-    params = {
-        "key": API_KEY,
-        "format": "json",
-        "type": "tour",
-        "typeFields": "id",
-        "count": 100000,
-        "startIndex": 0
-    }
-
-    all_ids = []
-    while True:
-        print(f"Fetching IDs starting at index {params['startIndex']}...")
-        url = f"{API_BASE_URL}{endpoint}"
-        response = requests.get(url, params=params)
-
-        if response.status_code != 200:
-            print(f"Failed to fetch IDs: {response.status_code}, {response.text}")
-            break
-
-        data = response.json()
-        if "answer" in data and "contents" in data["answer"]:
-            ids = [item["id"] for item in data["answer"]["contents"]]
-            all_ids.extend(ids)
-
-            if len(ids) < params["count"]:  # No more IDs to fetch
-                break
-            params["startIndex"] += params["count"]  # Increment pagination index
-        else:
-            print("No more data or an error occurred.")
-            break
-
-    return all_ids
-
-def fetch_verbose_details(ids):
-    endpoint = f"contents/{','.join(ids)}"
-    params = {
-        "key": API_KEY,
-        "format": "json",
-        "display": "verbose",
-        "lang": "en"
-    }
-    url = f"{API_BASE_URL}{endpoint}"
-    response = requests.get(url, params=params)
-
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(f"Failed to fetch details: {response.status_code}, {response.text}")
-        return None
-
-def main():
-    all_ids = fetch_ids()
-    print(f"Total IDs fetched: {len(all_ids)}")
-
-    all_data = {"answer": {"contents": []}}
-
-    batch_size = 50
-    for i in range(0, len(all_ids), batch_size):
-        batch_ids = all_ids[i:i + batch_size]
-        print(f"Fetching details for IDs: {batch_ids}")
-        data = fetch_verbose_details(batch_ids)
-        if data and "answer" in data and "contents" in data["answer"]:
-            all_data["answer"]["contents"].extend(data["answer"]["contents"])
-
-    # Save the combined data to a JSON file
-    with open("response.json", "w", encoding="utf-8") as file:
-        json.dump(all_data, file, ensure_ascii=False, indent=4)
-    print("All data has been saved to response.json")
-
-if __name__ == "__main__":
-    main()
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+
+import httpx
+
+from TourStream import append_tours, open_text
+
+
+API_BASE_URL = os.getenv("OUTDOORACTIVE_API_BASE_URL", "https://api-oa.com/api/v2/project/api-dev-oa/")
+API_KEY = os.getenv("OUTDOORACTIVE_API_KEY", "yourtest-outdoora-ctiveapi")
+
+BATCH_SIZE = 50          # ids per detail request
+CONCURRENCY = 8          # detail requests in flight
+RATE_LIMIT = 5.0         # requests per second, 0 disables the limit
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5       # seconds, doubled per attempt with full jitter
+BACKOFF_CAP = 30.0
+TIMEOUT = 60.0
+
+CHECKPOINT_DIR = "crawl_checkpoint"
+OUTPUT_FILE = "response.jsonl"
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Spaces requests evenly so that at most `rate` start per second.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        async with self.lock:
+            now = loop.time()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        await asyncio.sleep(slot - now)
+
+
+class Crawler:
+    """
+    Fetches all tour ids and then their verbose details in batches, with a pooled HTTP client,
+    bounded concurrency, a rate limit and retries. Every finished batch is appended to the JSONL
+    output and logged with the output size in the checkpoint directory, so a rerun cuts off a
+    half-written batch and only fetches the batches that are still missing.
+    """
+
+    def __init__(self, base_url=API_BASE_URL, api_key=API_KEY, output_file=OUTPUT_FILE,
+                 checkpoint_dir=CHECKPOINT_DIR, batch_size=BATCH_SIZE, concurrency=CONCURRENCY,
+                 rate_limit=RATE_LIMIT, max_retries=MAX_RETRIES, timeout=TIMEOUT):
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.api_key = api_key
+        self.output_file = output_file
+        self.checkpoint_dir = checkpoint_dir
+        self.progress_path = os.path.join(checkpoint_dir, "progress.jsonl")
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate_limit)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.client = None
+        self.requests = 0
+        self.retries = 0
+
+    def create_client(self):
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        return httpx.AsyncClient(timeout=self.timeout, limits=limits)
+
+    async def get_json(self, endpoint, params):
+        """
+        GET with retries on connection errors, timeouts, 429 and 5xx. Honors Retry-After.
+        """
+        url = f"{self.base_url}{endpoint}"
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.wait()
+            self.requests += 1
+            retry_after = None
+            try:
+                response = await self.client.get(url, params={"key": self.api_key, "format": "json", **params})
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code not in RETRY_STATUS:
+                    raise RuntimeError(f"{url} failed: {response.status_code}, {response.text[:200]}")
+                error = f"status {response.status_code}"
+                retry_after = response.headers.get("Retry-After")
+            except (httpx.TransportError, ValueError) as e:
+                error = f"{type(e).__name__}: {e}"
+
+            if attempt == self.max_retries:
+                raise RuntimeError(f"{url} failed after {attempt + 1} attempts ({error})")
+            delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            self.retries += 1
+            print(f"Retrying {endpoint[:60]} in {delay:.1f}s after {error}")
+            await asyncio.sleep(delay)
+
+    async def list_contents(self, type_fields):
+        """
+        Page through all tours, returning the requested `type_fields` of each.
+        Raises RuntimeError on a malformed page, a silently shortened listing would make
+        DeltaSync tombstone every tour it does not name.
+        """
+        page_size = 100000
+        params = {"type": "tour", "typeFields": type_fields, "count": page_size, "startIndex": 0}
+
+        items = []
+        while True:
+            print(f"Fetching IDs starting at index {params['startIndex']}...")
+            data = await self.get_json("contents", params)
+            answer = data.get("answer") if isinstance(data, dict) else None
+            if not isinstance(answer, dict) or not isinstance(answer.get("contents"), list):
+                raise RuntimeError(f"Malformed listing page at index {params['startIndex']}: {str(data)[:200]}")
+            page = answer["contents"]
+            if not page:  # No more IDs to fetch
+                break
+            items.extend(page)
+            # The API may cap `count`, so a short page does not mean the listing is complete
+            params = {**params, "startIndex": params["startIndex"] + len(page)}
+        return items
+
+    async def fetch_ids(self):
+        return [item["id"] for item in await self.list_contents("id")]
+
+    async def fetch_verbose_details(self, ids):
+        data = await self.get_json(f"contents/{','.join(ids)}", {"display": "verbose", "lang": "en"})
+        return data.get("answer", {}).get("contents", [])
+
+    def load_manifest(self):
+        """
+        The id list and batch size are checkpointed too, so batch numbers mean the same ids on every run.
+        """
+        path = os.path.join(self.checkpoint_dir, "manifest.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+        self.batch_size = manifest["batch_size"]
+        return manifest["ids"]
+
+    def save_manifest(self, ids):
+        write_atomic(os.path.join(self.checkpoint_dir, "manifest.json"), {"batch_size": self.batch_size, "ids": ids})
+
+    def load_progress(self):
+        """
+        Completed batches, with the output truncated to the end of the last one that was logged.
+        """
+        done, offset = set(), 0
+        if os.path.exists(self.progress_path):
+            with open(self.progress_path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        done.add(entry["batch"])
+                        offset = max(offset, entry["offset"])
+        if done and not os.path.exists(self.output_file):
+            raise RuntimeError(f"{self.output_file} is missing, rerun with --fresh to start over")
+        if os.path.exists(self.output_file) and os.path.getsize(self.output_file) > offset:
+            with open(self.output_file, "r+b") as file:
+                file.truncate(offset)
+        return done
+
+    async def crawl_batch(self, index, ids):
+        contents = await self.fetch_verbose_details(ids)
+        # No await from here on, so batches from other workers cannot interleave
+        with open_text(self.output_file, "a") as file:
+            append_tours(file, contents)
+        with open(self.progress_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps({"batch": index, "offset": os.path.getsize(self.output_file)}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        return len(contents)
+
+    async def run(self):
+        """
+        Crawl everything that is not checkpointed yet. Returns the number of failed and of all batches.
+        """
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        async with self.create_client() as client:
+            self.client = client
+
+            all_ids = self.load_manifest()
+            if all_ids is None:
+                all_ids = await self.fetch_ids()
+                self.save_manifest(all_ids)
+            print(f"Total IDs fetched: {len(all_ids)}")
+
+            batches = [all_ids[i:i + self.batch_size] for i in range(0, len(all_ids), self.batch_size)]
+            done = self.load_progress()
+            pending = asyncio.Queue()
+            for index in range(len(batches)):
+                if index not in done:
+                    pending.put_nowait(index)
+            print(f"{len(done)} of {len(batches)} batches already done, fetching {pending.qsize()}")
+
+            failed = []
+            finished = len(done)
+
+            async def worker():
+                nonlocal finished
+                while not pending.empty():
+                    index = pending.get_nowait()
+                    try:
+                        count = await self.crawl_batch(index, batches[index])
+                    except Exception as e:
+                        print(f"Batch {index} failed: {e}")
+                        failed.append(index)
+                        continue
+                    finished += 1
+                    print(f"Batch {index} done ({count} tours), {finished}/{len(batches)}")
+
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+        print(f"{self.requests} requests, {self.retries} retries, {len(failed)} failed batches")
+        return len(failed), len(batches)
+
+
+def write_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl all Outdooractive tours into a JSONL file (resumable)")
+    parser.add_argument("--base-url", default=API_BASE_URL)
+    parser.add_argument("--api-key", default=API_KEY)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--gzip", action="store_true", help="gzip-compress the output (adds .gz)")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT, help="requests per second, 0 = unlimited")
+    parser.add_argument("--max-retries", type=int, default=MAX_RETRIES)
+    parser.add_argument("--fresh", action="store_true", help="discard the checkpoint and start over")
+    args = parser.parse_args()
+
+    output_file = args.output + ".gz" if args.gzip and not args.output.endswith(".gz") else args.output
+    if args.fresh:
+        if os.path.exists(args.checkpoint_dir):
+            shutil.rmtree(args.checkpoint_dir)
+        if os.path.exists(output_file):
+            os.remove(output_file)
+
+    crawler = Crawler(base_url=args.base_url, api_key=args.api_key, output_file=output_file,
+                      checkpoint_dir=args.checkpoint_dir, batch_size=args.batch_size, concurrency=args.concurrency,
+                      rate_limit=args.rate_limit, max_retries=args.max_retries)
+    failed, batch_count = asyncio.run(crawler.run())
+    if failed:
+        print(f"{failed} of {batch_count} batches failed, run again to resume from the checkpoint")
+        sys.exit(1)
+    print(f"All data has been saved to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
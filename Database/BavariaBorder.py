@@ -0,0 +1,129 @@
+import json
+import os
+
+import numpy as np
+
+# Region test for tour start points: an SQLite R*Tree over (point_lon, point_lat) narrows the
+# tours down to the bounding box of the state, then a point-in-polygon test against the bundled
+# border (bavaria_border.geojson, lon/lat) drops what lies in Baden-Württemberg, Austria etc.
+# The test is only as exact as that border: it is a simplified, hand-digitised outline (about 1 km
+# along the Czech border and the Salzach/Inn, a few kilometres elsewhere), so start points closer to
+# the border than that can land on the wrong side. Swap in an official outline for exact results.
+
+BORDER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bavaria_border.geojson")
+
+POINT_INDEX = "tour_points"
+
+# The R*Tree is keyed by tours.rowid and kept current by triggers, so upserts need no extra step
+POINT_INDEX_SQL = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {POINT_INDEX} USING rtree(id, min_lon, max_lon, min_lat, max_lat);
+    CREATE TRIGGER IF NOT EXISTS {POINT_INDEX}_insert AFTER INSERT ON tours
+    WHEN new.point_lon IS NOT NULL AND new.point_lat IS NOT NULL BEGIN
+        INSERT OR REPLACE INTO {POINT_INDEX} VALUES (new.rowid, new.point_lon, new.point_lon, new.point_lat, new.point_lat);
+    END;
+    CREATE TRIGGER IF NOT EXISTS {POINT_INDEX}_update AFTER UPDATE OF point_lon, point_lat ON tours BEGIN
+        DELETE FROM {POINT_INDEX} WHERE id = old.rowid;
+        INSERT INTO {POINT_INDEX} SELECT new.rowid, new.point_lon, new.point_lon, new.point_lat, new.point_lat
+        WHERE new.point_lon IS NOT NULL AND new.point_lat IS NOT NULL;
+    END;
+    CREATE TRIGGER IF NOT EXISTS {POINT_INDEX}_delete AFTER DELETE ON tours BEGIN
+        DELETE FROM {POINT_INDEX} WHERE id = old.rowid;
+    END;
+"""
+
+CHUNK_SIZE = 5000  # points tested per NumPy call
+
+
+def load_border(path=BORDER_FILE):
+    """
+    The outer ring of the border as an (n, 2) array of lon/lat.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    geometry = data.get("geometry", data)
+    return np.asarray(geometry["coordinates"][0], dtype=np.float64)
+
+
+BORDER = load_border()
+LON_MIN, LAT_MIN = BORDER.min(axis=0)
+LON_MAX, LAT_MAX = BORDER.max(axis=0)
+
+
+def points_in_polygon(lons, lats, polygon=BORDER):
+    """
+    Even-odd ray casting for many points at once: one vectorised pass per polygon edge.
+    """
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    inside = np.zeros(lons.shape, dtype=bool)
+    x1, y1 = polygon[-1]
+    for x2, y2 in polygon:
+        if y1 != y2:
+            crosses = (y1 > lats) != (y2 > lats)
+            x_at_lat = x1 + (lats - y1) * (x2 - x1) / (y2 - y1)
+            inside ^= crosses & (lons < x_at_lat)
+        x1, y1 = x2, y2
+    return inside
+
+
+def has_point_index(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (POINT_INDEX,)).fetchone() is not None
+
+
+def create_point_index(conn):
+    """
+    Create the R*Tree and its triggers if missing and fill it from the tours table.
+    """
+    exists = has_point_index(conn)
+    conn.executescript(POINT_INDEX_SQL)
+    if not exists:
+        conn.execute(f"""
+            INSERT INTO {POINT_INDEX}
+            SELECT rowid, point_lon, point_lon, point_lat, point_lat FROM tours
+            WHERE point_lon IS NOT NULL AND point_lat IS NOT NULL
+        """)
+
+
+def drop_point_index(conn):
+    for trigger in ("insert", "update", "delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {POINT_INDEX}_{trigger}")
+    conn.execute(f"DROP TABLE IF EXISTS {POINT_INDEX}")
+
+
+def select_in_bbox(conn, columns="tours.*"):
+    """
+    Cursor over the tours whose start point lies in the bounding box of the border, via the R*Tree.
+    Tours tombstoned by DeltaSync (deleted_at set in tour_sync) are left out.
+    """
+    synced = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tour_sync'").fetchone()
+    active = """
+        LEFT JOIN tour_sync ON tour_sync.tour_id = tours.id
+        WHERE tour_sync.deleted_at IS NULL AND""" if synced else "WHERE"
+    return conn.execute(f"""
+        SELECT {columns} FROM {POINT_INDEX}
+        JOIN tours ON tours.rowid = {POINT_INDEX}.id
+        {active} min_lon >= ? AND max_lon <= ? AND min_lat >= ? AND max_lat <= ?
+    """, (LON_MIN, LON_MAX, LAT_MIN, LAT_MAX))
+
+
+def filter_points(items, lon_of, lat_of, chunk_size=CHUNK_SIZE):
+    """
+    Yield the items (rows, tours, ...) whose point lies inside the border, tested a chunk at a time.
+    Items without coordinates are dropped.
+    """
+    chunk = []
+    for item in items:
+        if lon_of(item) is not None and lat_of(item) is not None:
+            chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield from _inside(chunk, lon_of, lat_of)
+            chunk = []
+    if chunk:
+        yield from _inside(chunk, lon_of, lat_of)
+
+
+def _inside(chunk, lon_of, lat_of):
+    lons = np.fromiter((lon_of(item) for item in chunk), dtype=np.float64, count=len(chunk))
+    lats = np.fromiter((lat_of(item) for item in chunk), dtype=np.float64, count=len(chunk))
+    mask = points_in_polygon(lons, lats)
+    return (item for item, keep in zip(chunk, mask) if keep)
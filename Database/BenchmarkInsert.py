@@ -0,0 +1,107 @@
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import BetterJsonToDb
+from BavariaBorder import create_point_index
+from MockOutdooractiveApi import make_tour
+
+# Rows/second of BetterJsonToDb.insert_data against the previous row-by-row insert, into a fresh
+# database and into one that already has the R*Tree of the start points (and its triggers):
+#   python BenchmarkInsert.py --tours 50000
+# Loading rows and rebuilding the R*Tree are reported separately.
+
+
+def insert_row_by_row(tours, db_name):
+    """
+    The previous load path: one execute per tour, property and region, a progress line every
+    1000 tours, default pragmas and a single commit.
+    """
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    progress = open(os.devnull, "w")
+    for idx, tour in enumerate(tours, start=1):
+        if idx % 1000 == 0:
+            print(f"Inserting tour {idx} with ID: {tour['id']}", file=progress)
+        cursor.execute(BetterJsonToDb.INSERT_TOUR, BetterJsonToDb.tour_row(BetterJsonToDb.transform_tour(tour)))
+        for row in BetterJsonToDb.property_rows(tour):
+            cursor.execute(BetterJsonToDb.INSERT_PROPERTY, row)
+        for row in BetterJsonToDb.region_rows(tour):
+            cursor.execute(BetterJsonToDb.INSERT_REGION, row)
+    conn.commit()
+    conn.close()
+    progress.close()
+    return {}
+
+
+def insert_chunked(chunk_size):
+    def load(tours, db_name):
+        sink = BetterJsonToDb.SqliteSink(db_name)
+        BetterJsonToDb.insert_data(tours, chunk_size=chunk_size, sink=sink)
+        return {"index": sink.timings["index"]}
+    return load
+
+
+def add_point_index(db_name):
+    conn = sqlite3.connect(db_name)
+    with conn:
+        create_point_index(conn)
+    conn.close()
+
+
+def count_rows(db_name):
+    conn = sqlite3.connect(db_name)
+    rows = sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+               for table in ("tours", "tour_properties", "tour_regions"))
+    conn.close()
+    return rows
+
+
+def run(name, load, tours, directory, repeat, point_index=False):
+    """
+    Best of `repeat` loads into a fresh database each, optionally with the R*Tree created up front.
+    """
+    best = None
+    for attempt in range(repeat):
+        db_name = os.path.join(directory, f"{name}-{attempt}.db")
+        BetterJsonToDb.create_or_update_tables(db_name)
+        if point_index:
+            add_point_index(db_name)
+        started = time.perf_counter()
+        phases = load(iter(tours), db_name)
+        seconds = time.perf_counter() - started
+        if best is None or seconds < best[0]:
+            best = (seconds, phases.get("index", 0.0))
+    rows = count_rows(db_name)
+    seconds, index = best
+    print(f"{name:>16}: {rows} rows in {seconds:.2f}s, {rows / seconds:,.0f} rows/s"
+          + (f" ({seconds - index:.2f}s loading, {index:.2f}s rebuilding the R*Tree)" if index else ""))
+    return rows / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark insert_data against row-by-row inserts")
+    parser.add_argument("--tours", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=BetterJsonToDb.CHUNK_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dir", default=".", help="where the benchmark databases are created")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    tours = [make_tour(str(10 ** 8 + i), rng) for i in range(args.tours)]
+    chunked_load = insert_chunked(args.chunk_size)
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        baseline = run("row-by-row", insert_row_by_row, tours, directory, args.repeat)
+        chunked = run("chunked", chunked_load, tours, directory, args.repeat)
+        baseline_indexed = run("row-by-row+rtree", insert_row_by_row, tours, directory, args.repeat, True)
+        chunked_indexed = run("chunked+rtree", chunked_load, tours, directory, args.repeat, True)
+    print(f"insert_data against row-by-row: {chunked / baseline:.2f}x into a fresh database, "
+          f"{chunked_indexed / baseline_indexed:.2f}x with the R*Tree in place")
+
+
+if __name__ == "__main__":
+    main()
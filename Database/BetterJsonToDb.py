@@ -1,236 +1,288 @@
-import sqlite3
-import json
-
-DB_NAME = "outdooractive_data.db"
-
-LAT_MIN = 47.2701
-LAT_MAX = 50.5647
-LON_MIN = 8.9767
-LON_MAX = 13.839
-
-def create_or_update_tables():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tours (
-            id TEXT PRIMARY KEY,
-            title TEXT,
-            teaser_text TEXT,
-            description_short TEXT,
-            description_long TEXT,
-            category_name TEXT,
-            category_id TEXT,
-            difficulty INTEGER,
-            landscape_rating INTEGER,
-            experience_rating INTEGER,
-            stamina_rating INTEGER,
-            length INTEGER,
-            ascent INTEGER,
-            descent INTEGER,
-            duration_min FLOAT,
-            min_altitude INTEGER,
-            max_altitude INTEGER,
-            point_lat REAL,
-            point_lon REAL,
-            is_winter BOOLEAN,
-            is_closed BOOLEAN,
-            primary_region TEXT,
-            season TEXT,
-            primary_image_id TEXT,
-            image_ids TEXT,
-            publicTransportFriendly BOOLEAN
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tour_properties (
-            tour_id TEXT,
-            property_name TEXT,
-            property_title TEXT,
-            property_icon_url TEXT,
-            PRIMARY KEY (tour_id, property_name)
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tour_regions (
-            tour_id TEXT,
-            region_id TEXT,
-            region_type TEXT,
-            PRIMARY KEY (tour_id, region_id)
-        )
-    """)
-
-    conn.commit()
-    conn.close()
-
-def insert_data(data):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    for idx, tour in enumerate(data["answer"]["contents"], start=1):
-        print(f"Inserting tour {idx}/{len(data['answer']['contents'])} with ID: {tour['id']}")
-
-        tour_id = tour["id"]
-        title = tour.get("title", "N/A")
-        teaser_text = tour.get("teaserText", "N/A")
-        description_short = tour.get("texts", {}).get("short", "N/A")
-        description_long = tour.get("texts", {}).get("long", "N/A")
-        category_name = tour.get("category", {}).get("title", "N/A")
-        category_id = tour.get("category", {}).get("id", "N/A")
-        difficulty = tour.get("ratingInfo", {}).get("difficulty", None)
-        landscape_rating = tour.get("ratingInfo", {}).get("landscape", None)
-        experience_rating = tour.get("ratingInfo", {}).get("experience", None)
-        length = tour.get("metrics", {}).get("length", None)
-        ascent = tour.get("metrics", {}).get("elevation", {}).get("ascent", None)
-        descent = tour.get("metrics", {}).get("elevation", {}).get("descent", None)
-        duration_min = tour.get("metrics", {}).get("duration", {}).get("minimal", None)
-        min_altitude = tour.get("metrics", {}).get("elevation", {}).get("minAltitude", None)
-        max_altitude = tour.get("metrics", {}).get("elevation", {}).get("maxAltitude", None)
-        point_lat = tour.get("point", [None, None])[1]
-        point_lon = tour.get("point", [None, None])[0]
-        is_winter = tour.get("isWinter", False)
-        is_closed = tour.get("isClosedByClosure", False)
-        primary_region = tour.get("primaryRegion", {}).get("title", "N/A")
-        stamina_rating = tour.get("ratingInfo", {}).get("stamina", None)
-        season = json.dumps(tour.get("season", []))
-        primary_image_id = tour.get("primaryImage", {}).get("id", None)
-        image_ids = json.dumps([image.get("id") for image in tour.get("images", []) if image.get("id") != primary_image_id])
-        public_transport_friendly = "publicTransportFriendly" in tour.get("labels", [])
-
-        cursor.execute("""
-            INSERT OR IGNORE INTO tours (
-                id, title, teaser_text, description_short, description_long, category_name, category_id, 
-                difficulty, landscape_rating, experience_rating, stamina_rating, length, ascent, descent, 
-                duration_min, min_altitude, max_altitude, point_lat, point_lon, is_winter, is_closed, 
-                primary_region, season, primary_image_id, image_ids, publicTransportFriendly
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            tour_id, title, teaser_text, description_short, description_long, category_name, category_id,
-            difficulty, landscape_rating, experience_rating, stamina_rating, length, ascent, descent,
-            duration_min, min_altitude, max_altitude, point_lat, point_lon, is_winter, is_closed,
-            primary_region, season, primary_image_id, image_ids, public_transport_friendly
-        ))
-
-        for prop in tour.get("properties", []):
-            property_name = prop.get("name", "N/A")
-            property_title = prop.get("title", "N/A")
-            property_icon_url = prop.get("iconUrl", None)
-            cursor.execute("""
-                INSERT OR IGNORE INTO tour_properties (
-                    tour_id, property_name, property_title, property_icon_url
-                ) VALUES (?, ?, ?, ?)
-            """, (
-                tour_id, property_name, property_title, property_icon_url
-            ))
-
-        for region in tour.get("regions", []):
-            region_id = region.get("id", "N/A")
-            region_type = region.get("type", "N/A")
-            cursor.execute("""
-                INSERT OR IGNORE INTO tour_regions (
-                    tour_id, region_id, region_type
-                ) VALUES (?, ?, ?)
-            """, (
-                tour_id, region_id, region_type
-            ))
-
-    conn.commit()
-    conn.close()
-    print(f"Successfully inserted {len(data['answer']['contents'])} tours into the database.")
-
-def extract_images(tour):
-    primary_image_id = tour.get("primaryImage", {}).get("id", None)
-    image_ids = [image.get("id") for image in tour.get("images", []) if image.get("id") != primary_image_id]
-    return primary_image_id, image_ids
-
-def write_updated_json(data, jsonl=False):
-    updated_data = {"tours": []}
-    for tour in data["answer"]["contents"]:
-        primary_image_id, image_ids = extract_images(tour)
-        public_transport_friendly = "publicTransportFriendly" in tour.get("labels", [])
-
-        tour_data = {
-            "id": tour["id"],
-            "title": tour.get("title", "N/A"),
-            "teaser_text": tour.get("teaserText", "N/A"),
-            "description_short": tour.get("texts", {}).get("short", "N/A"),
-            "description_long": tour.get("texts", {}).get("long", "N/A"),
-            "category_name": tour.get("category", {}).get("title", "N/A"),
-            "category_id": tour.get("category", {}).get("id", "N/A"),
-            "difficulty": tour.get("ratingInfo", {}).get("difficulty", None),
-            "landscape_rating": tour.get("ratingInfo", {}).get("landscape", None),
-            "experience_rating": tour.get("ratingInfo", {}).get("experience", None),
-            "stamina_rating": tour.get("ratingInfo", {}).get("stamina", None),
-            "length": tour.get("metrics", {}).get("length", None),
-            "ascent": tour.get("metrics", {}).get("elevation", {}).get("ascent", None),
-            "descent": tour.get("metrics", {}).get("elevation", {}).get("descent", None),
-            "duration_min": tour.get("metrics", {}).get("duration", {}).get("minimal", None),
-            "min_altitude": tour.get("metrics", {}).get("elevation", {}).get("minAltitude", None),
-            "max_altitude": tour.get("metrics", {}).get("elevation", {}).get("maxAltitude", None),
-            "point_lat": tour.get("point", [None, None])[1],
-            "point_lon": tour.get("point", [None, None])[0],
-            "is_winter": tour.get("isWinter", False),
-            "is_closed": tour.get("isClosedByClosure", False),
-            "primary_region": tour.get("primaryRegion", {}).get("title", "N/A"),
-            "season": tour.get("season", []),
-            "primary_image_id": primary_image_id,
-            "image_ids": image_ids,
-            "publicTransportFriendly": public_transport_friendly
-        }
-        updated_data["tours"].append(tour_data)
-
-    if jsonl:
-        with open("updated.jsonl", "w", encoding="utf-8") as file:
-            for tour in updated_data["tours"]:
-                file.write(json.dumps(tour, ensure_ascii=False) + "\n")
-    else:
-        with open("updated.json", "w", encoding="utf-8") as file:
-            json.dump(updated_data, file, ensure_ascii=False, indent=4)
-
-def filter_and_write_bavaria_json(jsonl=False):
-    with open("updated.json", "r", encoding="utf-8") as file:
-        data = json.load(file)
-
-    bavaria_data = {"tours": []}
-    for tour in data["tours"]:
-        point_lat = tour.get("point_lat")
-        point_lon = tour.get("point_lon")
-        
-        if point_lat is not None and point_lon is not None and LAT_MIN <= point_lat <= LAT_MAX and LON_MIN <= point_lon <= LON_MAX:
-            bavaria_data["tours"].append(tour)
-
-    if jsonl:
-        with open("updatedBavaria.jsonl", "w", encoding="utf-8") as file:
-            for tour in bavaria_data["tours"]:
-                file.write(json.dumps(tour, ensure_ascii=False) + "\n")
-    else:
-        with open("updatedBavaria.json", "w", encoding="utf-8") as file:
-            json.dump(bavaria_data, file, ensure_ascii=False, indent=4)
-
-    print(f"Filtered data written to {'updatedBavaria.jsonl' if jsonl else 'updatedBavaria.json'} with {len(bavaria_data['tours'])} tours.")
-
-# Main function to convert JSON to SQLite
-def main():
-    print("Loading json")
-    with open("response.json", "r", encoding="utf-8") as file:
-        data = json.load(file)
-
-    # Uncomment to create or update tables
-    # create_or_update_tables()
-    # print("Inserting data into the database...")
-    # insert_data(data)
-
-    # Uncomment to write updated JSON
-    # print("Writing updated JSON...")
-    # write_updated_json(data, jsonl=False)  # Set jsonl=True to write in JSONL format
-
-    # Uncomment to Filter and write Bavaria JSON
-    print("Filtering and writing Bavaria JSON...")
-    filter_and_write_bavaria_json(jsonl=False)  # Set jsonl=True to write in JSONL format
-
-    print("Data has been successfully inserted into the database and updated JSON has been written.")
-
-if __name__ == "__main__":
-    main()
+import sqlite3
+import json
+import time
+from collections import namedtuple
+from contextlib import ExitStack, closing, contextmanager
+
+from BavariaBorder import create_point_index, drop_point_index, filter_points, has_point_index
+from TourStream import read_tours, write_tours
+
+DB_NAME = "outdooractive_data.db"
+CRAWL_FILE = "response.jsonl"  # written by ApiToJson.py, may be gzip-compressed (response.jsonl.gz)
+
+def create_or_update_tables(db_name=DB_NAME):
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tours (
+            id TEXT PRIMARY KEY,
+            title TEXT,
+            teaser_text TEXT,
+            description_short TEXT,
+            description_long TEXT,
+            category_name TEXT,
+            category_id TEXT,
+            difficulty INTEGER,
+            landscape_rating INTEGER,
+            experience_rating INTEGER,
+            stamina_rating INTEGER,
+            length INTEGER,
+            ascent INTEGER,
+            descent INTEGER,
+            duration_min FLOAT,
+            min_altitude INTEGER,
+            max_altitude INTEGER,
+            point_lat REAL,
+            point_lon REAL,
+            is_winter BOOLEAN,
+            is_closed BOOLEAN,
+            primary_region TEXT,
+            season TEXT,
+            primary_image_id TEXT,
+            image_ids TEXT,
+            publicTransportFriendly BOOLEAN
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tour_properties (
+            tour_id TEXT,
+            property_name TEXT,
+            property_title TEXT,
+            property_icon_url TEXT,
+            PRIMARY KEY (tour_id, property_name)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tour_regions (
+            tour_id TEXT,
+            region_id TEXT,
+            region_type TEXT,
+            PRIMARY KEY (tour_id, region_id)
+        )
+    """)
+
+    conn.commit()
+    conn.close()
+
+def extract_images(tour):
+    primary_image_id = tour.get("primaryImage", {}).get("id", None)
+    image_ids = [image.get("id") for image in tour.get("images", []) if image.get("id") != primary_image_id]
+    return primary_image_id, image_ids
+
+def transform_tour(tour):
+    """
+    Flatten one crawled tour into the columns of the tours table / the updated JSON.
+    """
+    primary_image_id, image_ids = extract_images(tour)
+    public_transport_friendly = "publicTransportFriendly" in tour.get("labels", [])
+    texts = tour.get("texts", {})
+    category = tour.get("category", {})
+    rating = tour.get("ratingInfo", {})
+    metrics = tour.get("metrics", {})
+    elevation = metrics.get("elevation", {})
+    point = tour.get("point", [None, None])
+
+    return {
+        "id": tour["id"],
+        "title": tour.get("title", "N/A"),
+        "teaser_text": tour.get("teaserText", "N/A"),
+        "description_short": texts.get("short", "N/A"),
+        "description_long": texts.get("long", "N/A"),
+        "category_name": category.get("title", "N/A"),
+        "category_id": category.get("id", "N/A"),
+        "difficulty": rating.get("difficulty", None),
+        "landscape_rating": rating.get("landscape", None),
+        "experience_rating": rating.get("experience", None),
+        "stamina_rating": rating.get("stamina", None),
+        "length": metrics.get("length", None),
+        "ascent": elevation.get("ascent", None),
+        "descent": elevation.get("descent", None),
+        "duration_min": metrics.get("duration", {}).get("minimal", None),
+        "min_altitude": elevation.get("minAltitude", None),
+        "max_altitude": elevation.get("maxAltitude", None),
+        "point_lat": point[1],
+        "point_lon": point[0],
+        "is_winter": tour.get("isWinter", False),
+        "is_closed": tour.get("isClosedByClosure", False),
+        "primary_region": tour.get("primaryRegion", {}).get("title", "N/A"),
+        "season": tour.get("season", []),
+        "primary_image_id": primary_image_id,
+        "image_ids": image_ids,
+        "publicTransportFriendly": public_transport_friendly
+    }
+
+TOUR_COLUMNS = [
+    "id", "title", "teaser_text", "description_short", "description_long", "category_name", "category_id",
+    "difficulty", "landscape_rating", "experience_rating", "stamina_rating", "length", "ascent", "descent",
+    "duration_min", "min_altitude", "max_altitude", "point_lat", "point_lon", "is_winter", "is_closed",
+    "primary_region", "season", "primary_image_id", "image_ids", "publicTransportFriendly"
+]
+
+JSON_COLUMN_INDEXES = [TOUR_COLUMNS.index("season"), TOUR_COLUMNS.index("image_ids")]
+
+def tour_row(tour_data):
+    """
+    Column values for the tours table, lists are stored as JSON text.
+    """
+    row = [tour_data[column] for column in TOUR_COLUMNS]
+    for index in JSON_COLUMN_INDEXES:
+        row[index] = json.dumps(row[index])
+    return tuple(row)
+
+def property_rows(tour):
+    return [
+        (tour["id"], prop.get("name", "N/A"), prop.get("title", "N/A"), prop.get("iconUrl", None))
+        for prop in tour.get("properties", [])
+    ]
+
+def region_rows(tour):
+    return [(tour["id"], region.get("id", "N/A"), region.get("type", "N/A")) for region in tour.get("regions", [])]
+
+# One transformed tour. The updated JSON text and the Bavaria flag are only filled in by the ETL (Etl.py)
+TourRecord = namedtuple("TourRecord", ["row", "properties", "regions", "json", "in_bavaria"], defaults=[None, None])
+
+def tour_record(tour):
+    return TourRecord(tour_row(transform_tour(tour)), property_rows(tour), region_rows(tour))
+
+INSERT_TOUR = f"INSERT OR IGNORE INTO tours ({', '.join(TOUR_COLUMNS)}) VALUES ({', '.join('?' for _ in TOUR_COLUMNS)})"
+INSERT_PROPERTY = """
+    INSERT OR IGNORE INTO tour_properties (tour_id, property_name, property_title, property_icon_url)
+    VALUES (?, ?, ?, ?)
+"""
+INSERT_REGION = "INSERT OR IGNORE INTO tour_regions (tour_id, region_id, region_type) VALUES (?, ?, ?)"
+
+CHUNK_SIZE = 5000  # tours per transaction
+
+@contextmanager
+def load_pragmas(conn):
+    """
+    Skip the fsync of every chunk commit and use a 256 MB page cache while loading. This only saves
+    time where fsync is slow; a crashed load is simply rerun. The previous settings are restored afterwards.
+    WAL is left off, on a fresh database it writes every page twice.
+    """
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    try:
+        yield
+    finally:
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+        conn.execute(f"PRAGMA cache_size={cache_size}")
+
+class SqliteSink:
+    """
+    Chunked loader for the tours database. open() sets the load-time pragmas, every write() inserts
+    a chunk of TourRecords in one transaction. An existing R*Tree of the start points is dropped
+    for the load, its triggers would otherwise update it row by row, and rebuilt in close().
+    Databases without one get none, DbToBayerischeDb creates it when it is first needed.
+    The seconds spent loading rows and rebuilding the index are kept in `timings`.
+    Into a fresh database this is no faster than row-by-row inserts (the Python transform dominates
+    both), it only pays off when the R*Tree exists, see BenchmarkInsert.py.
+    """
+
+    def __init__(self, db_name=DB_NAME):
+        self.db_name = db_name
+        self.stack = ExitStack()
+        self.conn = None
+        self.count = 0
+        self.rebuild_point_index = False
+        self.timings = {"load": 0.0, "index": 0.0}
+
+    def open(self):
+        create_or_update_tables(self.db_name)
+        self.conn = self.stack.enter_context(closing(sqlite3.connect(self.db_name)))
+        self.stack.enter_context(load_pragmas(self.conn))
+        self.rebuild_point_index = has_point_index(self.conn)
+        if self.rebuild_point_index:
+            with self.conn:
+                drop_point_index(self.conn)
+
+    def write(self, records):
+        started = time.perf_counter()
+        with self.conn:
+            self.conn.executemany(INSERT_TOUR, (record.row for record in records))
+            self.conn.executemany(INSERT_PROPERTY, (row for record in records for row in record.properties))
+            self.conn.executemany(INSERT_REGION, (row for record in records for row in record.regions))
+        self.timings["load"] += time.perf_counter() - started
+        self.count += len(records)
+
+    def close(self):
+        with self.stack:
+            if self.rebuild_point_index:
+                print("Rebuilding the point index...")
+                started = time.perf_counter()
+                with self.conn:
+                    create_point_index(self.conn)
+                self.timings["index"] = time.perf_counter() - started
+        print(f"Successfully inserted {self.count} tours into {self.db_name} "
+              f"({self.timings['load']:.2f}s loading, {self.timings['index']:.2f}s rebuilding the point index).")
+
+    def abort(self):
+        self.stack.close()
+
+def insert_data(tours, db_name=DB_NAME, chunk_size=CHUNK_SIZE, sink=None):
+    """
+    Load a stream of crawled tours, e.g. read_tours("response.jsonl"), with executemany and one
+    transaction per `chunk_size` tours. Pass a SqliteSink to read its timings afterwards.
+    Returns the number of tours read.
+    """
+    sink = sink or SqliteSink(db_name)
+    sink.open()
+    try:
+        batch = []
+        for tour in tours:
+            batch.append(tour_record(tour))
+            if len(batch) >= chunk_size:
+                sink.write(batch)
+                batch = []
+                print(f"Inserted {sink.count} tours")
+        sink.write(batch)
+    except BaseException:
+        sink.abort()
+        raise
+    sink.close()
+    return sink.count
+
+def tours_file(name, jsonl=False, gzip=False):
+    """
+    File name of a tour export: name.json or name.jsonl, gzip-compressed with .gz appended.
+    """
+    return name + (".jsonl" if jsonl else ".json") + (".gz" if gzip else "")
+
+def write_updated_json(tours, jsonl=False, gzip=False):
+    """
+    Stream crawled tours into updated.json or, with jsonl=True, updated.jsonl.
+    """
+    output_file = tours_file("updated", jsonl, gzip)
+    count = write_tours(output_file, (transform_tour(tour) for tour in tours))
+    print(f"Updated data written to {output_file} with {count} tours.")
+    return output_file
+
+def bavaria_tours(tours):
+    """
+    The transformed tours whose start point lies inside the Bavarian border.
+    """
+    return filter_points(tours, lambda tour: tour.get("point_lon"), lambda tour: tour.get("point_lat"))
+
+def filter_and_write_bavaria_json(input_file=None, jsonl=False, gzip=False):
+    """
+    Stream the tours of `input_file` and keep those inside Bavaria. By default the input is the
+    file write_updated_json writes with the same `jsonl` and `gzip` flags.
+    """
+    input_file = input_file or tours_file("updated", jsonl, gzip)
+    output_file = tours_file("updatedBavaria", jsonl, gzip)
+    count = write_tours(output_file, bavaria_tours(read_tours(input_file)))
+    print(f"Filtered data written to {output_file} with {count} tours.")
+
+def main():
+    # The database, the updated JSON and the Bavaria subset are all written in one pass by Etl.py
+    from Etl import main as etl_main
+    etl_main()
+
+if __name__ == "__main__":
+    main()
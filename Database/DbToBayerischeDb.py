@@ -1,81 +1,62 @@
-import sqlite3
-
-# Geografische Grenzen von Bayern
-LAT_MIN = 47.2701
-LAT_MAX = 50.5647
-LON_MIN = 8.9767
-LON_MAX = 13.839
-
-
-input_db = "outdooractive_data.db"
-output_db = "filtered_data_bayern.db"
-
-def filter_data():
-
-    conn_in = sqlite3.connect(input_db)
-    cursor_in = conn_in.cursor()
-
-
-    conn_out = sqlite3.connect(output_db)
-    cursor_out = conn_out.cursor()
-    cursor_out.execute("""
-        CREATE TABLE IF NOT EXISTS tours (
-            id TEXT PRIMARY KEY,
-            title TEXT,
-            teaser_text TEXT,
-            description_short TEXT,
-            description_long TEXT,
-            category_name TEXT,
-            category_id TEXT,
-            difficulty INTEGER,
-            landscape_rating INTEGER,
-            experience_rating INTEGER,
-            length INTEGER,
-            ascent INTEGER,
-            descent INTEGER,
-            duration_min FLOAT,
-            min_altitude INTEGER,
-            max_altitude INTEGER,
-            point_lat REAL,
-            point_lon REAL,
-            is_winter BOOLEAN,
-            is_closed BOOLEAN,
-            primary_region TEXT
-        )
-    """)
-
-    
-    print("Lese Daten")
-    cursor_in.execute("SELECT * FROM tours")
-    rows = cursor_in.fetchall()
-
-
-    cursor_in.execute("PRAGMA table_info(tours)")
-    columns = [col[1] for col in cursor_in.fetchall()]
-    columns_str = ", ".join(columns)
-    placeholders = ", ".join("?" for _ in columns)
-
-
-    print("Filtere Daten")
-    filtered_rows = [
-        row for row in rows
-        if row[columns.index('point_lat')] is not None and
-           row[columns.index('point_lon')] is not None and
-           LAT_MIN <= row[columns.index('point_lat')] <= LAT_MAX and
-           LON_MIN <= row[columns.index('point_lon')] <= LON_MAX
-    ]
-
-
-    print(f"Speichere {len(filtered_rows)}")
-    cursor_out.executemany(f"""
-        INSERT OR IGNORE INTO tours ({columns_str}) VALUES ({placeholders})
-    """, filtered_rows)
-
-
-    conn_out.commit()
-    conn_out.close()
-    conn_in.close()
-    print("Db erstellt.")
-
-if __name__ == "__main__":
-    filter_data()
+import sqlite3
+
+from BavariaBorder import create_point_index, filter_points, select_in_bbox
+
+# Touren innerhalb der Landesgrenze von Bayern: Vorauswahl über den R*Tree-Index der Startpunkte
+# (Bounding Box), danach Punkt-in-Polygon-Test gegen bavaria_border.geojson. Die Grenze dort ist
+# vereinfacht, Startpunkte in Grenznähe (ca. 1 km) können falsch zugeordnet werden.
+
+input_db = "outdooractive_data.db"
+output_db = "filtered_data_bayern.db"
+
+def filter_data():
+
+    conn_in = sqlite3.connect(input_db)
+    with conn_in:
+        create_point_index(conn_in)
+
+    # Gleiches Schema wie die Eingabe-Db
+    create_sql = conn_in.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tours'").fetchone()[0]
+    conn_out = sqlite3.connect(output_db)
+    conn_out.execute(create_sql.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS", 1))
+
+
+    print("Lese und filtere Daten")
+    cursor_in = select_in_bbox(conn_in)
+    columns = [col[0] for col in cursor_in.description]
+    lon_index = columns.index("point_lon")
+    lat_index = columns.index("point_lat")
+    columns_str = ", ".join(columns)
+    placeholders = ", ".join("?" for _ in columns)
+
+    filtered_rows = filter_points(cursor_in, lambda row: row[lon_index], lambda row: row[lat_index])
+    id_index = columns.index("id")
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != "id")
+    selected_ids = []
+
+    def remember_ids(rows):
+        for row in rows:
+            selected_ids.append((row[id_index],))
+            yield row
+
+    # Upsert, damit von DeltaSync geänderte Touren ankommen, danach alle Touren löschen,
+    # die nicht mehr ausgewählt werden (gelöscht oder nicht mehr in Bayern)
+    with conn_out:
+        conn_out.executemany(f"""
+            INSERT INTO tours ({columns_str}) VALUES ({placeholders})
+            ON CONFLICT(id) DO UPDATE SET {updates}
+        """, remember_ids(filtered_rows))
+        conn_out.execute("CREATE TEMP TABLE IF NOT EXISTS selected (id TEXT PRIMARY KEY)")
+        conn_out.execute("DELETE FROM selected")
+        conn_out.executemany("INSERT OR IGNORE INTO selected VALUES (?)", selected_ids)
+        removed = conn_out.execute("DELETE FROM tours WHERE id NOT IN (SELECT id FROM selected)").rowcount
+    count = len(selected_ids)
+    print(f"{count} Touren gespeichert, {removed} entfernt")
+
+
+    conn_out.close()
+    conn_in.close()
+    print("Db erstellt.")
+
+if __name__ == "__main__":
+    filter_data()
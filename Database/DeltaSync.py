@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+import BetterJsonToDb
+from ApiToJson import API_BASE_URL, API_KEY, BATCH_SIZE, CONCURRENCY, MAX_RETRIES, RATE_LIMIT, Crawler
+
+# Incremental refresh of the tours database: only new, changed and reappeared tours are fetched,
+# changed rows are upserted and tours that disappeared from the API are tombstoned.
+#   python DeltaSync.py --db outdooractive_data.db
+
+# Without a lastModified stamp in the id listing, tours are re-fetched once they are this old
+MAX_AGE_DAYS = 30
+
+# A listing that misses more than this share of the active tours is taken for a broken listing,
+# nothing is synced unless --force is given
+MAX_TOMBSTONE_SHARE = 0.1
+
+SYNC_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tour_sync (
+        tour_id TEXT PRIMARY KEY,
+        content_hash TEXT,
+        source_modified TEXT,
+        fetched_at TEXT,
+        last_seen TEXT,
+        deleted_at TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_tour_sync_deleted ON tour_sync (deleted_at);
+    CREATE VIEW IF NOT EXISTS active_tours AS
+        SELECT tours.* FROM tours
+        LEFT JOIN tour_sync ON tour_sync.tour_id = tours.id
+        WHERE tour_sync.deleted_at IS NULL;
+"""
+
+UPSERT_TOUR = BetterJsonToDb.INSERT_TOUR.replace("INSERT OR IGNORE", "INSERT") + " ON CONFLICT(id) DO UPDATE SET " + \
+    ", ".join(f"{column} = excluded.{column}" for column in BetterJsonToDb.TOUR_COLUMNS if column != "id")
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def source_modified(item):
+    return item.get("meta", {}).get("date", {}).get("lastModified")
+
+
+def content_hash(tour_row, property_rows, region_rows):
+    """
+    Hash of everything stored for a tour, so edits to fields we do not keep do not count as changes.
+    """
+    payload = json.dumps([tour_row, property_rows, region_rows], ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DeltaSync:
+    """
+    Compares the API's id listing with the sync state in the database and applies the difference.
+    """
+
+    def __init__(self, crawler, db_name=BetterJsonToDb.DB_NAME, max_age_days=MAX_AGE_DAYS,
+                 max_tombstone_share=MAX_TOMBSTONE_SHARE, force=False):
+        self.crawler = crawler
+        self.db_name = db_name
+        self.max_age = timedelta(days=max_age_days)
+        self.max_tombstone_share = max_tombstone_share
+        self.force = force
+        self.stats = {"listed": 0, "fetched": 0, "new": 0, "changed": 0, "unchanged": 0,
+                      "revived": 0, "tombstoned": 0, "missing": 0}
+
+    def load_state(self, conn):
+        rows = conn.execute("SELECT tour_id, content_hash, source_modified, fetched_at, deleted_at FROM tour_sync")
+        return {row[0]: row[1:] for row in rows}
+
+    def needs_fetch(self, state, modified, stale_before):
+        """
+        New, reappeared, changed according to lastModified or, without a stamp, not fetched for a while.
+        """
+        if state is None:
+            return True
+        _, known_modified, fetched_at, deleted_at = state
+        if deleted_at is not None:
+            return True
+        if modified is not None:
+            return modified != known_modified
+        return fetched_at is None or fetched_at < stale_before
+
+    def apply_batch(self, conn, tours, modified_by_id, state):
+        """
+        Upsert the tours of one fetched batch whose content hash differs, in one transaction.
+        """
+        fetched_at = now_iso()
+        with conn:
+            for tour in tours:
+                tour_id = tour["id"]
+                row = BetterJsonToDb.tour_row(BetterJsonToDb.transform_tour(tour))
+                properties = BetterJsonToDb.property_rows(tour)
+                regions = BetterJsonToDb.region_rows(tour)
+                digest = content_hash(row, properties, regions)
+                known = state.get(tour_id)
+
+                if known is not None and known[0] == digest and known[3] is None:
+                    self.stats["unchanged"] += 1
+                else:
+                    conn.execute(UPSERT_TOUR, row)
+                    conn.execute("DELETE FROM tour_properties WHERE tour_id = ?", (tour_id,))
+                    conn.execute("DELETE FROM tour_regions WHERE tour_id = ?", (tour_id,))
+                    conn.executemany(BetterJsonToDb.INSERT_PROPERTY, properties)
+                    conn.executemany(BetterJsonToDb.INSERT_REGION, regions)
+                    if known is None:
+                        self.stats["new"] += 1
+                    elif known[3] is not None:
+                        self.stats["revived"] += 1
+                    else:
+                        self.stats["changed"] += 1
+
+                conn.execute("""
+                    INSERT INTO tour_sync (tour_id, content_hash, source_modified, fetched_at, last_seen, deleted_at)
+                    VALUES (?, ?, ?, ?, ?, NULL)
+                    ON CONFLICT(tour_id) DO UPDATE SET
+                        content_hash = excluded.content_hash, source_modified = excluded.source_modified,
+                        fetched_at = excluded.fetched_at, last_seen = excluded.last_seen, deleted_at = NULL
+                """, (tour_id, digest, modified_by_id.get(tour_id), fetched_at, fetched_at))
+
+    def check_tombstones(self, state, listed_ids):
+        """
+        Refuse to go on if the listing misses too many active tours, unless forced.
+        """
+        active = [tour_id for tour_id, known in state.items() if known[3] is None]
+        missing = sum(1 for tour_id in active if tour_id not in listed_ids)
+        if active and missing > self.max_tombstone_share * len(active) and not self.force:
+            raise RuntimeError(
+                f"The listing misses {missing} of {len(active)} active tours, more than "
+                f"{self.max_tombstone_share:.0%}. Nothing was synced, rerun with --force if they were really removed."
+            )
+
+    def mark_seen_and_tombstone(self, conn, listed_ids):
+        """
+        Refresh last_seen of every listed tour and tombstone the ones the API no longer lists.
+        """
+        seen_at = now_iso()
+        with conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS listed (tour_id TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM listed")
+            conn.executemany("INSERT OR IGNORE INTO listed VALUES (?)", ((tour_id,) for tour_id in listed_ids))
+            conn.execute("UPDATE tour_sync SET last_seen = ? WHERE tour_id IN (SELECT tour_id FROM listed)",
+                         (seen_at,))
+            self.stats["tombstoned"] = conn.execute("""
+                UPDATE tour_sync SET deleted_at = ?
+                WHERE deleted_at IS NULL AND tour_id NOT IN (SELECT tour_id FROM listed)
+            """, (seen_at,)).rowcount
+
+    async def run(self):
+        started = time.perf_counter()
+        BetterJsonToDb.create_or_update_tables(self.db_name)
+        conn = sqlite3.connect(self.db_name)
+        try:
+            conn.executescript(SYNC_SCHEMA)
+            state = self.load_state(conn)
+            stale_before = (datetime.now(timezone.utc) - self.max_age).isoformat(timespec="seconds")
+
+            async with self.crawler.create_client() as client:
+                self.crawler.client = client
+                listing = await self.crawler.list_contents("id,meta")
+                modified_by_id = {item["id"]: source_modified(item) for item in listing}
+                self.stats["listed"] = len(modified_by_id)
+                self.check_tombstones(state, modified_by_id)
+
+                to_fetch = [tour_id for tour_id, modified in modified_by_id.items()
+                            if self.needs_fetch(state.get(tour_id), modified, stale_before)]
+                self.stats["fetched"] = len(to_fetch)
+                print(f"{len(modified_by_id)} tours listed, {len(to_fetch)} new or changed")
+
+                batch_size = self.crawler.batch_size
+                batches = [to_fetch[i:i + batch_size] for i in range(0, len(to_fetch), batch_size)]
+                semaphore = asyncio.Semaphore(self.crawler.concurrency)
+
+                async def fetch(ids):
+                    async with semaphore:
+                        return ids, await self.crawler.fetch_verbose_details(ids)
+
+                # Applied as they arrive, a failed sync keeps everything that was written so far
+                for result in asyncio.as_completed([fetch(ids) for ids in batches]):
+                    ids, tours = await result
+                    self.apply_batch(conn, tours, modified_by_id, state)
+                    self.stats["missing"] += len(set(ids) - {tour["id"] for tour in tours})
+
+            self.mark_seen_and_tombstone(conn, modified_by_id)
+        finally:
+            conn.close()
+
+        self.stats["seconds"] = round(time.perf_counter() - started, 2)
+        self.stats["requests"] = self.crawler.requests
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally sync the tours database with the Outdooractive API")
+    parser.add_argument("--db", default=BetterJsonToDb.DB_NAME)
+    parser.add_argument("--base-url", default=API_BASE_URL)
+    parser.add_argument("--api-key", default=API_KEY)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT, help="requests per second, 0 = unlimited")
+    parser.add_argument("--max-retries", type=int, default=MAX_RETRIES)
+    parser.add_argument("--max-age-days", type=float, default=MAX_AGE_DAYS,
+                        help="re-fetch tours without a lastModified stamp after this many days")
+    parser.add_argument("--max-tombstone-share", type=float, default=MAX_TOMBSTONE_SHARE,
+                        help="abort if the listing misses more than this share of the active tours")
+    parser.add_argument("--force", action="store_true", help="tombstone however many tours the listing misses")
+    args = parser.parse_args()
+
+    crawler = Crawler(base_url=args.base_url, api_key=args.api_key, batch_size=args.batch_size,
+                      concurrency=args.concurrency, rate_limit=args.rate_limit, max_retries=args.max_retries)
+    stats = asyncio.run(DeltaSync(crawler, db_name=args.db, max_age_days=args.max_age_days,
+                                  max_tombstone_share=args.max_tombstone_share, force=args.force).run())
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import argparse
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from BavariaBorder import points_in_polygon
+from BetterJsonToDb import (
+    CHUNK_SIZE, CRAWL_FILE, DB_NAME, TOUR_COLUMNS, SqliteSink, TourRecord, property_rows, region_rows,
+    tour_row, transform_tour,
+)
+from TourStream import TourWriter, is_jsonl, open_text, read_tours
+
+# Single pass from the crawl file to every output: the source is read once, chunks of tours are
+# transformed in a process pool and each transformed chunk is handed to all sinks.
+#   python Etl.py response.jsonl --sqlite --json updated.jsonl --region --postgres-csv pg_export
+# Without any sink option the database, updated.json and updatedBavaria.json are written.
+
+CPUS = os.cpu_count() or 1
+WORKERS = CPUS if CPUS > 1 else 0  # a single worker process only adds pickling overhead
+
+COPY_OPTIONS = "FORMAT csv, HEADER true, NULL '\\N'"
+
+
+def read_source(path):
+    """
+    JSONL lines are passed on undecoded, so the parsing happens in the workers too.
+    """
+    if not is_jsonl(path):
+        yield from read_tours(path)
+        return
+    with open_text(path) as file:
+        for line in file:
+            if line.strip():
+                yield line
+
+
+def transform_batch(items, with_json=True):
+    """
+    Runs in a worker: decode, transform and serialise a chunk of tours and test them against the border.
+    """
+    records = []
+    lons, lats = [], []
+    for item in items:
+        tour = json.loads(item) if isinstance(item, str) else item
+        tour_data = transform_tour(tour)
+        text = json.dumps(tour_data, ensure_ascii=False) if with_json else None
+        records.append(TourRecord(tour_row(tour_data), property_rows(tour), region_rows(tour), text))
+        lons.append(tour_data["point_lon"] if tour_data["point_lon"] is not None else float("nan"))
+        lats.append(tour_data["point_lat"] if tour_data["point_lat"] is not None else float("nan"))
+    inside = points_in_polygon(lons, lats)
+    return [record._replace(in_bavaria=bool(flag)) for record, flag in zip(records, inside)]
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def transformed_batches(items, workers=WORKERS, chunk_size=CHUNK_SIZE, with_json=True):
+    """
+    Transformed chunks in source order. At most two chunks per worker are in flight, so memory
+    stays bounded however large the source is. workers=0 transforms in this process.
+    """
+    if workers == 0:
+        for chunk in chunked(items, chunk_size):
+            yield transform_batch(chunk, with_json)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunked(items, chunk_size):
+            pending.append(pool.submit(transform_batch, chunk, with_json))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class JsonSink:
+    """
+    The updated JSON (or JSONL, by name) that the app reads.
+    """
+    needs_json = True
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    def open(self):
+        self.writer = TourWriter(self.path)
+
+    def write(self, records):
+        for record in records:
+            self.writer.write(record.json)
+
+    def close(self):
+        self.writer.close()
+        print(f"Updated data written to {self.path} with {self.writer.count} tours.")
+
+    def abort(self):
+        self.writer.abort()
+
+
+class RegionSink:
+    """
+    Passes only the tours starting inside the Bavarian border on to another sink.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.needs_json = getattr(sink, "needs_json", False)
+
+    def open(self):
+        self.sink.open()
+
+    def write(self, records):
+        self.sink.write([record for record in records if record.in_bavaria])
+
+    def close(self):
+        self.sink.close()
+
+    def abort(self):
+        self.sink.abort()
+
+
+class PostgresCsvSink:
+    """
+    CSV files of the tours, tour_properties and tour_regions tables plus a copy.sql to load them
+    from inside the export directory:
+        cd pg_export && psql "$DATABASE_URL" -f copy.sql
+    NULL is written as \\N, so it stays distinct from an empty string.
+    """
+    needs_json = False
+
+    TABLES = {
+        "tours": TOUR_COLUMNS,
+        "tour_properties": ["tour_id", "property_name", "property_title", "property_icon_url"],
+        "tour_regions": ["tour_id", "region_id", "region_type"],
+    }
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = {}
+        self.writers = {}
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for table, columns in self.TABLES.items():
+            file = open(os.path.join(self.directory, f"{table}.csv"), "w", encoding="utf-8", newline="")
+            self.files[table] = file
+            self.writers[table] = csv.writer(file)
+            self.writers[table].writerow(columns)
+
+    def write(self, records):
+        self.writers["tours"].writerows(self.csv_row(record.row) for record in records)
+        self.writers["tour_properties"].writerows(
+            self.csv_row(row) for record in records for row in record.properties)
+        self.writers["tour_regions"].writerows(self.csv_row(row) for record in records for row in record.regions)
+
+    @staticmethod
+    def csv_row(row):
+        return ["\\N" if value is None else value for value in row]
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+        with open(os.path.join(self.directory, "copy.sql"), "w", encoding="utf-8") as file:
+            for table, columns in self.TABLES.items():
+                file.write(f"\\copy {table} ({', '.join(columns)}) FROM '{table}.csv' WITH ({COPY_OPTIONS})\n")
+        print(f"Postgres CSV export written to {self.directory}")
+
+    def abort(self):
+        for file in self.files.values():
+            file.close()
+
+
+def run(source, sinks, workers=WORKERS, chunk_size=CHUNK_SIZE):
+    """
+    Read `source` once and write every transformed chunk to all `sinks`. Returns the number of tours.
+    """
+    started = time.perf_counter()
+    with_json = any(getattr(sink, "needs_json", False) for sink in sinks)
+    opened = []
+    count = 0
+    try:
+        for sink in sinks:
+            sink.open()
+            opened.append(sink)
+        for records in transformed_batches(read_source(source), workers, chunk_size, with_json):
+            for sink in sinks:
+                sink.write(records)
+            count += len(records)
+            print(f"Processed {count} tours")
+    except BaseException:
+        for sink in opened:
+            sink.abort()
+        raise
+    for sink in sinks:
+        sink.close()
+    print(f"{count} tours in {time.perf_counter() - started:.1f}s")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transform crawled tours into all outputs in one pass")
+    parser.add_argument("source", nargs="?", default=CRAWL_FILE, help="crawl file, JSONL or JSON, may be gzipped")
+    parser.add_argument("--sqlite", nargs="?", const=DB_NAME, help=f"SQLite database (default {DB_NAME})")
+    parser.add_argument("--json", nargs="?", const="updated.json", help="updated JSON or JSONL (default updated.json)")
+    parser.add_argument("--region", nargs="?", const="updatedBavaria.json",
+                        help="tours inside Bavaria as JSON or JSONL (default updatedBavaria.json)")
+    parser.add_argument("--postgres-csv", nargs="?", const="pg_export", help="directory for the Postgres CSV export")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="transform processes, 0 = in this process")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if not any((args.sqlite, args.json, args.region, args.postgres_csv)):
+        args.sqlite, args.json, args.region = DB_NAME, "updated.json", "updatedBavaria.json"
+
+    sinks = []
+    if args.sqlite:
+        sinks.append(SqliteSink(args.sqlite))
+    if args.json:
+        sinks.append(JsonSink(args.json))
+    if args.region:
+        sinks.append(RegionSink(JsonSink(args.region)))
+    if args.postgres_csv:
+        sinks.append(PostgresCsvSink(args.postgres_csv))
+
+    run(args.source, sinks, workers=args.workers, chunk_size=args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for the Outdooractive API, to run ApiToJson.py against:
+#   python MockOutdooractiveApi.py --tours 2000 --fail-rate 0.1
+#   python ApiToJson.py --base-url http://127.0.0.1:8765/ --rate-limit 0
+# --revision N simulates the catalog N updates later: some tours changed, some removed, some added.
+
+REGIONS = ["Allgäu", "Berchtesgadener Land", "Chiemgau", "Fränkische Schweiz", "Zugspitz Region", "Tirol"]
+LABELS = ["publicTransportFriendly", "familyFriendly", "circularRoute"]
+
+
+def make_tour(tour_id, rng, revision=0):
+    """
+    A synthetic tour with the fields the Database scripts read, scattered over Bavaria and its neighbours.
+    """
+    images = [{"id": str(rng.randint(1, 10 ** 8))} for _ in range(rng.randint(0, 4))]
+    return {
+        "id": tour_id,
+        "meta": {"date": {"lastModified": f"2025-01-{1 + revision:02d}T00:00:00Z"}},
+        "title": f"Tour {tour_id}" + (f" (revision {revision})" if revision else ""),
+        "teaserText": f"Teaser of tour {tour_id}",
+        "texts": {"short": f"Short description of tour {tour_id}", "long": f"Long description of tour {tour_id}"},
+        "category": {"id": str(rng.randint(1, 20)), "title": rng.choice(["Hiking trail", "Mountain hike", "Walk"])},
+        "ratingInfo": {key: rng.randint(1, 6) for key in ("difficulty", "landscape", "experience", "stamina")},
+        "metrics": {
+            "length": rng.randint(1000, 30000),
+            "elevation": {"ascent": rng.randint(0, 2000), "descent": rng.randint(0, 2000),
+                          "minAltitude": rng.randint(300, 1000), "maxAltitude": rng.randint(1000, 2900)},
+            "duration": {"minimal": rng.randint(30, 600)},
+        },
+        "point": [round(rng.uniform(8.5, 14.5), 6), round(rng.uniform(46.8, 51.0), 6)],
+        "isWinter": rng.random() < 0.1,
+        "isClosedByClosure": rng.random() < 0.02,
+        "primaryRegion": {"title": rng.choice(REGIONS)},
+        "season": {month: rng.random() < 0.7 for month in ("jan", "apr", "jul", "oct")},
+        "primaryImage": images[0] if images else {},
+        "images": images,
+        "labels": {label: True for label in LABELS if rng.random() < 0.3},
+        "properties": [{"name": "scenic", "title": "Scenic", "iconUrl": None}] if rng.random() < 0.5 else [],
+        "regions": [{"id": str(rng.randint(1, 500)), "type": "district"}],
+    }
+
+
+def build_catalog(count, seed=42, revision=0):
+    """
+    The same seed gives the same catalog. Each revision changes about 2 % of the tours,
+    removes about 1 % and adds 10 new ones.
+    """
+    rng = random.Random(seed)
+    ids = [str(10 ** 8 + i) for i in range(count + 10 * revision)]
+    tours = {}
+    for index, tour_id in enumerate(ids):
+        tour_rng = random.Random(rng.random())
+        removed = index < count and any(index % 97 == r for r in range(1, revision + 1))
+        if removed:
+            continue
+        changed = max((r for r in range(1, revision + 1) if index % 50 == r), default=0)
+        tours[tour_id] = make_tour(tour_id, tour_rng, changed)
+    return [tour_id for tour_id in ids if tour_id in tours], tours
+
+
+class MockApiHandler(BaseHTTPRequestHandler):
+    tours = {}
+    ids = []
+    fail_rate = 0.0
+    latency = 0.0
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        # Inject transient failures like the real API under load
+        roll = random.random()
+        if roll < self.fail_rate / 2:
+            self.send_json(429, {"error": "rate limited"}, {"Retry-After": "1"})
+            return
+        if roll < self.fail_rate:
+            self.send_json(503, {"error": "unavailable"})
+            return
+
+        if re.search(r"/contents$", url.path):
+            start = int(params.get("startIndex", 0))
+            count = int(params.get("count", 100))
+            fields = params.get("typeFields", "id").split(",")
+            page = [
+                {field: self.tours[tour_id][field] for field in fields if field in self.tours[tour_id]}
+                for tour_id in self.ids[start:start + count]
+            ]
+            self.send_json(200, {"answer": {"contents": page}})
+            return
+
+        match = re.search(r"/contents/([^/]+)$", url.path)
+        if match:
+            requested = match.group(1).split(",")
+            self.send_json(200, {"answer": {"contents": [self.tours[i] for i in requested if i in self.tours]}})
+            return
+
+        self.send_json(404, {"error": "not found"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Outdooractive API for crawler tests")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tours", type=int, default=1000)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 429/503")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--revision", type=int, default=0, help="simulate N catalog updates")
+    args = parser.parse_args()
+
+    MockApiHandler.ids, MockApiHandler.tours = build_catalog(args.tours, args.seed, args.revision)
+    MockApiHandler.fail_rate = args.fail_rate
+    MockApiHandler.latency = args.latency_ms / 1000
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), MockApiHandler)
+    print(f"Mock Outdooractive API with {args.tours} tours on http://127.0.0.1:{args.port}/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
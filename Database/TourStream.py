@@ -0,0 +1,100 @@
+import gzip
+import json
+import os
+
+# Tours are streamed as JSON Lines, one tour per line, optionally gzip-compressed (*.jsonl.gz).
+# The older single-document files (response.json, updated.json) can still be read, but are
+# loaded whole.
+
+
+def is_jsonl(path):
+    return ".jsonl" in os.path.basename(path)
+
+
+def open_text(path, mode="r", compressed=None):
+    """
+    Open a text file, transparently gzip-compressed if the name ends with .gz.
+    Appending to a .gz file adds a new gzip member, which readers see as one continuous stream.
+    """
+    if compressed is None:
+        compressed = path.endswith(".gz")
+    if compressed:
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def read_tours(path):
+    """
+    Yield the tours of a crawl or export file one at a time.
+    """
+    if is_jsonl(path):
+        with open_text(path) as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    with open_text(path) as file:
+        data = json.load(file)
+    if "tours" in data:
+        yield from data["tours"]
+    else:
+        yield from data.get("answer", {}).get("contents", [])
+
+
+def append_tours(file, tours):
+    """
+    Write tours to an open JSONL file, one per line. Returns the count.
+    """
+    count = 0
+    for tour in tours:
+        file.write(json.dumps(tour, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+class TourWriter:
+    """
+    Writes tours that are already serialised to JSON text, as JSONL or as a {"tours": [...]} document
+    depending on the name. The file is written under a temporary name and moved into place by close(),
+    abort() discards it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.jsonl = is_jsonl(path)
+        self.count = 0
+        self.file = open_text(self.tmp_path, "w", compressed=path.endswith(".gz"))
+        if not self.jsonl:
+            self.file.write('{"tours": [')
+
+    def write(self, text):
+        if self.jsonl:
+            self.file.write(text + "\n")
+        else:
+            self.file.write(",\n" if self.count else "\n")
+            self.file.write(text)
+        self.count += 1
+
+    def close(self):
+        if not self.jsonl:
+            self.file.write("\n]}\n")
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.tmp_path)
+
+
+def write_tours(path, tours):
+    """
+    Write a stream of tours to `path`, as JSONL or as a {"tours": [...]} document depending on the name.
+    The file is written under a temporary name and moved into place once complete. Returns the count.
+    """
+    writer = TourWriter(path)
+    for tour in tours:
+        writer.write(json.dumps(tour, ensure_ascii=False))
+    writer.close()
+    return writer.count
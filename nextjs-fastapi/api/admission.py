@@ -0,0 +1,201 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from starlette.concurrency import run_in_threadpool
+
+# Token buckets: sustained requests per second and burst size, per user and for the whole instance
+USER_RATE_PER_SECOND = float(os.getenv("CHAT_USER_RATE_PER_SECOND", "0.5"))
+USER_BURST = float(os.getenv("CHAT_USER_BURST", "5"))
+GLOBAL_RATE_PER_SECOND = float(os.getenv("CHAT_GLOBAL_RATE_PER_SECOND", "20"))
+GLOBAL_BURST = float(os.getenv("CHAT_GLOBAL_BURST", "40"))
+
+# Chat turns running at once, turns allowed to wait for a slot, and how long they may wait
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "16"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))
+CHAT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("CHAT_QUEUE_TIMEOUT_SECONDS", "10"))
+
+# "memory" keeps the buckets per worker, "sqlite" shares them between the workers of a machine
+ADMISSION_STORE = os.getenv("ADMISSION_STORE", "memory")
+# In the temp dir, the package directory is read-only on serverless deployments
+ADMISSION_DB_PATH = os.getenv("ADMISSION_DB_PATH", os.path.join(tempfile.gettempdir(), "hyking_admission.db"))
+MAX_TRACKED_BUCKETS = 100000
+
+
+class AdmissionRejected(Exception):
+    """
+    A request was shed: 429 when the caller is over its rate, 503 when the instance is overloaded.
+    """
+
+    def __init__(self, status_code, detail, retry_after):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def _refill(tokens, updated_at, now, rate, capacity):
+    return min(capacity, tokens + (now - updated_at) * rate)
+
+
+class MemoryBucketStore:
+    """
+    Token buckets in a bounded dictionary, local to this worker.
+    """
+
+    blocking = False
+
+    def __init__(self, max_buckets=MAX_TRACKED_BUCKETS):
+        self.buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self.max_buckets = max_buckets
+        self.lock = threading.Lock()
+
+    def take(self, key, rate, capacity):
+        """
+        Take one token; returns 0 if allowed, otherwise the seconds until a token is available.
+        """
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated_at = self.buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated_at, now, rate, capacity)
+            allowed = tokens >= 1
+            self.buckets[key] = (tokens - 1 if allowed else tokens, now)
+            self.buckets.move_to_end(key)
+            while len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / rate
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in SQLite, so all workers on the machine share one limit per user.
+    """
+
+    blocking = True
+
+    def __init__(self, db_path=ADMISSION_DB_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS token_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL,
+                updated_at REAL
+            )
+        """)
+
+    def take(self, key, rate, capacity):
+        # Wall-clock time, the monotonic clock is not comparable across processes
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT tokens, updated_at FROM token_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens = _refill(*row, now, rate, capacity) if row else capacity
+                allowed = tokens >= 1
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO token_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                    (key, tokens - 1 if allowed else tokens, now),
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return 0.0 if allowed else (1 - tokens) / rate
+
+
+def create_bucket_store(kind=ADMISSION_STORE):
+    if kind == "sqlite":
+        return SQLiteBucketStore()
+    if kind != "memory":
+        raise ValueError(f"Unknown ADMISSION_STORE: {kind}")
+    return MemoryBucketStore()
+
+
+class AdmissionController:
+    """
+    Load shedding for the LLM-backed chat routes.
+    A request must pass the user's and the global token bucket and then get one of
+    `max_concurrency` slots. At most `max_queue` requests wait for a slot; beyond that,
+    or after waiting `queue_timeout` seconds, requests are rejected right away.
+    """
+
+    def __init__(self, store=None, max_concurrency=CHAT_MAX_CONCURRENCY, max_queue=CHAT_MAX_QUEUE,
+                 queue_timeout=CHAT_QUEUE_TIMEOUT_SECONDS):
+        self.store = store or create_bucket_store()
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.running = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = {"user_rate": 0, "global_rate": 0, "queue_full": 0, "queue_timeout": 0}
+
+    async def _take(self, key, rate, capacity):
+        if self.store.blocking:
+            return await run_in_threadpool(self.store.take, key, rate, capacity)
+        return self.store.take(key, rate, capacity)
+
+    def _reject(self, reason, status_code, detail, retry_after):
+        self.rejected[reason] += 1
+        raise AdmissionRejected(status_code, detail, max(1, round(retry_after)))
+
+    async def check(self, user_id):
+        """
+        Apply the rate limits and reject if the queue is already full.
+        """
+        wait = await self._take(f"user:{user_id}", USER_RATE_PER_SECOND, USER_BURST)
+        if wait:
+            self._reject("user_rate", 429, "Too many messages, please slow down", wait)
+        wait = await self._take("global", GLOBAL_RATE_PER_SECOND, GLOBAL_BURST)
+        if wait:
+            self._reject("global_rate", 503, "The assistant is busy, please try again shortly", wait)
+        if self.queued >= self.max_queue:
+            self._reject("queue_full", 503, "The assistant is busy, please try again shortly", 1)
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Hold one of the concurrency slots, waiting in the bounded queue if necessary.
+        """
+        if not self.slots.locked():
+            # A slot is free, acquiring it does not wait
+            await self.slots.acquire()
+        else:
+            if self.queued >= self.max_queue:
+                self._reject("queue_full", 503, "The assistant is busy, please try again shortly", 1)
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self.slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("queue_timeout", 503, "The assistant is busy, please try again shortly", 1)
+            finally:
+                self.queued -= 1
+
+        self.running += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self.slots.release()
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            **{f"rejected_{reason}": count for reason, count in self.rejected.items()},
+        }
@@ -2,6 +2,14 @@ from fastapi import FastAPI, HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
 import jwt
 import bcrypt
 from typing import Optional
@@ -11,6 +19,19 @@ SECRET_KEY = "your-secret-key"  # In production, use environment variable
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Local user store. The default is in the temp dir because serverless deployments (Vercel) can only
+# write to /tmp, where the users are lost on every cold start: point AUTH_DB_PATH at persistent storage
+# for anything beyond local development.
+AUTH_DB_PATH = os.getenv("AUTH_DB_PATH", os.path.join(tempfile.gettempdir(), "hyking_users.db"))
+
+# bcrypt runs in its own pool so it never blocks the event loop; requests beyond
+# BCRYPT_MAX_PENDING waiting hashes are rejected right away instead of queueing up
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "32"))
+
+# Decoded tokens are kept until they expire
+TOKEN_CACHE_SIZE = 10000
+
 # User models
 class UserCreate(BaseModel):
     email: str
@@ -23,8 +44,63 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
-# Mock database (replace with real database in production)
-users_db = {}
+class UserStore:
+    """
+    SQLite-backed user store, kept across restarts and shared by all workers on the same machine.
+    It is local-only: separate serverless instances do not see each other's users.
+    """
+
+    def __init__(self, db_path=AUTH_DB_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                email TEXT PRIMARY KEY,
+                password TEXT NOT NULL,
+                created_at REAL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, email):
+        with self.lock:
+            row = self.conn.execute("SELECT email, password FROM users WHERE email = ?", (email,)).fetchone()
+        return {"email": row[0], "password": row[1]} if row else None
+
+    def create(self, email, hashed_password):
+        """
+        Insert a new user; returns False if the email is already registered.
+        """
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(
+                    "INSERT INTO users (email, password, created_at) VALUES (?, ?, ?)",
+                    (email, hashed_password, time.time()),
+                )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def __contains__(self, email):
+        return self.get(email) is not None
+
+
+_users_db = None
+_users_db_lock = threading.Lock()
+
+
+def get_users_db():
+    """
+    Shared user store, opened on first use so that importing the app never touches the filesystem.
+    """
+    global _users_db
+    if _users_db is None:
+        with _users_db_lock:
+            if _users_db is None:
+                _users_db = UserStore()
+    return _users_db
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -44,4 +120,106 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(
         plain_password.encode('utf-8'),
         hashed_password.encode('utf-8')
-    ) 
\ No newline at end of file
+    ) 
+
+
+class AuthBusyError(Exception):
+    """
+    Raised when too many password hashes are already waiting for the bcrypt pool.
+    """
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a bounded thread pool (bcrypt releases the GIL) with admission control.
+    """
+
+    def __init__(self, workers=BCRYPT_WORKERS, max_pending=BCRYPT_MAX_PENDING):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    async def _run(self, func, *args):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise AuthBusyError("Too many concurrent sign-ins, try again shortly")
+            self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def stats(self):
+        return {"pending": self.pending, "rejected": self.rejected, "max_pending": self.max_pending}
+
+
+password_hasher = PasswordHasher()
+
+
+class TokenCache:
+    """
+    Decoded JWT payloads keyed by token, dropped once the token expires.
+    """
+
+    def __init__(self, max_size=TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self.tokens = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        with self.lock:
+            entry = self.tokens.get(token)
+            if entry and entry[0] > time.time():
+                self.tokens.move_to_end(token)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self.tokens[token]
+            self.misses += 1
+            return None
+
+    def put(self, token, payload):
+        with self.lock:
+            self.tokens[token] = (payload["exp"], payload)
+            while len(self.tokens) > self.max_size:
+                self.tokens.popitem(last=False)
+
+
+token_cache = TokenCache()
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/py/login")
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Verify a JWT and return its payload; verified tokens are served from the cache until they expire.
+    Raises jwt.InvalidTokenError for invalid or expired tokens.
+    """
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.put(token, payload)
+    return payload
+
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    try:
+        email = decode_access_token(token).get("sub")
+    except jwt.InvalidTokenError:
+        email = None
+    if not email:
+        raise HTTPException(status_code=401, detail="Invalid or expired token",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return User(email=email)
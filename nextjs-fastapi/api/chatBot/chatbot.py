@@ -1,19 +1,50 @@
-import openai
 import json
 import os
-from dotenv import load_dotenv
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
-env_path = os.path.join(project_root, ".env.local")
-load_dotenv(dotenv_path=env_path)
+import time
+from .intentClassifier import IntentClassifier
+from .historyManager import HistoryManager
+from .sessionStore import create_session_store
+from .llmCache import LLMCache
+from .llmMetrics import instrumented_completion
+from .llmReplay import create_llm_client
+from .llmResilience import ResilientLLMCaller, CircuitOpenError
+from ..resources import load_environment
+from ..tracing import span, traced
+load_environment()
 
 # Get API key from environment
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
-if not openai_api_key:
+# "openai" calls the API, "record" also writes every completion to a fixture file,
+# "replay" serves recorded completions with synthetic latency (offline load tests)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+
+if not openai_api_key and LLM_BACKEND != "replay":
     raise ValueError("❌ OPENAI_API_KEY is missing! Make sure it's set in the .env.local file.")
 
 # Correctly initialize OpenAI client with the retrieved key
-client = openai.Client(api_key=openai_api_key)
+client = create_llm_client(LLM_BACKEND, openai_api_key)
+
+# Model used for all chat completions
+CHAT_MODEL = "gpt-4-turbo"
+
+# Model used to fold older turns into the running conversation summary
+SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", "gpt-4-turbo")
+
+
+# Deadlines, retries, hedging and the circuit breaker for all OpenAI calls
+llm_caller = ResilientLLMCaller()
+
+
+def chat_completion(intent, **kwargs):
+    """
+    Every chat completion goes through here, so latency, tokens and errors are recorded per intent
+    and every call is bounded by the intent's deadline.
+    """
+    def create(**request):
+        return llm_caller.call(client.chat.completions.create, intent, **request)
+    with span("llm", intent=intent):
+        return instrumented_completion(create, intent, **kwargs)
 
 
 class Chatbot:
@@ -23,21 +54,41 @@ class Chatbot:
     """
 
     def __init__(self):
-        # User-specific memory storage
-        self.user_memory = {}
+        # User-specific memory storage, the backend is chosen via SESSION_STORE
+        self.session_store = create_session_store()
+        # Sessions used by turns that are currently being processed
+        self.active_sessions = {}
+        # Local intent classifier, GPT is only asked when it is not confident
+        self.intent_classifier = IntentClassifier()
+        # Keeps prompts within a token budget by summarising older turns
+        self.history_manager = HistoryManager(summarize=self._summarize_history)
+        # Disk cache for GPT replies (categorization by input, filter extraction by the full prompt)
+        self.llm_cache = LLMCache()
         print("Chatbot initialized with support for user-specific memory")
 
     def get_session_memory(self, user_id):
         """
         Retrieve memory for a specific user.
-        If no memory exists for the user, initialize it.
+        Fields are loaded lazily from the session store, missing ones are initialized.
         """
-        if user_id not in self.user_memory:
-            self.user_memory[user_id] = {
-                "conversation_state": {"user_filters": {}, "last_context": None},
-                "history": [],
-            }
-        return self.user_memory[user_id]
+        if user_id not in self.active_sessions:
+            self.active_sessions[user_id] = self.session_store.session(user_id)
+        return self.active_sessions[user_id]
+
+    def save_session_memory(self, user_id):
+        """
+        Persist the fields modified during the current turn and release the session.
+        """
+        session = self.active_sessions.pop(user_id, None)
+        if session is None:
+            return
+        touched_history = "history" in session.values
+        if touched_history:
+            self.history_manager.cap_history(session)
+        session.save()
+        if touched_history:
+            # Summarise older turns in the background, after this turn is stored
+            self.history_manager.maybe_compact(session)
 
     def update_session_memory(self, user_id, key, value):
         """
@@ -50,11 +101,8 @@ class Chatbot:
         """
         Clear all memory for a specific user.
         """
-        if user_id in self.user_memory:
-            self.user_memory[user_id] = {
-                "conversation_state": {"user_filters": {}, "last_context": None},
-                "history": [],
-            }
+        self.active_sessions.pop(user_id, None)
+        self.session_store.delete(user_id)
 
     def _build_system_prompt(self, mode, user_input=None):
         """
@@ -83,6 +131,7 @@ class Chatbot:
                 - max_length (integer, in meters, e.g., 15000)
                 - min_length (integer, in meters, optional)
                 - duration_min (integer, in minutes, optional)
+                - duration_max (integer, in minutes, optional)
                 - scenery (array of strings, e.g., ['mountains', 'forest'])
                 - terrain (array of strings, e.g., ['rocky', 'snowy'])
                 - is_winter (boolean, true if hike is in winter, otherwise false)
@@ -109,10 +158,15 @@ class Chatbot:
         }
         return prompts.get(mode, prompts["default"])
 
-    def _call_gpt(self, user_input, system_prompt, user_id):
+    def _call_gpt(self, user_input, system_prompt, user_id, intent=None, cache_mode=None, cache_if=None,
+                  fallback=None):
         """
         Unified method for interacting with GPT API.
-        Sends the full conversation history along with the system prompt for a specific user.
+        Sends the system prompt, the running summary and the recent conversation history
+        that fits into the token budget for a specific user.
+        If `cache_mode` is given, replies are served from and stored in the LLM cache;
+        `cache_if` can reject replies that should not be cached (e.g. invalid JSON).
+        `fallback` is returned instead of the generic error message when GPT is unavailable.
         """
         # Get user-specific memory
         memory = self.get_session_memory(user_id)
@@ -120,31 +174,125 @@ class Chatbot:
         # Add user input to history
         memory.setdefault("history", []).append({"role": "user", "content": user_input})
 
-        # Construct messages with system prompt and full conversation history
-        messages = [{"role": "system", "content": system_prompt}] + memory["history"]
+        # Construct messages with system prompt and the budgeted conversation history
+        messages = self.history_manager.build_messages(system_prompt, memory, intent)
+        temperature = 0.7
+
+        # The reply depends on the whole prompt (history, summary), not just on the input
+        cache_context = {"messages": messages, "temperature": temperature}
+        if cache_mode:
+            cached = self.llm_cache.get(cache_mode, CHAT_MODEL, user_input, cache_context)
+            if cached is not None:
+                memory["history"].append({"role": "assistant", "content": cached})
+                return cached
 
         try:
-            response = client.chat.completions.create(
-                model="gpt-4-turbo",
+            started = time.perf_counter()
+            response = chat_completion(
+                intent or cache_mode or "general_chat",
+                model=CHAT_MODEL,
                 messages=messages,
                 max_tokens=500,
-                temperature=0.7,
+                temperature=temperature,
             )
             reply = response.choices[0].message.content.strip()
 
             # Add assistant's response to history
             memory["history"].append({"role": "assistant", "content": reply})
             print("GPT Raw Response:", reply)  # Debug print
+            if cache_mode and (cache_if is None or cache_if(reply)):
+                self.llm_cache.put(cache_mode, CHAT_MODEL, user_input, reply, time.perf_counter() - started,
+                                   cache_context)
             return reply
+        except CircuitOpenError:
+            print("🔌 GPT skipped, OpenAI circuit is open")
+        except Exception as e:
+            print("❌ GPT API Error:", e)
+        if fallback is not None:
+            return fallback
+        return "Sorry, I encountered an issue while generating a response. 🛠️"
+
+    def _stream_gpt(self, user_input, system_prompt, user_id, intent=None):
+        """
+        Streaming variant of _call_gpt that yields the reply piece by piece as GPT generates it.
+        The complete reply is added to the history once the stream has finished.
+        """
+        memory = self.get_session_memory(user_id)
+        memory.setdefault("history", []).append({"role": "user", "content": user_input})
+        messages = self.history_manager.build_messages(system_prompt, memory, intent)
+
+        parts = []
+        try:
+            stream = chat_completion(
+                intent or "general_chat",
+                model=CHAT_MODEL,
+                messages=messages,
+                max_tokens=500,
+                temperature=0.7,
+                stream=True,
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    parts.append(token)
+                    yield token
         except Exception as e:
             print("❌ GPT API Error:", e)
-            return "Sorry, I encountered an issue while generating a response. 🛠️"
+            if not parts:
+                fallback = "Sorry, I encountered an issue while generating a response. 🛠️"
+                parts.append(fallback)
+                yield fallback
 
+        memory["history"].append({"role": "assistant", "content": "".join(parts).strip()})
+
+    def _summarize_history(self, previous_summary, messages):
+        """
+        Fold older conversation turns into a short running summary.
+        Runs in a background thread, never on the request path.
+        """
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        response = chat_completion(
+            "summary",
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": (
+                    "Summarise this conversation between a user and a hiking assistant in at most 120 words. "
+                    "Keep the user's hiking preferences, locations and any hikes that were discussed."
+                )},
+                {"role": "user", "content": f"Previous summary: {previous_summary or 'none'}\n\n{transcript}"},
+            ],
+            max_tokens=200,
+            temperature=0.0,
+        )
+        return response.choices[0].message.content.strip()
+
+    def add_to_history(self, user_id, user_input, reply):
+        """
+        Record a turn that was answered without calling GPT, so later prompts still see it.
+        """
+        memory = self.get_session_memory(user_id)
+        memory.setdefault("history", []).append({"role": "user", "content": user_input})
+        memory["history"].append({"role": "assistant", "content": reply})
+
+    @traced("intent")
     def categorize_intent(self, user_input, user_id):
         """
         Determine the intent of the user's message dynamically using history.
         Improved to handle cases where the user is adjusting or refining filters.
+        Obvious messages are answered by the local intent classifier without a GPT call.
         """
+        fast_intent = self.intent_classifier.classify(user_input)
+        if fast_intent:
+            return fast_intent
+
+        valid_intents = ["general_chat", "hike_recommendation", "clarification", "adjust_filters", "weather",
+                         "other"]
+        cached_intent = self.llm_cache.get("categorization", CHAT_MODEL, user_input)
+        if cached_intent in valid_intents:
+            return cached_intent
+
         memory = self.get_session_memory(user_id)
 
         # Add the current user input to history temporarily for context
@@ -158,27 +306,29 @@ class Chatbot:
 
         try:
             # Call GPT to determine intent
-            response = client.chat.completions.create(
-                model="gpt-4-turbo",
+            started = time.perf_counter()
+            response = chat_completion(
+                "categorization",
+                model=CHAT_MODEL,
                 messages=messages,
                 max_tokens=10,
                 temperature=0.0,
             )
             intent = response.choices[0].message.content.strip().lower()
-
-            # Validate the response and remove temporary history
-            memory["history"].pop()
-            valid_intents = ["general_chat", "hike_recommendation", "clarification", "adjust_filters", "weather",
-                             "other"]
-            if intent in valid_intents:
-                print(f"🧠 Detected intent: {intent}")
-                return intent
-            else:
-                print(f"⚠️ Unexpected intent response: {intent}")
-                return "general_chat"
-
         except Exception as e:
             print(f"❌ GPT API Error in categorize_intent: {e}")
-            # Rollback history in case of error
+            # Take the local classifier's best guess, even if it is not confident
+            intent, _ = self.intent_classifier.predict(user_input)
+            return intent or "general_chat"
+        finally:
+            # Remove the temporary history entry, exactly once
             memory["history"].pop()
-            return "general_chat"
+
+        # Validate the response
+        if intent in valid_intents:
+            print(f"🧠 Detected intent: {intent}")
+            self.intent_classifier.record(user_input, intent)
+            self.llm_cache.put("categorization", CHAT_MODEL, user_input, intent, time.perf_counter() - started)
+            return intent
+        print(f"⚠️ Unexpected intent response: {intent}")
+        return "general_chat"
@@ -3,6 +3,11 @@ from .chatbot import Chatbot
 from . import getHike
 from . import finalRecommender
 from .weather import get_weather
+from .filterExtractor import extract_filters, extract_keywords
+from .hikeDigest import build_hike_context
+from .gazetteer import Gazetteer
+from .hikePayload import project_hikes, HIKE_DIGEST_FIELDS
+from ..tracing import span
 import re  # Add this import
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
@@ -10,6 +15,20 @@ sys.stdout.reconfigure(encoding='utf-8')
 # Initialize chatbot
 chatbot = Chatbot()
 
+# Offline place-name lookup, GPT is only asked for places it does not know.
+# Starts with the bundled places, warm_up() adds the catalog's regions.
+gazetteer = Gazetteer.from_catalog()
+
+def warm_up():
+    """
+    Load the hike catalog and add its regions to the gazetteer.
+    Run in the background at startup, so the first chat request does not pay for it.
+    """
+    global gazetteer
+    hikes_df = getHike.load_catalog()
+    if hikes_df is not None and not hikes_df.empty:
+        gazetteer = Gazetteer.from_catalog(hikes_df)
+
 def chatbot_loop_api(user_input, user_id, is_group_chat=False):
     """
     Main API wrapper for chatbot interactions with user-specific memory.
@@ -18,6 +37,63 @@ def chatbot_loop_api(user_input, user_id, is_group_chat=False):
     if not user_input:
         return {"error": "No input provided"}
 
+    try:
+        return _dispatch_intent(user_input, user_id, is_group_chat)
+    finally:
+        # Persist only the session fields this turn touched
+        chatbot.save_session_memory(user_id)
+
+def chatbot_loop_stream(user_input, user_id, is_group_chat=False):
+    """
+    Streaming variant of chatbot_loop_api.
+    Yields (event, data) tuples: GPT replies arrive as "token" events while they are generated,
+    hike results as a "hikes" event as soon as the search finishes, and a final "done" event
+    carries the same payload chatbot_loop_api would have returned.
+    """
+    if not user_input:
+        yield "done", {"error": "No input provided"}
+        return
+
+    try:
+        intent = chatbot.categorize_intent(user_input, user_id)
+        yield "intent", {"intent": intent}
+
+        if intent in ("general_chat", "other", "clarification"):
+            if intent == "clarification":
+                last_hikes = chatbot.get_session_memory(user_id).get("last_recommended_hikes", [])
+                if not last_hikes:
+                    yield "done", {"response": NO_RECOMMENDATIONS_RESPONSE}
+                    return
+                system_prompt = build_clarification_prompt(user_input, last_hikes)
+            else:
+                system_prompt = chatbot._build_system_prompt("default", user_input)
+
+            tokens = []
+            for token in chatbot._stream_gpt(user_input, system_prompt, user_id, intent=intent):
+                tokens.append(token)
+                yield "token", {"text": token}
+            yield "done", {"response": "".join(tokens).strip()}
+            return
+
+        if intent in ("hike_recommendation", "adjust_filters"):
+            result = handle_hike_recommendation(user_input, user_id, is_group_chat)
+            if "hikes" in result:
+                yield "hikes", {"hikes": result["hikes"], "filters": result["filters"]}
+            yield "done", result
+            return
+
+        if intent == "weather":
+            yield "done", handle_weather(user_input, user_id)
+            return
+
+        yield "done", {"response": "🤖 Sorry, I didn't understand that."}
+    finally:
+        chatbot.save_session_memory(user_id)
+
+def _dispatch_intent(user_input, user_id, is_group_chat):
+    """
+    Categorize the user's intent and route the message to the matching handler.
+    """
     # Categorize user intent
     intent = chatbot.categorize_intent(user_input, user_id)
 
@@ -40,24 +116,17 @@ def handle_general_chat(user_input, user_id):
     Handles general conversation with the chatbot for a specific user.
     """
     general_prompt = chatbot._build_system_prompt("default", user_input)
-    response = chatbot._call_gpt(user_input, general_prompt, user_id)
+    response = chatbot._call_gpt(user_input, general_prompt, user_id, intent="general_chat")
     return {"response": response}
 
-def extract_keywords(user_input):
+def is_json_object(text):
     """
-    Extract important keywords from the user input that should be included in `description_match`.
+    Check whether GPT returned a parseable JSON object.
     """
-    # Define a list of common hiking-related keywords
-    hiking_keywords = ["waterfalls", "mountains", "forest", "easy", "challenging", "scenic", "rocky", "snowy", "lake",
-                       "river"]
-
-    # Use regex to find all matching keywords in the user input
-    keywords = []
-    for keyword in hiking_keywords:
-        if re.search(rf"\b{keyword}\b", user_input, re.IGNORECASE):
-            keywords.append(keyword)
-
-    return keywords
+    try:
+        return isinstance(json.loads(text), dict)
+    except json.JSONDecodeError:
+        return False
 
 def handle_hike_recommendation(user_input, user_id, is_group_chat=False):
     """
@@ -86,34 +155,63 @@ def handle_hike_recommendation(user_input, user_id, is_group_chat=False):
             if key not in user_filters or user_filters[key] is None:
                 user_filters[key] = default_value
 
-        # Extract new filters dynamically
-        system_prompt = chatbot._build_system_prompt("recommendation", user_input)
-        gpt_response = chatbot._call_gpt(user_input, system_prompt, user_id)
-
-        try:
-            new_filters = json.loads(gpt_response)
+        with span("filter_extraction"):
+            # Extract new filters with local rules first, GPT only fills in what they cannot resolve
+            rule_filters, unresolved = extract_filters(user_input, gazetteer)
+
+            if not unresolved:
+                print(f"⚡ Filters resolved locally: {rule_filters}")
+                chatbot.add_to_history(user_id, user_input, json.dumps(rule_filters))
+                new_filters = rule_filters
+            else:
+                system_prompt = chatbot._build_system_prompt("recommendation", user_input)
+                if rule_filters:
+                    system_prompt += f"""
+                These fields were already extracted, return them unchanged: {json.dumps(rule_filters)}
+                """
+                # If GPT is unavailable, search with whatever the rules could extract
+                fallback = json.dumps(rule_filters) if any(rule_filters.values()) else None
+                gpt_response = chatbot._call_gpt(
+                    user_input, system_prompt, user_id, intent="hike_recommendation",
+                    cache_mode="recommendation", cache_if=is_json_object, fallback=fallback
+                )
+
+                try:
+                    new_filters = json.loads(gpt_response)
+                except json.JSONDecodeError:
+                    print(f"❌ GPT Response was not valid JSON: {gpt_response}")
+                    return {"response": "I couldn't process your request. Could you provide more details?"}
+
+                # Prefer gazetteer coordinates over the ones GPT made up for a region
+                place = gazetteer.resolve(new_filters.get("region")) if new_filters.get("region") else None
+                if place:
+                    new_filters["point_lat"], new_filters["point_lon"] = place[1], place[2]
+
+                # Locally extracted values take precedence over GPT's guesses
+                for key, value in rule_filters.items():
+                    if key in list_based_filters and isinstance(new_filters.get(key), list):
+                        new_filters[key] = list(set(new_filters[key] + value))
+                    else:
+                        new_filters[key] = value
 
             # **Fallback: Manually extract keywords and append to `description_match`**
             extracted_keywords = extract_keywords(user_input)
-            if "description_match" not in new_filters:
+            if not isinstance(new_filters.get("description_match"), list):
                 new_filters["description_match"] = []
             new_filters["description_match"] = list(set(new_filters["description_match"] + extracted_keywords))
 
-            # Merge new filters with existing ones
-            for key, value in new_filters.items():
-                if key in list_based_filters and isinstance(value, list):
-                    # Append new values to existing lists
-                    user_filters[key] = list(set(user_filters[key] + value))
-                else:
-                    # Update other filters
-                    user_filters[key] = value
-
-        except json.JSONDecodeError:
-            print(f"❌ GPT Response was not valid JSON: {gpt_response}")
-            return {"response": "I couldn't process your request. Could you provide more details?"}
+        # Merge new filters with existing ones
+        for key, value in new_filters.items():
+            if key in list_based_filters and isinstance(value, list):
+                # Append new values to existing lists
+                user_filters[key] = list(set(user_filters[key] + value))
+            else:
+                # Update other filters
+                user_filters[key] = value
 
         # Fetch recommendations
-        recommendations_df = getHike.getHike(user_filters)
+        with span("hike_search"):
+            recommendations_df = getHike.getHike(user_filters)
 
         if not recommendations_df.empty:
             # Ensure all text fields exist and fill missing values
@@ -133,8 +231,8 @@ def handle_hike_recommendation(user_input, user_id, is_group_chat=False):
             # Convert to dict for frontend
             recommendations = recommendations_df.to_dict(orient="records")
 
-            # Store the last 5 recommended hikes in memory
-            memory["last_recommended_hikes"] = recommendations[-5:]  # Keep only the last 5 hikes
+            # Store the last 5 recommended hikes in memory, without score and internal columns
+            memory["last_recommended_hikes"] = project_hikes(recommendations[-5:], HIKE_DIGEST_FIELDS)
 
             # Check if the chatbot is being used in a group chat context
             if is_group_chat:
@@ -167,6 +265,28 @@ def handle_hike_recommendation(user_input, user_id, is_group_chat=False):
             "filters": user_filters  # Include full filter list in error case
         }
 
+NO_RECOMMENDATIONS_RESPONSE = "Hi either you have not yet asked for any recommendations or you are in a groupchat. Asking information about already recommended hikes is currently only supported under the HykingAI tab. Sorry for the inconvenience."
+
+def build_clarification_prompt(user_input, last_hikes):
+    """
+    Build the system prompt for questions about previously recommended hikes.
+    """
+    return f"""
+        You are a helpful hiking assistant. The user has asked a question about one of the last 5 hikes they were recommended.
+        Here is the information about the last 5 hikes:
+        {build_hike_context(user_input, last_hikes)}
+
+        The user's query is: "{user_input}"
+
+        Your task is to:
+        1. Determine if the user's query pertains to one of the hikes.
+        2. If it does, provide a detailed answer about that hike.
+        3. If it doesn't pertain to any specific hike, provide an answer for each of the 5 hikes.
+        4. If the query could apply to multiple hikes, provide an answer for each relevant hike.
+
+        Respond in a friendly and helpful tone.
+        """
+
 def handle_clarification(user_input, user_id):
     """
     Handles clarification requests dynamically for a specific user.
@@ -179,29 +299,15 @@ def handle_clarification(user_input, user_id):
     last_hikes = memory.get("last_recommended_hikes", [])
 
     if not last_hikes:
-        return {"response": "Hi either you have not yet asked for any recommendations or you are in a groupchat. Asking information about already recommended hikes is currently only supported under the HykingAI tab. Sorry for the inconvenience."}
+        return {"response": NO_RECOMMENDATIONS_RESPONSE}
 
     # Check if the user is asking about the last 5 hikes
     if True==True:
         # Prepare the system prompt for ChatGPT
-        system_prompt = f"""
-        You are a helpful hiking assistant. The user has asked a question about one of the last 5 hikes they were recommended.
-        Here is the information about the last 5 hikes:
-        {json.dumps(last_hikes, indent=2)}
-
-        The user's query is: "{user_input}"
-
-        Your task is to:
-        1. Determine if the user's query pertains to one of the hikes.
-        2. If it does, provide a detailed answer about that hike.
-        3. If it doesn't pertain to any specific hike, provide an answer for each of the 5 hikes.
-        4. If the query could apply to multiple hikes, provide an answer for each relevant hike.
-
-        Respond in a friendly and helpful tone.
-        """
+        system_prompt = build_clarification_prompt(user_input, last_hikes)
 
         # Call ChatGPT with the system prompt and user input
-        response = chatbot._call_gpt(user_input, system_prompt, user_id)
+        response = chatbot._call_gpt(user_input, system_prompt, user_id, intent="clarification")
 
         return {"response": response}
 
@@ -212,13 +318,13 @@ def handle_clarification(user_input, user_id):
 
     # If no missing filters, treat it as general chat
     general_prompt = chatbot._build_system_prompt("default", user_input)
-    response = chatbot._call_gpt(user_input, general_prompt, user_id)
+    response = chatbot._call_gpt(user_input, general_prompt, user_id, intent="general_chat")
     return {"response": response}
 
 def handle_weather(user_input, user_id):
     """
     Handles weather-related queries by fetching weather data from OpenWeatherMap API.
-    Uses ChatGPT to extract the city name from the user's input.
+    Looks the place up in the offline gazetteer and falls back to ChatGPT to extract the city name.
     """
     try:
         # Use ChatGPT to extract the city name from the user's input
@@ -231,15 +337,23 @@ def handle_weather(user_input, user_id):
             {"role": "user", "content": user_input},
         ]
 
-        # Call ChatGPT to extract the city name
-        location=chatbot._call_gpt(user_input, system_prompt, user_id)
+        # Resolve the place locally, only ask ChatGPT to extract the city name if that fails
+        place = gazetteer.find_in_text(user_input)
+        if place:
+            location = place[0]
+            chatbot.add_to_history(user_id, user_input, location)
+        else:
+            location=chatbot._call_gpt(user_input, system_prompt, user_id, intent="weather")
 
         # Validate the extracted location
         if location.lower() == "unknown" or not location:
             return {"response": "Please specify a location for the weather."}
 
-        # Fetch weather data
-        weather_data = get_weather(location)
+        # Fetch weather data, by coordinates if the place was resolved locally
+        if place:
+            weather_data = get_weather(location, lat=place[1], lon=place[2])
+        else:
+            weather_data = get_weather(location)
         return {
             "response": f"Weather in {location}: {weather_data['weather'][0]['description']}, Temperature: {weather_data['main']['temp']}°C",
             "weather": weather_data  # Include full weather data for the frontend
@@ -0,0 +1,312 @@
+import re
+
+# Common hiking-related keywords that always end up in `description_match`
+HIKING_KEYWORDS = ["waterfalls", "mountains", "forest", "easy", "challenging", "scenic", "rocky", "snowy", "lake",
+                   "river"]
+
+SCENERY_WORDS = {
+    "mountains": "mountains", "mountain": "mountains", "peak": "mountains", "summit": "mountains",
+    "forest": "forest", "forests": "forest", "woods": "forest",
+    "lake": "lake", "lakes": "lake",
+    "river": "river", "rivers": "river",
+    "waterfall": "waterfalls", "waterfalls": "waterfalls",
+    "gorge": "gorge", "meadow": "meadows", "meadows": "meadows",
+    "view": "views", "views": "views", "panorama": "views", "scenic": "views",
+}
+
+TERRAIN_WORDS = {
+    "rocky": "rocky", "snowy": "snowy", "muddy": "muddy", "gravel": "gravel",
+    "flat": "flat", "steep": "steep", "paved": "paved",
+}
+
+DIFFICULTY_WORDS = {
+    1: ["easy", "beginner", "beginners", "relaxed", "leisurely", "light", "gentle"],
+    2: ["medium", "moderate", "intermediate"],
+    3: ["hard", "difficult", "challenging", "strenuous", "advanced", "demanding", "tough"],
+}
+
+FITNESS_WORDS = {"beginner": "beginner", "beginners": "beginner", "intermediate": "intermediate",
+                 "advanced": "advanced"}
+
+SEASON_WORDS = {"winter": "winter", "summer": "summer", "spring": "spring", "autumn": "autumn",
+                "fall": "autumn"}
+
+WINTER_PATTERN = re.compile(r"\b(winter|snowshoe(ing)?|in the snow|december|january|february)\b", re.IGNORECASE)
+PET_PATTERN = re.compile(r"\b(dogs?|pets?|puppy|pet[- ]friendly|dog[- ]friendly)\b", re.IGNORECASE)
+
+# Requests that remove or negate something are left to GPT
+NEGATION_PATTERN = re.compile(
+    r"\b(not|no|don'?t|doesn'?t|without|except|avoid|skip|remove|anymore|instead|rather than)\b", re.IGNORECASE
+)
+
+NUMBER = r"(\d+(?:[.,]\d+)?)"
+APPROX = r"(around|about|approximately|approx\.?|roughly|circa|ca\.?|~)"
+UPPER = r"(under|less than|at most|max(?:imum)?|up to|no more than|shorter than|below|within)"
+LOWER = r"(over|more than|at least|min(?:imum)?|longer than|above)"
+
+LENGTH_UNITS = {"km": 1000, "kilometer": 1000, "kilometers": 1000, "kilometre": 1000, "kilometres": 1000,
+                "k": 1000, "mi": 1609, "mile": 1609, "miles": 1609}
+LENGTH_UNIT = r"(km|kilometers?|kilometres?|k|miles?|mi)\b"
+
+# Meters are just as often an altitude or an ascent, they only count as a length next to length wording
+METER_UNIT = r"(?:m|meters?|metres?)\b"
+METER_LENGTH_PATTERNS = [
+    rf"{NUMBER}\s*{METER_UNIT}\s+(?:long|in length)\b",
+    rf"\b(?:length|distance)\s+(?:of\s+)?(?:{UPPER}|{LOWER}|{APPROX})?\s*{NUMBER}\s*{METER_UNIT}",
+]
+LENGTH_WORDS = {"long", "length", "distance"}
+
+# Ascent/descent is not part of the filter schema, such numbers must not be read as a length or altitude
+ASCENT_WORDS = r"(?:ascent|descent|climb(?:ing)?|elevation gain|vertical|gain)"
+ASCENT_PATTERN = re.compile(
+    rf"{NUMBER}\s*{METER_UNIT}\s*(?:of\s+)?{ASCENT_WORDS}"
+    rf"|{ASCENT_WORDS}\s+(?:of\s+)?(?:{UPPER}|{LOWER}|{APPROX})?\s*{NUMBER}\s*{METER_UNIT}",
+    re.IGNORECASE,
+)
+
+DURATION_UNITS = {"h": 60, "hr": 60, "hrs": 60, "hour": 60, "hours": 60, "min": 1, "mins": 1, "minute": 1,
+                  "minutes": 1}
+DURATION_UNIT = r"(h|hrs?|hours?|mins?|minutes?)\b"
+
+ALTITUDE_CONTEXT = r"(altitude|elevation|above sea level|high|height)"
+
+RANGE_PATTERN = r"(?:between\s+)?{n}\s*(?:{u}\s*)?(?:-|–|to|and)\s*{n}\s*{u}"
+
+REGION_PATTERN = re.compile(
+    r"\b(?:near|in|around|close to|at|from)\s+((?:[A-ZÄÖÜ][\wäöüß\-]+)(?:\s(?:am|an|im|bei|[A-ZÄÖÜ][\wäöüß\-]+))*)"
+)
+
+NON_REGION_WORDS = {"Winter", "Summer", "Spring", "Autumn", "Fall", "December", "January", "February",
+                    "March", "April", "May", "June", "July", "August", "September", "October", "November",
+                    "I", "The"}
+
+# Words that carry no filter information and can safely be ignored
+FILLER_WORDS = {
+    "a", "an", "the", "i", "im", "i'm", "me", "my", "we", "us", "our", "you", "can", "could", "would", "will",
+    "please", "want", "wanna", "like", "looking", "look", "for", "find", "show", "give", "recommend",
+    "suggest", "some", "any", "something", "hike", "hikes", "hiking", "tour", "tours", "trail", "trails",
+    "route", "routes", "walk", "walks", "with", "and", "or", "to", "of", "that", "is", "are", "be", "in",
+    "near", "around", "about", "at", "from", "close", "on", "it", "one", "good", "nice", "great", "day",
+    "trip", "go", "do", "maybe", "also", "really", "very", "km", "kilometers", "kilometres", "meters",
+    "metres", "m", "k", "mi", "miles", "hours", "hour", "h", "hrs", "minutes", "min", "mins",
+    "duration", "altitude", "elevation", "high", "height", "sea", "level", "above",
+    "below", "under", "over", "less", "more", "than", "at", "least", "most", "max", "maximum", "min",
+    "minimum", "up", "between", "approximately", "approx", "roughly", "circa", "ca", "new", "another",
+    "other", "friendly", "pet", "pets", "dog", "dogs", "season", "time", "where", "there", "here",
+    "need", "have", "lets", "let's", "what", "which", "should", "take", "this", "weekend", "today",
+    "tomorrow", "hey", "hi", "hello", "hykingai",
+}
+
+
+def _to_float(value):
+    return float(value.replace(",", "."))
+
+
+def _apply_bound(filters, min_key, max_key, qualifier, value):
+    """
+    Translate a qualifier and a value into min/max filter fields.
+    """
+    qualifier = (qualifier or "").lower()
+    if re.fullmatch(APPROX, qualifier):
+        filters[min_key] = int(value * 0.8)
+        filters[max_key] = int(value * 1.2)
+    elif re.fullmatch(LOWER, qualifier):
+        filters[min_key] = int(value)
+    else:
+        filters[max_key] = int(value)
+
+
+def _extract_altitude(text, filters):
+    """
+    Extract altitude bounds and return the text with the matched parts removed.
+    """
+    patterns = [
+        rf"{ALTITUDE_CONTEXT}\s+(?:of\s+)?(?:{UPPER}|{LOWER}|{APPROX})?\s*{NUMBER}\s*(?:m|meters?|metres?)?\b",
+        rf"(?:{UPPER}|{LOWER}|{APPROX})?\s*{NUMBER}\s*(?:m|meters?|metres?)\s+{ALTITUDE_CONTEXT}",
+    ]
+    for index, pattern in enumerate(patterns):
+        for match in re.finditer(pattern, text, re.IGNORECASE):
+            groups = match.groups()
+            if index == 0:
+                qualifier = next((g for g in groups[1:4] if g), None)
+                value = _to_float(groups[4])
+            else:
+                qualifier = next((g for g in groups[0:3] if g), None)
+                value = _to_float(groups[3])
+            _apply_bound(filters, "min_altitude", "max_altitude", qualifier, value)
+            text = text.replace(match.group(0), " ")
+    return text
+
+
+def _extract_measure(text, filters, min_key, max_key, units, unit_pattern):
+    """
+    Extract ranges or single values with a unit (length or duration) into min/max fields.
+    """
+    range_match = re.search(RANGE_PATTERN.format(n=NUMBER, u=unit_pattern), text, re.IGNORECASE)
+    if range_match:
+        low, low_unit, high, unit = range_match.groups()
+        factor = units[unit.lower()]
+        low_factor = units[low_unit.lower()] if low_unit else factor
+        filters[min_key] = int(_to_float(low) * low_factor)
+        filters[max_key] = int(_to_float(high) * factor)
+        return text.replace(range_match.group(0), " ")
+
+    match = re.search(rf"(?:{APPROX}|{UPPER}|{LOWER})?\s*{NUMBER}\s*{unit_pattern}", text, re.IGNORECASE)
+    if match:
+        approx, upper, lower, value, unit = match.groups()
+        _apply_bound(filters, min_key, max_key, approx or upper or lower, _to_float(value) * units[unit.lower()])
+        return text.replace(match.group(0), " ")
+    return text
+
+
+def _extract_meter_length(text, filters):
+    """
+    Lengths given in meters, only when the wording makes clear that a length is meant ("800 m long").
+    """
+    for pattern in METER_LENGTH_PATTERNS:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            groups = match.groups()
+            qualifier = next((g for g in groups[:-1] if g), None)
+            value = groups[-1] if len(groups) > 1 else groups[0]
+            _apply_bound(filters, "min_length", "max_length", qualifier, _to_float(value))
+            return text.replace(match.group(0), " ")
+    return text
+
+
+def _words(text):
+    return re.findall(r"[a-zäöüß']+", text.lower())
+
+
+def extract_keywords(user_input):
+    """
+    Extract important keywords from the user input that should be included in `description_match`.
+    """
+    return [keyword for keyword in HIKING_KEYWORDS
+            if re.search(rf"\b{keyword}\b", user_input, re.IGNORECASE)]
+
+
+def extract_filters(user_input, gazetteer=None):
+    """
+    Rule-based extraction of the recommendation filter schema.
+    Region names are turned into coordinates with the gazetteer, if one is given.
+    Returns the filters that could be resolved locally and a list of fields that still need GPT.
+    An empty list means the GPT call can be skipped entirely.
+    """
+    filters = {}
+    unresolved = []
+
+    if NEGATION_PATTERN.search(user_input):
+        return filters, ["*"]
+
+    text = user_input
+    if ASCENT_PATTERN.search(text):
+        text = ASCENT_PATTERN.sub(" ", text)
+        unresolved.append("*")
+
+    text = _extract_altitude(text, filters)
+    text = _extract_measure(text, filters, "duration_min", "duration_max", DURATION_UNITS, DURATION_UNIT)
+    text = _extract_measure(text, filters, "min_length", "max_length", LENGTH_UNITS, LENGTH_UNIT)
+    if "min_length" not in filters and "max_length" not in filters:
+        text = _extract_meter_length(text, filters)
+
+    words = _words(text)
+    known = set(FILLER_WORDS)
+    # "long"/"short" without a number are left to GPT
+    if "min_length" in filters or "max_length" in filters:
+        known.update(LENGTH_WORDS)
+
+    for level, level_words in DIFFICULTY_WORDS.items():
+        if any(word in level_words for word in words):
+            filters["difficulty"] = level
+        known.update(level_words)
+
+    for word in words:
+        if word in FITNESS_WORDS:
+            filters["fitness_level"] = FITNESS_WORDS[word]
+        if word in SCENERY_WORDS:
+            filters.setdefault("scenery", []).append(SCENERY_WORDS[word])
+        if word in TERRAIN_WORDS:
+            filters.setdefault("terrain", []).append(TERRAIN_WORDS[word])
+        if word in SEASON_WORDS:
+            filters["season"] = SEASON_WORDS[word]
+    known.update(SCENERY_WORDS, TERRAIN_WORDS, SEASON_WORDS)
+
+    if WINTER_PATTERN.search(text):
+        filters["is_winter"] = True
+        filters.setdefault("season", "winter")
+        known.update(_words(" ".join(m.group(0) for m in WINTER_PATTERN.finditer(text))))
+
+    if PET_PATTERN.search(text):
+        filters["is_pet_friendly"] = True
+
+    for key in ("scenery", "terrain"):
+        if key in filters:
+            filters[key] = list(dict.fromkeys(filters[key]))
+
+    region_match = REGION_PATTERN.search(text)
+    if region_match and region_match.group(1).split()[0] not in NON_REGION_WORDS:
+        filters["region"] = region_match.group(1)
+        known.update(_words(region_match.group(1)))
+        match = gazetteer.match(filters["region"]) if gazetteer else None
+        if match and match[1]:
+            # The whole state has no point, which also clears the point of an earlier region
+            filters["region"], filters["point_lat"], filters["point_lon"] = match[0]
+        elif match:
+            # Prefix and fuzzy hits are only candidates, GPT picks the region
+            del filters["region"]
+            unresolved += ["region", "point_lat", "point_lon"]
+        else:
+            unresolved += ["point_lat", "point_lon"]
+
+    filters["description_match"] = list(dict.fromkeys(
+        extract_keywords(user_input) + filters.get("scenery", []) + filters.get("terrain", [])
+    ))
+
+    # Anything the rules could not explain is handed to GPT
+    leftover = [word for word in words if word not in known]
+    # as is any number none of the rules consumed ("a lake hike at 1000m")
+    if leftover or re.search(r"\d", text):
+        unresolved.append("*")
+
+    # Nothing usable found at all
+    if len(filters) == 1 and not filters["description_match"] and not unresolved:
+        unresolved.append("*")
+
+    return filters, list(dict.fromkeys(unresolved))
+
+
+# Phrases with the filters the rules must extract from them (None: must be left to GPT), checked by
+#   python filterExtractor.py
+EXAMPLES = [
+    ("easy hike under 10 km", {"difficulty": 1, "max_length": 10000}),
+    ("hike between 5 and 10 km", {"min_length": 5000, "max_length": 10000}),
+    ("10 km long hike", {"max_length": 10000}),
+    ("a hike 800 m long", {"max_length": 800}),
+    ("hike with a length of about 800 m", {"min_length": 640, "max_length": 960}),
+    ("hike above 1500 m altitude", {"min_altitude": 1500}),
+    ("around 3 hours lake hike", {"duration_min": 144, "duration_max": 216, "scenery": ["lake"]}),
+    ("hike with 800 m ascent", None),
+    ("elevation gain of 600m hike", None),
+    ("a lake hike at 1000m", None),
+    ("short hike", None),
+    ("long hike", None),
+    ("easy hike in Bavaria", {"difficulty": 1, "region": "Bayern", "point_lat": None, "point_lon": None}),
+    ("easy hike near Ober", None),
+]
+
+
+if __name__ == "__main__":
+    from gazetteer import Gazetteer
+
+    places = Gazetteer.from_catalog()
+    failures = 0
+    for phrase, expected in EXAMPLES:
+        filters, unresolved = extract_filters(phrase, places)
+        if expected is None:
+            ok = bool(unresolved) and not {"max_length", "min_length", "point_lat"} & filters.keys()
+        else:
+            ok = not unresolved and all(key in filters and filters[key] == value for key, value in expected.items())
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {phrase!r}: {filters}, unresolved {unresolved}")
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,144 @@
+import bisect
+import csv
+import os
+import re
+import unicodedata
+
+from rapidfuzz import fuzz, process
+
+PLACES_PATH = os.path.join(os.path.dirname(__file__), "places.csv")
+
+# Minimum query length for prefix matches and minimum score for fuzzy matches
+MIN_PREFIX_LENGTH = 4
+FUZZY_CUTOFF = 88
+
+PLACE_PREPOSITION = re.compile(r"\b(?:in|near|around|at|for|close to|from|to)\s+(.+)", re.IGNORECASE)
+WORD_PATTERN = re.compile(r"[\wäöüÄÖÜß\-]+")
+
+
+def normalize_place(name):
+    """
+    Lowercase, transliterate umlauts and drop punctuation so spelling variants share a key.
+    """
+    name = name.lower().replace("ä", "ae").replace("ö", "oe").replace("ü", "ue").replace("ß", "ss")
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", " ", name).strip()
+
+
+class Gazetteer:
+    """
+    Offline place-name lookup for region and city mentions.
+    Built from the bundled place list plus the centroids of the Activity catalog's
+    primary regions, with an exact index, a sorted prefix index and a fuzzy fallback.
+    """
+
+    def __init__(self):
+        self.places = {}  # normalized name -> (display name, lat, lon)
+        self.sorted_keys = []
+
+    def add(self, name, lat, lon, aliases=()):
+        """
+        Register a place under its name and aliases. Areas without a single point (the whole state)
+        are added with empty coordinates, so they set no point filter.
+        """
+        entry = (name, float(lat) if lat not in (None, "") else None, float(lon) if lon not in (None, "") else None)
+        for key in [name, *aliases]:
+            normalized = normalize_place(key)
+            if normalized and normalized not in self.places:
+                self.places[normalized] = entry
+
+    def build_index(self):
+        self.sorted_keys = sorted(self.places)
+
+    @classmethod
+    def from_catalog(cls, hikes_df=None, places_path=PLACES_PATH):
+        """
+        Build the gazetteer from the bundled place list and the hike catalog.
+        """
+        gazetteer = cls()
+        try:
+            with open(places_path, "r", encoding="utf-8") as file:
+                for row in csv.DictReader(file):
+                    aliases = [alias for alias in (row.get("aliases") or "").split("|") if alias]
+                    gazetteer.add(row["name"], row["lat"], row["lon"], aliases)
+        except OSError as e:
+            print(f"⚠️ Could not load bundled places: {e}")
+
+        columns = {"primaryRegion", "pointLat", "pointLon"}
+        if hikes_df is not None and not hikes_df.empty and columns.issubset(hikes_df.columns):
+            centroids = hikes_df.dropna(subset=["pointLat", "pointLon"]).groupby("primaryRegion")[
+                ["pointLat", "pointLon"]].mean()
+            for region, row in centroids.iterrows():
+                if region and region != "N/A":
+                    gazetteer.add(region, row["pointLat"], row["pointLon"])
+
+        gazetteer.build_index()
+        print(f"🗺️ Gazetteer built with {len(gazetteer.places)} place names")
+        return gazetteer
+
+    def _prefix_matches(self, key):
+        start = bisect.bisect_left(self.sorted_keys, key)
+        matches = []
+        for candidate in self.sorted_keys[start:]:
+            if not candidate.startswith(key):
+                break
+            matches.append(candidate)
+        return matches
+
+    def match(self, name, fuzzy=True):
+        """
+        Return ((display name, lat, lon), exact) for a place name, or None if it is unknown.
+        Tries an exact match, then a prefix match, then a fuzzy match. Only exact matches are
+        certain, prefix and fuzzy hits are candidates.
+        A prefix only matches if the query ends on a word boundary of the name ("reit im" for
+        "reit im winkl") or if all names starting with it belong to one place,
+        so "bavaria" does not turn into "bavarian forest" nor "ober" into "oberbayern".
+        """
+        key = normalize_place(name or "")
+        if not key:
+            return None
+        if key in self.places:
+            return self.places[key], True
+
+        if len(key) >= MIN_PREFIX_LENGTH:
+            matches = self._prefix_matches(key)
+            on_boundary = [candidate for candidate in matches if candidate[len(key)] == " "]
+            if on_boundary:
+                return self.places[min(on_boundary, key=len)], False
+            if matches and len({self.places[candidate] for candidate in matches}) == 1:
+                return self.places[matches[0]], False
+
+        if fuzzy and len(key) >= MIN_PREFIX_LENGTH:
+            match = process.extractOne(key, self.sorted_keys, scorer=fuzz.ratio, score_cutoff=FUZZY_CUTOFF)
+            if match:
+                return self.places[match[0]], False
+        return None
+
+    def resolve(self, name, fuzzy=True):
+        """
+        Return (display name, lat, lon) for a place name, or None if it is unknown.
+        Exact, prefix and fuzzy matches all count, see match().
+        """
+        match = self.match(name, fuzzy)
+        return match[0] if match else None
+
+    def find_in_text(self, text):
+        """
+        Find a place mentioned in free text, e.g. "What's the weather in Garmisch?".
+        Phrases after a preposition are tried first (with fuzzy matching), then exact matches of any word group.
+        """
+        match = PLACE_PREPOSITION.search(text)
+        if match:
+            words = WORD_PATTERN.findall(match.group(1))
+            for length in range(min(4, len(words)), 0, -1):
+                place = self.resolve(" ".join(words[:length]))
+                if place:
+                    return place
+
+        words = WORD_PATTERN.findall(text)
+        for length in (3, 2, 1):
+            for start in range(len(words) - length + 1):
+                key = normalize_place(" ".join(words[start:start + length]))
+                if len(key) >= MIN_PREFIX_LENGTH and key in self.places:
+                    return self.places[key]
+        return None
@@ -1,32 +1,20 @@
-import os
+import threading
 
 import pandas as pd
-from dotenv import load_dotenv
 
 from . import db
-import supabase
 from .finalRecommender import FinalRecommender
 from .locationScoring import LocationScoring
-from tabulate import tabulate
-
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
-env_path = os.path.join(project_root, ".env.local")
-load_dotenv(dotenv_path=env_path)
-
-
-SUPABASE_URL = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-SUPABASE_KEY = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("Supabase URL or API Key is missing. Check your .env.local file.")
-
-supabase_client = supabase.create_client(SUPABASE_URL, SUPABASE_KEY)
+from ..tracing import span
 
 def print_filtered_hikes(hikes_df):
     """
     Nicely print filtered hikes using tabulate.
     Displays all available columns from the DataFrame.
     """
+    # Only needed for debugging output
+    from tabulate import tabulate
+
     if hikes_df.empty:
         print("No hikes found matching the criteria.")
         return
@@ -42,15 +30,32 @@ def print_filtered_hikes(hikes_df):
     ))
 
 
-# Load hike data from the database
-try:
-    hikes_df = db.fetch_hike_data()
-    print("Columns in hikes_df:", hikes_df.columns)
-    print("Hike data loaded successfully!")
-except Exception as e:
-    print(f"Error loading hike data: {e}")
-    hikes_df = None
+# Hike catalog, loaded once on first use or by the warm-up at startup
+hikes_df = None
+catalog_loaded = threading.Event()
+_catalog_lock = threading.Lock()
+
 
+def load_catalog():
+    """
+    Return the hike catalog, fetching it from the database on the first call.
+    A failed fetch is retried on the next call instead of caching the empty result.
+    """
+    global hikes_df
+    if catalog_loaded.is_set():
+        return hikes_df
+    with _catalog_lock:
+        if not catalog_loaded.is_set():
+            try:
+                hikes_df = db.fetch_hike_data()
+                print("Columns in hikes_df:", hikes_df.columns)
+            except Exception as e:
+                print(f"Error loading hike data: {e}")
+                hikes_df = pd.DataFrame()
+            if not hikes_df.empty:
+                print("Hike data loaded successfully!")
+                catalog_loaded.set()
+    return hikes_df
 
 
 def getHike(user_filters):
@@ -60,11 +65,13 @@ def getHike(user_filters):
     location_scoring = LocationScoring(user_filters)
 
     # Step 1: Apply location-based scoring
-    hikes_with_scores = location_scoring.filter_and_score_hikes(hikes_df)
+    with span("location_scoring"):
+        hikes_with_scores = location_scoring.filter_and_score_hikes(load_catalog())
 
     # Step 2: Calculate final scores
-    final_recommender = FinalRecommender(user_filters, hikes_with_scores)
-    top_hikes = final_recommender.get_recommendations()
+    with span("final_recommender"):
+        final_recommender = FinalRecommender(user_filters, hikes_with_scores)
+        top_hikes = final_recommender.get_recommendations()
 
     # Step 3: Return top recommendations
     print("Top Recommended Hikes:\n", top_hikes[["id", "title", "final_score"]])
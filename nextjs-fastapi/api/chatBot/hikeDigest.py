@@ -0,0 +1,125 @@
+import html
+import re
+from collections import OrderedDict
+
+from rapidfuzz import fuzz
+
+from .historyManager import estimate_tokens
+
+# Characters of description kept in the digest of hikes the question is not about
+DIGEST_DESCRIPTION_CHARS = 200
+
+# Token budget for the hike information in a clarification prompt
+CLARIFICATION_TOKEN_BUDGET = 1200
+
+DIGEST_CACHE_SIZE = 2048
+
+ORDINALS = {
+    "first": 0, "1st": 0, "second": 1, "2nd": 1, "third": 2, "3rd": 2,
+    "fourth": 3, "4th": 3, "fifth": 4, "5th": 4, "last": -1,
+}
+
+ORDINAL_PATTERN = re.compile(
+    r"\b(first|1st|second|2nd|third|3rd|fourth|4th|fifth|5th|last)\b|(?:hike|tour|number|no\.?|#)\s*(\d)\b",
+    re.IGNORECASE,
+)
+
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+_digest_cache = OrderedDict()
+
+
+def strip_html(text):
+    """
+    Remove HTML tags and entities and collapse whitespace.
+    """
+    if not isinstance(text, str):
+        return ""
+    text = html.unescape(TAG_PATTERN.sub(" ", text))
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def truncate(text, max_chars):
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + "…"
+
+
+def _metric(value, unit="", scale=1, digits=0):
+    if value is None or value != value:  # None or NaN
+        return "?"
+    return f"{round(value / scale, digits):g}{unit}"
+
+
+def build_digest(hike, description_chars=DIGEST_DESCRIPTION_CHARS):
+    """
+    Compact one-line summary of a hike: key metrics plus a short plain-text description.
+    Cached per hike id.
+    """
+    cache_key = (hike.get("id"), description_chars)
+    if cache_key in _digest_cache:
+        _digest_cache.move_to_end(cache_key)
+        return _digest_cache[cache_key]
+
+    description = strip_html(hike.get("descriptionLong") or hike.get("descriptionShort") or hike.get("teaserText"))
+    parts = [
+        f"#{hike.get('id')} {hike.get('title', 'Unknown hike')}",
+        f"region: {hike.get('primaryRegion') or '?'}",
+        f"difficulty: {_metric(hike.get('difficulty'))}/3",
+        f"length: {_metric(hike.get('length'), ' km', 1000, 1)}",
+        f"duration: {_metric(hike.get('durationMin'), ' min')}",
+        f"ascent/descent: {_metric(hike.get('ascent'), ' m')}/{_metric(hike.get('descent'), ' m')}",
+        f"altitude: {_metric(hike.get('minAltitude'), ' m')}-{_metric(hike.get('maxAltitude'), ' m')}",
+    ]
+    if hike.get("isWinter"):
+        parts.append("winter hike")
+    if hike.get("publicTransportFriendly"):
+        parts.append("reachable by public transport")
+    if hike.get("isClosed"):
+        parts.append("currently closed")
+    if description:
+        parts.append(truncate(description, description_chars))
+    digest = " | ".join(parts)
+
+    _digest_cache[cache_key] = digest
+    while len(_digest_cache) > DIGEST_CACHE_SIZE:
+        _digest_cache.popitem(last=False)
+    return digest
+
+
+def find_referenced_hike(user_input, hikes):
+    """
+    Return the index of the hike the question is about, or None if it is not clear.
+    Matches ordinals ("the second hike", "hike 3") and hike titles.
+    """
+    match = ORDINAL_PATTERN.search(user_input)
+    if match:
+        index = ORDINALS[match.group(1).lower()] if match.group(1) else int(match.group(2)) - 1
+        if -len(hikes) <= index < len(hikes):
+            return index % len(hikes)
+
+    scores = [fuzz.partial_ratio(str(hike.get("title", "")).lower(), user_input.lower()) for hike in hikes]
+    if scores and max(scores) >= 85:
+        return scores.index(max(scores))
+    return None
+
+
+def build_hike_context(user_input, hikes, token_budget=CLARIFICATION_TOKEN_BUDGET):
+    """
+    Token-budgeted description of the recommended hikes for a clarification prompt.
+    Every hike gets a digest; the hike the question refers to also gets its full description.
+    """
+    referenced = find_referenced_hike(user_input, hikes)
+    digests = [f"{position + 1}. {build_digest(hike)}" for position, hike in enumerate(hikes)]
+    context = "\n".join(digests)
+
+    if referenced is not None:
+        remaining = token_budget - estimate_tokens(context)
+        description = strip_html(hikes[referenced].get("descriptionLong"))
+        if description and remaining > 0:
+            # About 4 characters per token, see estimate_tokens
+            context += (
+                f"\n\nFull description of hike {referenced + 1} "
+                f"({hikes[referenced].get('title')}):\n{truncate(description, remaining * 4)}"
+            )
+    return context
@@ -0,0 +1,33 @@
+# Fields the hike cards in the chat need; everything else is fetched lazily via /api/py/hikes
+HIKE_CARD_FIELDS = [
+    "id", "title", "teaserText", "difficulty", "length", "durationMin", "ascent", "descent",
+    "minAltitude", "maxAltitude", "pointLat", "pointLon", "primaryRegion", "primaryImageId",
+    "isWinter", "isClosed", "publicTransportFriendly", "landscapeRating", "experienceRating",
+    "staminaRating", "final_score",
+]
+
+# Fields kept in session memory for clarification questions (see hikeDigest)
+HIKE_DIGEST_FIELDS = HIKE_CARD_FIELDS + ["descriptionShort", "descriptionLong"]
+
+
+def parse_fields(fields):
+    """
+    Turn a `fields=` query value ("descriptionLong,ascent" or "*") into a list, None means all fields.
+    """
+    if not fields:
+        return []
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    return None if "*" in requested else requested
+
+
+def project_hike(hike, fields=HIKE_CARD_FIELDS, extra_fields=()):
+    """
+    Keep only the given fields (plus any requested extras) of a hike record.
+    """
+    if extra_fields is None:
+        return dict(hike)
+    return {key: hike[key] for key in [*fields, *extra_fields] if key in hike}
+
+
+def project_hikes(hikes, fields=HIKE_CARD_FIELDS, extra_fields=()):
+    return [project_hike(hike, fields, extra_fields) for hike in hikes]
@@ -0,0 +1,142 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Token budget for the history part of a single GPT call (system prompt excluded)
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+
+# Number of most recent user/assistant turns that are always kept verbatim
+KEEP_RECENT_TURNS = int(os.getenv("CHAT_KEEP_RECENT_TURNS", "4"))
+
+# Older messages are summarised once the prompt would exceed the budget or this many have piled up
+COMPACT_MIN_MESSAGES = int(os.getenv("CHAT_COMPACT_MIN_MESSAGES", "8"))
+
+# Hard cap on stored messages in case summaries cannot be generated
+MAX_STORED_MESSAGES = int(os.getenv("CHAT_MAX_STORED_MESSAGES", "40"))
+
+# Intents whose prompts are self-contained and do not need the conversation
+HISTORY_FREE_INTENTS = {"weather", "categorization"}
+
+
+def estimate_tokens(text):
+    """
+    Rough token estimate (about 4 characters per token for English text).
+    """
+    return len(text or "") // 4 + 1
+
+
+class HistoryManager:
+    """
+    Keeps the conversation history sent to GPT within a token budget.
+    Recent turns are kept verbatim, older turns are folded into a running summary
+    that is generated in a background thread so it never delays a response.
+    """
+
+    def __init__(self, summarize, token_budget=HISTORY_TOKEN_BUDGET, keep_recent_turns=KEEP_RECENT_TURNS,
+                 compact_min_messages=COMPACT_MIN_MESSAGES):
+        # summarize(previous_summary, messages) -> new summary string
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.keep_recent_messages = keep_recent_turns * 2
+        self.compact_min_messages = compact_min_messages
+        # run_locked(user_id, func) runs func under the session's turn lock, set by the app
+        # (SessionTurnCoordinator.run_locked); without it only this process's lock is held
+        self.run_locked = None
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+        self.lock = threading.Lock()
+        self.pending = set()
+
+    def build_messages(self, system_prompt, memory, intent=None):
+        """
+        Build the message list for a GPT call from the system prompt, the running summary
+        and as many recent messages as fit into the token budget.
+        """
+        history = memory.get("history", [])
+        messages = [{"role": "system", "content": system_prompt}]
+
+        if intent in HISTORY_FREE_INTENTS:
+            # Only the latest user message is relevant
+            return messages + history[-1:]
+
+        summary = memory.get("summary")
+        budget = self.token_budget
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+            budget -= estimate_tokens(summary)
+
+        selected = []
+        for message in reversed(history):
+            cost = estimate_tokens(message["content"])
+            # The latest message is always sent, even if it alone exceeds the budget
+            if selected and cost > budget:
+                break
+            selected.append(message)
+            budget -= cost
+
+        return messages + list(reversed(selected))
+
+    def cap_history(self, memory):
+        """
+        Drop the oldest messages outright if summaries are lagging behind.
+        """
+        history = memory.get("history", [])
+        if len(history) > MAX_STORED_MESSAGES:
+            del history[:len(history) - MAX_STORED_MESSAGES]
+
+    def needs_compaction(self, history, summary):
+        """
+        Only summarise when the prompt no longer fits the budget or a sizeable block of older turns
+        has built up, not every time a turn ages out of the recent window.
+        """
+        older = history[:-self.keep_recent_messages] if self.keep_recent_messages else list(history)
+        if not older:
+            return []
+        tokens = estimate_tokens(summary) if summary else 0
+        tokens += sum(estimate_tokens(message["content"]) for message in history)
+        if tokens > self.token_budget or len(older) >= self.compact_min_messages:
+            return older
+        return []
+
+    def maybe_compact(self, memory):
+        """
+        Schedule summarisation of everything older than the recent turns, if it is due.
+        `memory` is a saved sessionStore.Session, the compacted fields are written back to its store.
+        """
+        older = self.needs_compaction(memory.get("history", []), memory.get("summary"))
+        if not older:
+            return
+
+        with self.lock:
+            if memory.user_id in self.pending:
+                return
+            self.pending.add(memory.user_id)
+
+        self.executor.submit(self._compact, memory, list(older), memory.get("summary"))
+
+    def _compact(self, memory, older, previous_summary):
+        try:
+            # The LLM call runs without any lock, only applying its result has to wait for the turn lock
+            summary = self.summarize(previous_summary, older)
+            if not summary:
+                return
+
+            def apply():
+                # Re-read the stored state, another turn may have updated it meanwhile
+                memory.refresh(["history", "summary"])
+                history = memory["history"]
+                # Only trim if the session was not cleared or trimmed meanwhile
+                if history[:len(older)] == older:
+                    del history[:len(older)]
+                    memory["summary"] = summary
+                    memory.save(["history", "summary"])
+
+            if self.run_locked is not None:
+                self.run_locked(memory.user_id, apply)
+            else:
+                with self.lock:
+                    apply()
+        except Exception as e:
+            print(f"⚠️ Could not summarise conversation history: {e}")
+        finally:
+            with self.lock:
+                self.pending.discard(memory.user_id)
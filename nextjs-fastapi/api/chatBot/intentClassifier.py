@@ -0,0 +1,256 @@
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+# Confidence required before the local answer is trusted over GPT
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.85"))
+
+# The naive Bayes tier only answers once it has seen enough labelled messages
+MIN_TRAINING_SAMPLES = int(os.getenv("INTENT_MIN_TRAINING_SAMPLES", "50"))
+
+# Messages labelled by GPT are appended here and used to train the local model
+INTENT_LOG_PATH = os.getenv(
+    "INTENT_LOG_PATH", os.path.join(os.path.dirname(__file__), "intent_log.jsonl")
+)
+
+VALID_INTENTS = ["general_chat", "hike_recommendation", "clarification", "adjust_filters", "weather", "other"]
+
+RULE_CONFIDENCE = 0.95
+
+HIKE_NOUNS = r"(hikes?|hiking|trails?|tours?|routes?|walks?)"
+
+INTENT_RULES = {
+    "weather": [
+        re.compile(r"\b(weather|forecast|temperature|raining|rainy|sunny|windy|snowing)\b", re.IGNORECASE),
+        re.compile(r"\b(will|is) it (rain|snow)\b", re.IGNORECASE),
+    ],
+    "hike_recommendation": [
+        re.compile(
+            rf"\b(recommend|suggest|find|show|looking for|search(ing)? for|want|give me|any|plan)\b.*\b{HIKE_NOUNS}\b",
+            re.IGNORECASE,
+        ),
+        re.compile(rf"\b(easy|medium|moderate|hard|difficult|challenging|short|long)\s+{HIKE_NOUNS}\b", re.IGNORECASE),
+        re.compile(rf"\b{HIKE_NOUNS}\b.*\b(near|around|in|close to)\s+[A-ZÄÖÜ]"),
+    ],
+    "general_chat": [
+        re.compile(
+            r"^\s*(hi|hello|hey|hallo|servus|moin|thanks|thank you|thx|bye|goodbye|good (morning|afternoon|evening)"
+            r"|how are you( doing)?|what'?s up|who are you|ok(ay)?|cool|great|nice)\b[\s!.,?]*(there|hykingai|again)?[\s!.?]*$",
+            re.IGNORECASE,
+        ),
+    ],
+}
+
+# References to earlier recommendations are left to GPT, they need the chat history
+CLARIFICATION_HINTS = re.compile(
+    r"\b(first|second|third|fourth|fifth|last|that|this|previous|these|those)\s+(one|ones|hike|hikes|tour|tours|trail|trails|route)\b",
+    re.IGNORECASE,
+)
+
+TOKEN_PATTERN = re.compile(r"[a-zäöüß]+")
+
+# Small seed set so the model is usable before any messages are logged
+SEED_MESSAGES = [
+    ("what's the weather like in munich", "weather"),
+    ("will it rain tomorrow in garmisch", "weather"),
+    ("how cold is it in the alps today", "weather"),
+    ("temperature in berchtesgaden", "weather"),
+    ("recommend me a hike near munich", "hike_recommendation"),
+    ("i want an easy hike with a lake", "hike_recommendation"),
+    ("find a challenging tour in the mountains", "hike_recommendation"),
+    ("show me hikes with waterfalls", "hike_recommendation"),
+    ("only easy hikes please", "adjust_filters"),
+    ("i don't care about waterfalls anymore", "adjust_filters"),
+    ("make it shorter", "adjust_filters"),
+    ("how long is the second hike", "clarification"),
+    ("is the first one suitable for dogs", "clarification"),
+    ("tell me more about that tour", "clarification"),
+    ("hello", "general_chat"),
+    ("how are you", "general_chat"),
+    ("thanks a lot", "general_chat"),
+    ("what can you do", "general_chat"),
+    ("asdf", "other"),
+    ("what is the capital of france", "other"),
+]
+
+
+def tokenize(text):
+    """
+    Lowercase the text and split it into word tokens.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class NaiveBayesIntentModel:
+    """
+    Multinomial naive Bayes over word counts, implemented with NumPy.
+    Supports incremental training so newly labelled messages are used immediately.
+    Training and prediction share a lock, requests run in several threadpool workers.
+    """
+
+    def __init__(self, labels):
+        self.labels = list(labels)
+        self.vocab = {}
+        self.token_counts = np.zeros((len(self.labels), 0))
+        self.doc_counts = np.zeros(len(self.labels))
+        self.lock = threading.Lock()
+
+    @property
+    def n_samples(self):
+        return int(self.doc_counts.sum())
+
+    def partial_fit(self, text, label):
+        """
+        Add a single labelled message to the model.
+        """
+        if label not in self.labels:
+            return
+        tokens = tokenize(text)
+        row = self.labels.index(label)
+        with self.lock:
+            new_tokens = [t for t in dict.fromkeys(tokens) if t not in self.vocab]
+            if new_tokens:
+                # Widen the count matrix before the new tokens become visible in the vocabulary
+                self.token_counts = np.hstack(
+                    [self.token_counts, np.zeros((len(self.labels), len(new_tokens)))]
+                )
+                for token in new_tokens:
+                    self.vocab[token] = len(self.vocab)
+
+            self.doc_counts[row] += 1
+            for token in tokens:
+                self.token_counts[row, self.vocab[token]] += 1
+
+    def predict_proba(self, text):
+        """
+        Return the posterior probability per label, or None if no known token is present.
+        """
+        tokens = tokenize(text)
+        with self.lock:
+            indices = [self.vocab[t] for t in tokens if t in self.vocab]
+            if not indices or self.n_samples == 0:
+                return None
+
+            vocab_size = len(self.vocab)
+            log_prior = np.log((self.doc_counts + 1) / (self.n_samples + len(self.labels)))
+            totals = self.token_counts.sum(axis=1) + vocab_size
+            log_likelihood = np.log((self.token_counts[:, indices] + 1) / totals[:, None]).sum(axis=1)
+
+        scores = log_prior + log_likelihood
+        scores -= scores.max()
+        probabilities = np.exp(scores)
+        return probabilities / probabilities.sum()
+
+
+class IntentClassifier:
+    """
+    Local fast path for intent detection.
+    Keyword rules answer the obvious cases, a naive Bayes model trained on logged
+    GPT decisions handles the rest. Callers fall back to GPT when classify() returns None.
+    """
+
+    def __init__(self, log_path=INTENT_LOG_PATH, threshold=INTENT_CONFIDENCE_THRESHOLD):
+        self.log_path = log_path
+        self.threshold = threshold
+        self.model = NaiveBayesIntentModel(VALID_INTENTS)
+        self.lookups = 0
+        self.hits = 0
+
+        for text, intent in SEED_MESSAGES:
+            self.model.partial_fit(text, intent)
+        self._load_log()
+
+    def _load_log(self):
+        """
+        Train the model on previously logged messages.
+        """
+        if not self.log_path or not os.path.exists(self.log_path):
+            return
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    self.model.partial_fit(entry["text"], entry["intent"])
+            print(f"🧠 Intent model trained on {self.model.n_samples} messages")
+        except Exception as e:
+            print(f"⚠️ Could not load intent log: {e}")
+
+    def match_rules(self, user_input):
+        """
+        Return the intent if exactly one rule category matches, otherwise None.
+        """
+        if CLARIFICATION_HINTS.search(user_input):
+            return None
+        matches = [
+            intent for intent, patterns in INTENT_RULES.items()
+            if any(pattern.search(user_input) for pattern in patterns)
+        ]
+        return matches[0] if len(matches) == 1 else None
+
+    def predict(self, user_input):
+        """
+        Return (intent, confidence) from the rules or the model, without threshold checks.
+        """
+        intent = self.match_rules(user_input)
+        if intent:
+            return intent, RULE_CONFIDENCE
+
+        if self.model.n_samples < MIN_TRAINING_SAMPLES:
+            return None, 0.0
+
+        probabilities = self.model.predict_proba(user_input)
+        if probabilities is None:
+            return None, 0.0
+        best = int(np.argmax(probabilities))
+        return self.labels[best], float(probabilities[best])
+
+    @property
+    def labels(self):
+        return self.model.labels
+
+    def classify(self, user_input):
+        """
+        Return the intent if the local tiers are confident enough, otherwise None.
+        """
+        self.lookups += 1
+        intent, confidence = self.predict(user_input)
+        if intent is None or confidence < self.threshold:
+            return None
+
+        self.hits += 1
+        print(f"⚡ Fast-path intent: {intent} ({confidence:.2f}), hit rate {self.hit_rate():.1%}")
+        return intent
+
+    def record(self, user_input, intent):
+        """
+        Learn from an intent decided by GPT and append it to the log.
+        """
+        if intent not in VALID_INTENTS:
+            return
+        self.model.partial_fit(user_input, intent)
+        if not self.log_path:
+            return
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps({"text": user_input, "intent": intent}, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not write intent log: {e}")
+
+    def hit_rate(self):
+        """
+        Share of lookups answered without calling GPT.
+        """
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def stats(self):
+        return {
+            "lookups": self.lookups,
+            "fast_path_hits": self.hits,
+            "hit_rate": round(self.hit_rate(), 4),
+            "training_samples": self.model.n_samples,
+        }
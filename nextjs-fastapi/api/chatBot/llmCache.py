@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+# The temp dir is the only writable location on serverless deployments, the cache is per instance there
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(tempfile.gettempdir(), "hyking_llm_cache.db"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(20 * 1024 * 1024)))
+
+
+def normalize_input(text):
+    """
+    Normalise user input so trivially different phrasings share a cache entry.
+    """
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip(" .!?")
+
+
+def cache_key(mode, model, text, context=None):
+    """
+    `context` is everything else the reply depends on (the full prompt, the temperature), so prompts
+    that include a user's history only ever match the same history.
+    """
+    raw = f"{mode}\x1f{model}\x1f{normalize_input(text)}"
+    if context is not None:
+        raw += "\x1f" + json.dumps(context, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Disk-backed cache for GPT calls (intent categorisation, filter extraction).
+    Entries are keyed on (prompt mode, model, normalised input) plus, for prompts that depend on more
+    than the input, the prompt context, and evicted least recently used first once the entry or size
+    limit is exceeded.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, max_bytes=LLM_CACHE_MAX_BYTES,
+                 enabled=LLM_CACHE_ENABLED):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_latency = 0.0
+        if not self.enabled:
+            return
+
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                mode TEXT,
+                model TEXT,
+                response TEXT,
+                latency REAL,
+                size INTEGER,
+                last_used REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)")
+        self.conn.commit()
+
+    def get(self, mode, model, text, context=None):
+        """
+        Return the cached response or None.
+        """
+        if not self.enabled:
+            return None
+        key = cache_key(mode, model, text, context)
+        with self.lock:
+            row = self.conn.execute("SELECT response, latency FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            self.hits += 1
+            self.saved_latency += row[1] or 0.0
+        print(f"💾 LLM cache hit ({mode}), hit ratio {self.hit_ratio():.1%}")
+        return row[0]
+
+    def put(self, mode, model, text, response, latency, context=None):
+        """
+        Store a response together with the latency it took to generate it.
+        """
+        if not self.enabled:
+            return
+        key = cache_key(mode, model, text, context)
+        size = len(response.encode("utf-8"))
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, mode, model, response, latency, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, mode, model, response, latency, size, time.time()),
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        count, total_size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        if count <= self.max_entries and total_size <= self.max_bytes:
+            return
+        # Drop the least recently used tenth in one go so eviction does not run on every insert
+        excess = max(count - self.max_entries, count // 10, 1)
+        self.conn.execute(
+            "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio(), 4),
+            "saved_latency_seconds": round(self.saved_latency, 3),
+        }
@@ -0,0 +1,150 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus sense.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{str(value).replace(chr(34), "")}"' for key, value in labels.items()) + "}"
+
+
+class LLMMetrics:
+    """
+    In-process counters and latency histograms for OpenAI calls, labelled by model and intent.
+    Recording is a dictionary update under a lock, so it can stay on in production.
+    Rendered in the Prometheus text format by /api/py/metrics.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)  # (model, intent, status) -> count
+        self.errors = defaultdict(int)  # (model, intent, error type) -> count
+        self.tokens = defaultdict(int)  # (model, intent, kind) -> count
+        self.latency = defaultdict(Histogram)  # (model, intent) -> Histogram
+        self.first_token = defaultdict(Histogram)  # (model, intent) -> Histogram, streams only
+
+    def observe(self, model, intent, latency, usage=None, error=None, first_token=None):
+        """
+        Record one completed (or failed) OpenAI call.
+        """
+        status = "error" if error else "ok"
+        with self.lock:
+            self.requests[(model, intent, status)] += 1
+            self.latency[(model, intent)].observe(latency)
+            if first_token is not None:
+                self.first_token[(model, intent)].observe(first_token)
+            if error:
+                self.errors[(model, intent, type(error).__name__)] += 1
+            if usage is not None:
+                self.tokens[(model, intent, "prompt")] += getattr(usage, "prompt_tokens", 0) or 0
+                self.tokens[(model, intent, "completion")] += getattr(usage, "completion_tokens", 0) or 0
+
+    def render(self):
+        """
+        Prometheus text exposition of all LLM metrics.
+        """
+        lines = []
+        with self.lock:
+            lines += ["# HELP hyking_llm_requests_total OpenAI chat completion calls.",
+                      "# TYPE hyking_llm_requests_total counter"]
+            for (model, intent, status), count in sorted(self.requests.items()):
+                lines.append(f"hyking_llm_requests_total{_labels(model=model, intent=intent, status=status)} {count}")
+
+            lines += ["# HELP hyking_llm_errors_total Failed OpenAI calls by exception type.",
+                      "# TYPE hyking_llm_errors_total counter"]
+            for (model, intent, error), count in sorted(self.errors.items()):
+                lines.append(f"hyking_llm_errors_total{_labels(model=model, intent=intent, error=error)} {count}")
+
+            lines += ["# HELP hyking_llm_tokens_total Prompt and completion tokens reported by OpenAI.",
+                      "# TYPE hyking_llm_tokens_total counter"]
+            for (model, intent, kind), count in sorted(self.tokens.items()):
+                lines.append(f"hyking_llm_tokens_total{_labels(model=model, intent=intent, type=kind)} {count}")
+
+            for name, description, histograms in (
+                ("hyking_llm_latency_seconds", "Duration of OpenAI calls.", self.latency),
+                ("hyking_llm_first_token_seconds", "Time until the first streamed token.", self.first_token),
+            ):
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+                for (model, intent), histogram in sorted(histograms.items()):
+                    cumulative = 0
+                    for bound, count in zip([*histogram.buckets, "+Inf"], histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(model=model, intent=intent, le=bound)} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(model=model, intent=intent)} {histogram.total:.6f}")
+                    lines.append(f"{name}_count{_labels(model=model, intent=intent)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def render_gauges(prefix, stats):
+    """
+    Expose the numeric values of a stats() dict as Prometheus gauges.
+    """
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        lines += [f"# TYPE {prefix}_{key} gauge", f"{prefix}_{key} {value}"]
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+llm_metrics = LLMMetrics()
+
+
+def instrumented_completion(create, intent, **kwargs):
+    """
+    Call `create(**kwargs)` (chat.completions.create) and record latency, tokens and errors.
+    Streams are wrapped, so they are recorded once the last chunk has been read;
+    usage is requested from the API for them.
+    """
+    model = kwargs.get("model", "unknown")
+    started = time.perf_counter()
+    if kwargs.get("stream"):
+        kwargs.setdefault("stream_options", {"include_usage": True})
+    try:
+        response = create(**kwargs)
+    except Exception as e:
+        llm_metrics.observe(model, intent, time.perf_counter() - started, error=e)
+        raise
+
+    if not kwargs.get("stream"):
+        llm_metrics.observe(model, intent, time.perf_counter() - started, usage=getattr(response, "usage", None))
+        return response
+    return _instrumented_stream(response, model, intent, started)
+
+
+def _instrumented_stream(stream, model, intent, started):
+    first_token = None
+    usage = None
+    error = None
+    try:
+        for chunk in stream:
+            if first_token is None and chunk.choices:
+                first_token = time.perf_counter() - started
+            usage = getattr(chunk, "usage", None) or usage
+            yield chunk
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        llm_metrics.observe(model, intent, time.perf_counter() - started, usage=usage, error=error,
+                            first_token=first_token)
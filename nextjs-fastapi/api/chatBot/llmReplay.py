@@ -0,0 +1,182 @@
+import hashlib
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+
+# Where recorded chat completions are written to and replayed from
+LLM_FIXTURE_PATH = os.getenv("LLM_FIXTURE_PATH", os.path.join(os.path.dirname(__file__), "llm_fixtures.jsonl"))
+
+# Synthetic latency of replayed completions, e.g. 800 ms ± 30 %
+LLM_REPLAY_LATENCY_MS = float(os.getenv("LLM_REPLAY_LATENCY_MS", "800"))
+LLM_REPLAY_JITTER = float(os.getenv("LLM_REPLAY_JITTER", "0.3"))
+
+# Replies used when nothing comparable was recorded, keyed by max_tokens (categorization asks for 10)
+DEFAULT_REPLIES = {10: "general_chat"}
+DEFAULT_REPLY = "This is a replayed response."
+
+STREAM_CHUNK_CHARS = 16
+
+
+def fixture_key(kwargs):
+    """
+    Replays are matched on model, max_tokens and the last user message.
+    History and summaries differ between sessions, so they are not part of the key.
+    """
+    last_user = next((m["content"] for m in reversed(kwargs.get("messages", [])) if m.get("role") == "user"), "")
+    raw = f"{kwargs.get('model')}\x1f{kwargs.get('max_tokens')}\x1f{last_user.strip().lower()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _usage(prompt_tokens, completion_tokens):
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                           total_tokens=prompt_tokens + completion_tokens)
+
+
+def _completion(content, usage):
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")], usage=usage)
+
+
+def _chunk(content=None, usage=None):
+    if content is None:
+        return SimpleNamespace(choices=[], usage=usage)
+    delta = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)], usage=None)
+
+
+class RecordingCompletions:
+    """
+    Wraps the real `chat.completions` and appends every request/response pair to a JSONL fixture file.
+    """
+
+    def __init__(self, completions, path=LLM_FIXTURE_PATH):
+        self.completions = completions
+        self.path = path
+        self.lock = threading.Lock()
+
+    def _write(self, kwargs, content, usage):
+        entry = {
+            "key": fixture_key(kwargs),
+            "request": {key: value for key, value in kwargs.items() if key not in ("stream_options", "timeout")},
+            "response": {
+                "content": content,
+                "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+                "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            },
+        }
+        with self.lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def create(self, **kwargs):
+        response = self.completions.create(**kwargs)
+        if not kwargs.get("stream"):
+            self._write(kwargs, response.choices[0].message.content, response.usage)
+            return response
+        return self._record_stream(response, kwargs)
+
+    def _record_stream(self, stream, kwargs):
+        parts = []
+        usage = None
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            usage = getattr(chunk, "usage", None) or usage
+            yield chunk
+        self._write(kwargs, "".join(parts), usage)
+
+
+class ReplayCompletions:
+    """
+    Serves recorded completions with synthetic latency instead of calling OpenAI.
+    Unknown requests get a recorded reply of the same kind (same max_tokens), round-robin,
+    or a canned default, so load tests never fail on a fixture miss.
+    """
+
+    def __init__(self, path=LLM_FIXTURE_PATH, latency_ms=LLM_REPLAY_LATENCY_MS, jitter=LLM_REPLAY_JITTER):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.by_key = {}
+        self.by_kind = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    self.by_key.setdefault(entry["key"], []).append(entry["response"])
+                    self.by_kind.setdefault(entry["request"].get("max_tokens"), []).append(entry["response"])
+        self.cycles = {key: itertools.cycle(responses) for key, responses in self.by_key.items()}
+        self.kind_cycles = {kind: itertools.cycle(responses) for kind, responses in self.by_kind.items()}
+        self.lock = threading.Lock()
+        print(f"🎞️ Replaying {sum(map(len, self.by_key.values()))} recorded completions from {path}")
+
+    def _lookup(self, kwargs):
+        with self.lock:
+            cycle = self.cycles.get(fixture_key(kwargs))
+            if cycle is not None:
+                self.hits += 1
+                return next(cycle)
+            self.misses += 1
+            cycle = self.kind_cycles.get(kwargs.get("max_tokens"))
+            if cycle is not None:
+                return next(cycle)
+        content = DEFAULT_REPLIES.get(kwargs.get("max_tokens"), DEFAULT_REPLY)
+        return {"content": content, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def _latency(self):
+        return max(0.0, self.latency_ms * random.uniform(1 - self.jitter, 1 + self.jitter)) / 1000
+
+    def create(self, **kwargs):
+        response = self._lookup(kwargs)
+        usage = _usage(response["prompt_tokens"], response["completion_tokens"])
+        if not kwargs.get("stream"):
+            time.sleep(self._latency())
+            return _completion(response["content"], usage)
+        return self._replay_stream(response["content"], usage)
+
+    def _replay_stream(self, content, usage):
+        # Half of the latency until the first token, the rest spread over the chunks
+        latency = self._latency()
+        chunks = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)] or [""]
+        time.sleep(latency / 2)
+        for chunk in chunks:
+            yield _chunk(chunk)
+            time.sleep(latency / 2 / len(chunks))
+        yield _chunk(usage=usage)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0}
+
+
+class LLMClient:
+    """
+    Minimal stand-in exposing `client.chat.completions.create` like openai.Client.
+    """
+
+    def __init__(self, completions):
+        self.chat = SimpleNamespace(completions=completions)
+
+
+def create_llm_client(backend, api_key=None):
+    """
+    Build the chat completion client for LLM_BACKEND: "openai" (default), "record" or "replay".
+    """
+    if backend == "replay":
+        return LLMClient(ReplayCompletions())
+    # Retries and timeouts are handled by ResilientLLMCaller
+    client = openai.Client(api_key=api_key, max_retries=0)
+    if backend == "record":
+        print(f"📼 Recording chat completions to {LLM_FIXTURE_PATH}")
+        return LLMClient(RecordingCompletions(client.chat.completions))
+    if backend != "openai":
+        raise ValueError(f"Unknown LLM_BACKEND: {backend}")
+    return client
@@ -0,0 +1,213 @@
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import openai
+
+# Total time budget per intent (seconds), retries and hedges included
+INTENT_DEADLINES = {
+    "categorization": 4,
+    "weather": 5,
+    "hike_recommendation": 12,
+    "clarification": 15,
+    "general_chat": 15,
+    "other": 15,
+    "summary": 30,
+}
+LLM_DEFAULT_DEADLINE = float(os.getenv("LLM_DEFAULT_DEADLINE", "15"))
+
+# Jittered exponential backoff between attempts
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = 0.25
+LLM_BACKOFF_CAP = 2.0
+
+# Hedging: send a duplicate request once a call is slower than the p95 of recent calls
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# Circuit breaker: open after this many consecutive upstream failures, probe again after the cooldown
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError, TimeoutError)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling OpenAI while the circuit breaker is open.
+    """
+
+
+def is_retryable(error):
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+def backoff_delay(attempt):
+    """
+    Full-jitter exponential backoff: uniform(0, min(cap, base * 2^attempt)).
+    """
+    return random.uniform(0, min(LLM_BACKOFF_CAP, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `threshold` consecutive upstream failures.
+    Open -> half-open after `cooldown` seconds, when a single probe request is let through.
+    A successful probe closes the circuit again, a failed one re-opens it.
+    """
+
+    def __init__(self, threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN_SECONDS):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.rejected = 0
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.probing:
+                self.probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def release_probe(self):
+        """
+        The request told us nothing about upstream health (e.g. 401, 400): keep the state
+        and failure count, only let the next half-open probe through.
+        """
+        with self.lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                if self.opened_at is None or self.probing:
+                    print(f"🔌 OpenAI circuit opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+class ResilientLLMCaller:
+    """
+    Wraps `chat.completions.create` with a per-intent deadline, retries with jittered backoff,
+    optional hedged requests and a circuit breaker.
+    Raises CircuitOpenError or the last error, so callers can switch to their local fallbacks quickly.
+    """
+
+    def __init__(self, hedge=LLM_HEDGE_ENABLED, max_retries=LLM_MAX_RETRIES):
+        self.hedge = hedge
+        self.max_retries = max_retries
+        self.breaker = CircuitBreaker()
+        self.latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self.executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge") if hedge else None
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+
+    def hedge_delay(self, intent):
+        """
+        p95 of the recent successful latencies for this intent, or None while there are too few samples.
+        """
+        samples = list(self.latencies[intent])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return float(np.percentile(samples, 95))
+
+    def _attempt(self, create, intent, remaining, kwargs):
+        kwargs = {**kwargs, "timeout": remaining}
+        delay = self.hedge_delay(intent) if self.hedge and not kwargs.get("stream") else None
+        if delay is None or delay >= remaining:
+            return create(**kwargs)
+
+        primary = self.executor.submit(create, **kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        hedged = self.executor.submit(create, **{**kwargs, "timeout": max(remaining - delay, 0.1)})
+        pending = {primary, hedged}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(remaining - delay, 0.1), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is hedged:
+                        self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error or TimeoutError("Hedged OpenAI request timed out")
+
+    def call(self, create, intent, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpenError("OpenAI circuit is open")
+
+        deadline = time.monotonic() + INTENT_DEADLINES.get(intent, LLM_DEFAULT_DEADLINE)
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            started = time.monotonic()
+            try:
+                response = self._attempt(create, intent, remaining, kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    # Auth, quota and bad requests are neither successes nor upstream failures
+                    self.breaker.release_probe()
+                    raise
+                self.breaker.record_failure()
+                delay = backoff_delay(attempt)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline or not self.breaker.allow():
+                    if time.monotonic() + delay >= deadline:
+                        self.deadline_exceeded += 1
+                    raise
+                attempt += 1
+                self.retries += 1
+                print(f"🔁 Retrying OpenAI call ({intent}) after {type(e).__name__}, attempt {attempt}")
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            if not kwargs.get("stream"):
+                self.latencies[intent].append(time.monotonic() - started)
+            return response
+
+    def stats(self):
+        return {
+            "circuit_state": self.breaker.state,
+            "circuit_open": int(self.breaker.state == "open"),
+            "circuit_rejected": self.breaker.rejected,
+            "consecutive_failures": self.breaker.failures,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "deadline_exceeded": self.deadline_exceeded,
+        }
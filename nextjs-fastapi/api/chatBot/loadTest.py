@@ -0,0 +1,113 @@
+"""
+Load test for /api/py/chat and /api/py/groupchat at a fixed concurrency.
+
+Start the API with the replay backend so OpenAI is out of the loop:
+
+    LLM_BACKEND=replay LLM_REPLAY_LATENCY_MS=800 python3 -m uvicorn api.index:app
+    python3 -m api.chatBot.loadTest --concurrency 20 --requests 400
+
+or pass --in-process to drive the ASGI app directly without a server.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import httpx
+import numpy as np
+
+SAMPLE_MESSAGES = [
+    "Hi there!",
+    "Find me an easy hike near Garmisch",
+    "I want a challenging hike with a lake, around 15 km",
+    "What's the weather like in Oberstdorf?",
+    "Tell me more about the second hike",
+    "Can you suggest something shorter, under 10 km?",
+    "Which of these hikes is good for beginners?",
+    "Show me winter hikes in the Allgäu",
+]
+
+ENDPOINTS = {"chat": "/api/py/chat", "groupchat": "/api/py/groupchat"}
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {"p50": round(p50, 1), "p95": round(p95, 1), "p99": round(p99, 1)}
+
+
+async def worker(client, worker_id, jobs, results, sessions):
+    while True:
+        try:
+            endpoint, message = jobs.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        # Chat users are independent, group chats share a few rooms like real groups do
+        user_id = f"load-{worker_id}" if endpoint == "chat" else f"load-room-{worker_id % sessions}"
+        started = time.perf_counter()
+        try:
+            response = await client.post(ENDPOINTS[endpoint], json={"user_id": user_id, "user_input": message})
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        results[endpoint].append((time.perf_counter() - started, ok))
+
+
+async def run(base_url, concurrency, total_requests, endpoints, messages, sessions, in_process, timeout):
+    jobs = asyncio.Queue()
+    for index, (endpoint, message) in enumerate(zip(itertools.cycle(endpoints), itertools.cycle(messages))):
+        if index >= total_requests:
+            break
+        jobs.put_nowait((endpoint, message))
+
+    if in_process:
+        from ..index import app
+        transport = httpx.ASGITransport(app=app)
+    else:
+        transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=concurrency))
+
+    results = {endpoint: [] for endpoint in endpoints}
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=timeout) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client, i, jobs, results, sessions) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    report = {"concurrency": concurrency, "requests": total_requests, "seconds": round(elapsed, 2),
+              "throughput_rps": round(total_requests / elapsed, 2), "endpoints": {}}
+    for endpoint, samples in results.items():
+        latencies = [latency for latency, ok in samples if ok]
+        report["endpoints"][endpoint] = {
+            "requests": len(samples),
+            "errors": sum(1 for _, ok in samples if not ok),
+            **{f"{name}_ms": value for name, value in percentiles(latencies).items()},
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--endpoints", default="chat,groupchat", help="comma separated: chat, groupchat")
+    parser.add_argument("--messages", help="file with one user message per line")
+    parser.add_argument("--group-sessions", type=int, default=4, help="number of group chat rooms")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--in-process", action="store_true", help="call the ASGI app directly")
+    args = parser.parse_args()
+
+    messages = SAMPLE_MESSAGES
+    if args.messages:
+        with open(args.messages, "r", encoding="utf-8") as file:
+            messages = [line.strip() for line in file if line.strip()]
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip() in ENDPOINTS]
+
+    report = asyncio.run(run(args.base_url, args.concurrency, args.requests, endpoints, messages,
+                             args.group_sessions, args.in_process, args.timeout))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
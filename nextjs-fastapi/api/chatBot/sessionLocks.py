@@ -0,0 +1,96 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from .llmCache import normalize_input
+
+
+class SessionTurnCoordinator:
+    """
+    Serialises chatbot turns per session and coalesces identical in-flight messages.
+    Turns for one user_id run one after another, so concurrent requests cannot interleave
+    their updates to the session memory. A message that is already being answered for the
+    same session is not processed again: the duplicate request awaits the running turn.
+    The blocking chatbot pipeline runs in the threadpool, so the event loop stays free.
+    """
+
+    def __init__(self):
+        self.locks = {}  # user_id -> [asyncio.Lock, number of requests holding or waiting]
+        self.inflight = {}  # (user_id, is_group_chat, normalized input) -> asyncio.Task
+        self.executed = 0
+        self.coalesced = 0
+        self.loop = None
+
+    @asynccontextmanager
+    async def session_lock(self, user_id):
+        """
+        Hold the turn lock of a session; the lock is dropped once nobody uses it anymore.
+        """
+        entry = self.locks.setdefault(user_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self.locks.get(user_id) is entry:
+                del self.locks[user_id]
+
+    async def _locked(self, user_id, func):
+        async with self.session_lock(user_id):
+            return await run_in_threadpool(func)
+
+    def run_locked(self, user_id, func):
+        """
+        Run `func()` under the session's turn lock from a background thread (not from the event loop),
+        e.g. to apply a history summary without racing a turn that saves the session.
+        """
+        if self.loop is None or self.loop.is_closed():
+            raise RuntimeError("No event loop has run a turn yet")
+        return asyncio.run_coroutine_threadsafe(self._locked(user_id, func), self.loop).result()
+
+    async def _run_turn(self, pipeline, user_input, user_id, is_group_chat):
+        async with self.session_lock(user_id):
+            self.executed += 1
+            return await run_in_threadpool(pipeline, user_input, user_id, is_group_chat)
+
+    async def run(self, pipeline, user_input, user_id, is_group_chat=False):
+        """
+        Run `pipeline(user_input, user_id, is_group_chat)` as one turn of the session.
+        Identical messages sent while the first one is still running share its result.
+        """
+        self.loop = asyncio.get_running_loop()
+        key = (user_id, is_group_chat, normalize_input(user_input))
+        task = self.inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._run_turn(pipeline, user_input, user_id, is_group_chat))
+            self.inflight[key] = task
+            task.add_done_callback(lambda done: self.inflight.pop(key, None) if self.inflight.get(key) is done else None)
+        # Shielded, so a client that disconnects does not cancel the turn for the others
+        return await asyncio.shield(task)
+
+    async def stream(self, events, user_id):
+        """
+        Iterate a blocking event generator under the session lock.
+        Streams are not coalesced, every client gets its own token stream.
+        """
+        self.loop = asyncio.get_running_loop()
+        async with self.session_lock(user_id):
+            self.executed += 1
+            try:
+                async for event in iterate_in_threadpool(events):
+                    yield event
+            finally:
+                # Let the generator save the session before the next turn may start
+                await run_in_threadpool(events.close)
+
+    def stats(self):
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self.inflight),
+            "active_sessions": len(self.locks),
+        }
@@ -0,0 +1,329 @@
+import copy
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+# Backend selection: "memory" (single worker), "sqlite" or "redis" (shared across workers)
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+# In the temp dir, the package directory is read-only on serverless deployments
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(tempfile.gettempdir(), "hyking_sessions.db"))
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(24 * 60 * 60)))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+
+# Fields every session has, created on first access
+SESSION_DEFAULTS = {
+    "conversation_state": lambda: {"user_filters": {}, "last_context": None},
+    "history": list,
+}
+
+
+def encode_value(value):
+    """
+    Serialise a session field as compact, compressed JSON.
+    """
+    return zlib.compress(json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), 1)
+
+
+def decode_value(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class Session(MutableMapping):
+    """
+    Dict-like view of one user's session.
+    Fields are loaded from the store on first access and only modified fields are written back,
+    so a field that was merely read cannot overwrite a newer value stored meanwhile.
+    """
+
+    def __init__(self, store, user_id):
+        self.store = store
+        self.user_id = user_id
+        self.values = {}
+        self.missing = set()
+        # Copies of the values as loaded, to notice in-place changes (history appends etc.)
+        self.loaded = {}
+        self.modified = set()
+
+    def _load(self, key):
+        if key in self.values or key in self.missing:
+            return
+        loaded = self.store.load_fields(self.user_id, [key])
+        if key in loaded:
+            self.values[key] = loaded[key]
+            self.loaded[key] = copy.deepcopy(loaded[key])
+        elif key in SESSION_DEFAULTS:
+            self.values[key] = SESSION_DEFAULTS[key]()
+        else:
+            self.missing.add(key)
+
+    def __getitem__(self, key):
+        self._load(key)
+        if key in self.missing:
+            raise KeyError(key)
+        return self.values[key]
+
+    def __setitem__(self, key, value):
+        self.missing.discard(key)
+        self.values[key] = value
+        self.modified.add(key)
+
+    def __delitem__(self, key):
+        self._load(key)
+        if key in self.missing:
+            raise KeyError(key)
+        del self.values[key]
+        self.loaded.pop(key, None)
+        self.modified.discard(key)
+        self.missing.add(key)
+        self.store.delete_fields(self.user_id, [key])
+
+    def __iter__(self):
+        for key in self.store.load_fields(self.user_id, None):
+            self._load(key)
+        return iter(list(self.values))
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def __contains__(self, key):
+        self._load(key)
+        return key not in self.missing
+
+    def refresh(self, fields):
+        """
+        Drop cached fields so the next access reads the stored value.
+        """
+        for key in fields:
+            self.values.pop(key, None)
+            self.loaded.pop(key, None)
+            self.modified.discard(key)
+            self.missing.discard(key)
+
+    def is_modified(self, key):
+        return key in self.modified or (key in self.values and self.values[key] != self.loaded.get(key))
+
+    def save(self, fields=None):
+        """
+        Write the modified (or the given) fields back to the store.
+        """
+        if fields is None:
+            keys = [key for key in self.values if self.is_modified(key)]
+        else:
+            keys = [key for key in fields if key in self.values]
+        values = {key: self.values[key] for key in keys}
+        if values:
+            self.store.save_fields(self.user_id, values)
+        for key in keys:
+            self.loaded[key] = copy.deepcopy(self.values[key])
+            self.modified.discard(key)
+
+
+class SessionStore(ABC):
+    """
+    Interface for session backends. Sessions are stored field by field.
+    """
+
+    def session(self, user_id):
+        return Session(self, user_id)
+
+    @abstractmethod
+    def load_fields(self, user_id, fields):
+        """
+        Return {field: value} for the stored fields, all fields if `fields` is None.
+        """
+
+    @abstractmethod
+    def save_fields(self, user_id, values):
+        """
+        Store {field: value}, leaving the other fields of the session untouched.
+        """
+
+    @abstractmethod
+    def delete_fields(self, user_id, fields):
+        pass
+
+    @abstractmethod
+    def delete(self, user_id):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process store with LRU eviction and a TTL. Only suitable for a single worker.
+    Values are kept as live objects, so nothing is serialised.
+    """
+
+    def __init__(self, max_entries=SESSION_MAX_ENTRIES, ttl=SESSION_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # user_id -> (last_access, {field: value})
+        self.lock = threading.Lock()
+
+    def _get_entry(self, user_id):
+        entry = self.entries.get(user_id)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.ttl:
+            del self.entries[user_id]
+            return None
+        self.entries.move_to_end(user_id)
+        return entry
+
+    def load_fields(self, user_id, fields):
+        with self.lock:
+            entry = self._get_entry(user_id)
+            if entry is None:
+                return {}
+            stored = entry[1]
+            keys = stored.keys() if fields is None else [key for key in fields if key in stored]
+            return {key: stored[key] for key in keys}
+
+    def save_fields(self, user_id, values):
+        with self.lock:
+            entry = self._get_entry(user_id)
+            stored = entry[1] if entry else {}
+            stored.update(values)
+            self.entries[user_id] = (time.time(), stored)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete_fields(self, user_id, fields):
+        with self.lock:
+            entry = self._get_entry(user_id)
+            if entry:
+                for key in fields:
+                    entry[1].pop(key, None)
+
+    def delete(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite-backed store, shared by all workers on the same machine.
+    One row per (user, field) so a turn only reads and writes the fields it uses.
+    """
+
+    def __init__(self, db_path=SESSION_DB_PATH, ttl=SESSION_TTL_SECONDS):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS session_fields (
+                user_id TEXT,
+                field TEXT,
+                value BLOB,
+                updated_at REAL,
+                PRIMARY KEY (user_id, field)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_session_fields_updated ON session_fields (updated_at)")
+        self.conn.commit()
+        self.saves = 0
+
+    def load_fields(self, user_id, fields):
+        cutoff = time.time() - self.ttl
+        with self.lock:
+            if fields is None:
+                rows = self.conn.execute(
+                    "SELECT field, value FROM session_fields WHERE user_id = ? AND updated_at >= ?",
+                    (user_id, cutoff),
+                ).fetchall()
+            else:
+                placeholders = ", ".join("?" for _ in fields)
+                rows = self.conn.execute(
+                    f"SELECT field, value FROM session_fields WHERE user_id = ? AND updated_at >= ? "
+                    f"AND field IN ({placeholders})",
+                    (user_id, cutoff, *fields),
+                ).fetchall()
+        return {field: decode_value(value) for field, value in rows}
+
+    def save_fields(self, user_id, values):
+        now = time.time()
+        rows = [(user_id, key, encode_value(value), now) for key, value in values.items()]
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO session_fields (user_id, field, value, updated_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            # Expire old sessions every now and then instead of on every write
+            self.saves += 1
+            if self.saves % 100 == 0:
+                self.conn.execute("DELETE FROM session_fields WHERE updated_at < ?", (now - self.ttl,))
+            self.conn.commit()
+
+    def delete_fields(self, user_id, fields):
+        placeholders = ", ".join("?" for _ in fields)
+        with self.lock:
+            self.conn.execute(
+                f"DELETE FROM session_fields WHERE user_id = ? AND field IN ({placeholders})", (user_id, *fields)
+            )
+            self.conn.commit()
+
+    def delete(self, user_id):
+        with self.lock:
+            self.conn.execute("DELETE FROM session_fields WHERE user_id = ?", (user_id,))
+            self.conn.commit()
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Redis-backed store (any Redis-protocol server) for workers on several machines.
+    Each session is a hash with one entry per field and expires after the TTL.
+    """
+
+    def __init__(self, url=SESSION_REDIS_URL, ttl=SESSION_TTL_SECONDS, prefix="hyking:session:"):
+        try:
+            import redis
+        except ImportError:
+            raise ValueError("❌ SESSION_STORE=redis requires the 'redis' package. Install it with pip install redis.")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, user_id):
+        return f"{self.prefix}{user_id}"
+
+    def load_fields(self, user_id, fields):
+        key = self._key(user_id)
+        if fields is None:
+            stored = self.client.hgetall(key)
+            return {field.decode("utf-8"): decode_value(value) for field, value in stored.items()}
+        values = self.client.hmget(key, fields)
+        return {field: decode_value(value) for field, value in zip(fields, values) if value is not None}
+
+    def save_fields(self, user_id, values):
+        key = self._key(user_id)
+        pipeline = self.client.pipeline()
+        pipeline.hset(key, mapping={field: encode_value(value) for field, value in values.items()})
+        pipeline.expire(key, self.ttl)
+        pipeline.execute()
+
+    def delete_fields(self, user_id, fields):
+        self.client.hdel(self._key(user_id), *fields)
+
+    def delete(self, user_id):
+        self.client.delete(self._key(user_id))
+
+
+def create_session_store(backend=SESSION_STORE):
+    """
+    Create the session store configured via SESSION_STORE.
+    """
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "redis":
+        return RedisSessionStore()
+    return MemorySessionStore()
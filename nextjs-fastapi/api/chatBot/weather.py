@@ -1,11 +1,16 @@
+import asyncio
 import os
-import requests
-from dotenv import load_dotenv
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+
+from .gazetteer import normalize_place
+from ..resources import load_environment
 
 # Load environment variables
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
-env_path = os.path.join(project_root, ".env.local")
-load_dotenv(dotenv_path=env_path)
+load_environment()
 
 # Get OpenWeatherMap API key from environment
 OPENWEATHERMAP_API_KEY = os.getenv("OPENWEATHERMAP_API_KEY")
@@ -13,18 +18,134 @@ OPENWEATHERMAP_API_KEY = os.getenv("OPENWEATHERMAP_API_KEY")
 if not OPENWEATHERMAP_API_KEY:
     raise ValueError("❌ OPENWEATHERMAP_API_KEY is missing! Make sure it's set in the .env.local file.")
 
-def get_weather(location: str) -> dict:
+# Base URL can be pointed at a local stub server for testing
+OPENWEATHERMAP_BASE_URL = os.getenv("OPENWEATHERMAP_BASE_URL", "http://api.openweathermap.org/data/2.5")
+WEATHER_TIMEOUT_SECONDS = float(os.getenv("WEATHER_TIMEOUT_SECONDS", "3"))
+WEATHER_CACHE_TTL_SECONDS = int(os.getenv("WEATHER_CACHE_TTL_SECONDS", "600"))
+WEATHER_CACHE_SIZE = 1024
+WEATHER_MAX_CONNECTIONS = 20
+
+# Two decimals are roughly 1 km, close enough for weather
+COORDINATE_PRECISION = 2
+
+
+class WeatherClient:
+    """
+    OpenWeatherMap client with pooled connections, timeouts and a TTL cache.
+    Keyed on rounded coordinates or the normalised city name.
+    Offers a sync API for the chatbot handlers and an async batch API for many hikes at once.
+    """
+
+    def __init__(self, api_key=OPENWEATHERMAP_API_KEY, base_url=OPENWEATHERMAP_BASE_URL,
+                 timeout=WEATHER_TIMEOUT_SECONDS, ttl=WEATHER_CACHE_TTL_SECONDS):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(timeout)
+        self.limits = httpx.Limits(max_connections=WEATHER_MAX_CONNECTIONS, max_keepalive_connections=10)
+        self.ttl = ttl
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.sync_client = httpx.Client(timeout=self.timeout, limits=self.limits)
+        self.async_client = None
+        self.hits = 0
+        self.misses = 0
+
+    def _params(self, location=None, lat=None, lon=None):
+        params = {"appid": self.api_key, "units": "metric"}  # Use "imperial" for Fahrenheit
+        if lat is not None and lon is not None:
+            params.update({"lat": round(lat, COORDINATE_PRECISION), "lon": round(lon, COORDINATE_PRECISION)})
+        else:
+            params["q"] = location
+        return params
+
+    def _cache_key(self, location=None, lat=None, lon=None):
+        if lat is not None and lon is not None:
+            return "coord", round(lat, COORDINATE_PRECISION), round(lon, COORDINATE_PRECISION)
+        return "city", normalize_place(location or "")
+
+    def _cache_get(self, key):
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def _cache_put(self, key, data):
+        with self.lock:
+            self.cache[key] = (time.monotonic() + self.ttl, data)
+            self.cache.move_to_end(key)
+            while len(self.cache) > WEATHER_CACHE_SIZE:
+                self.cache.popitem(last=False)
+
+    def _parse(self, response):
+        if response.status_code == 200:
+            return response.json()
+        raise ValueError(f"Failed to fetch weather data: {response.status_code} - {response.text}")
+
+    def get(self, location=None, lat=None, lon=None):
+        """
+        Fetch the current weather for a city name or coordinates (blocking).
+        """
+        key = self._cache_key(location, lat, lon)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        response = self.sync_client.get(f"{self.base_url}/weather", params=self._params(location, lat, lon))
+        data = self._parse(response)
+        self._cache_put(key, data)
+        return data
+
+    async def fetch(self, location=None, lat=None, lon=None):
+        """
+        Async variant of get() using a pooled AsyncClient.
+        """
+        key = self._cache_key(location, lat, lon)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        if self.async_client is None:
+            self.async_client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        response = await self.async_client.get(f"{self.base_url}/weather", params=self._params(location, lat, lon))
+        data = self._parse(response)
+        self._cache_put(key, data)
+        return data
+
+    async def fetch_many(self, points):
+        """
+        Fetch the weather for many (lat, lon) points concurrently; failed lookups are None.
+        Points that round to the same coordinates share one request.
+        """
+        unique = {self._cache_key(lat=lat, lon=lon): (lat, lon) for lat, lon in points}
+        results = await asyncio.gather(
+            *(self.fetch(lat=lat, lon=lon) for lat, lon in unique.values()), return_exceptions=True
+        )
+        by_key = {}
+        for key, result in zip(unique, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ Weather lookup failed for {unique[key]}: {result}")
+                result = None
+            by_key[key] = result
+        return [by_key[self._cache_key(lat=lat, lon=lon)] for lat, lon in points]
+
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.aclose()
+            self.async_client = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0}
+
+
+weather_client = WeatherClient()
+
+
+def get_weather(location: str, lat: float = None, lon: float = None) -> dict:
     """
     Fetch weather data for a given location using OpenWeatherMap API.
+    Coordinates are used instead of the name if they are known.
     """
-    base_url = "http://api.openweathermap.org/data/2.5/weather"
-    params = {
-        "q": location,
-        "appid": OPENWEATHERMAP_API_KEY,
-        "units": "metric"  # Use "imperial" for Fahrenheit
-    }
-    response = requests.get(base_url, params=params)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        raise ValueError(f"Failed to fetch weather data: {response.status_code} - {response.text}")
\ No newline at end of file
+    return weather_client.get(location, lat, lon)
@@ -1,11 +1,9 @@
 import os
 import sys
-from supabase import create_client, Client
 from fastapi import APIRouter
 
 # Add the parent directory to sys.path so Python can find the recommender_system module
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-from .recommender_system.utils import get_recommendations
 
 
 # Erstelle einen Router
@@ -14,5 +12,7 @@ router = APIRouter()
 
 @router.get("/recommendations")
 async def get_recommendation(userID: str): 
+    # Imported on first use, numpy and supabase are slow to import on a cold start
+    from .recommender_system.utils import get_recommendations
     rec_ids = get_recommendations(userID) 
     return {"recommendedUserIDs": rec_ids}
\ No newline at end of file
@@ -1,21 +1,101 @@
-from fastapi import FastAPI, HTTPException, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse, ORJSONResponse, Response, PlainTextResponse
 from pydantic import BaseModel
 from typing import Dict, Optional
 from datetime import timedelta
 from .auth import (
-    UserCreate, Token, users_db, get_password_hash,
-    verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+    UserCreate, User, Token, get_users_db, password_hasher, AuthBusyError,
+    create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from .getRecs import router as recs_router
-from .chatBot.chatbotLoop import chatbot_loop_api
-from .chatBot.getHike import getHike
-from .chatBot.db import fetch_hike_data
+from .admission import AdmissionController, AdmissionRejected
+from .chatBot.hikePayload import project_hikes, parse_fields
+from .chatBot.sessionLocks import SessionTurnCoordinator
+from .chatBot.llmMetrics import llm_metrics, render_gauges
+from .tracing import ServerTimingMiddleware, span
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import hashlib
+import importlib
+import json
+import orjson
 import sys
+import threading
 sys.stdout.reconfigure(encoding='utf-8')
 
+# The chatbot pulls in pandas, openai, rapidfuzz and the hike catalog. It is imported on first use
+# (or by the warm-up at startup) instead of at import time, which keeps cold starts short.
+_chat_pipeline = None
+_chat_pipeline_lock = threading.Lock()
+
+def chat_pipeline():
+    """
+    Return the chatbotLoop module, importing it and loading the hike catalog on the first call.
+    """
+    global _chat_pipeline
+    if _chat_pipeline is None:
+        with _chat_pipeline_lock:
+            if _chat_pipeline is None:
+                pipeline = importlib.import_module(".chatBot.chatbotLoop", __package__)
+                pipeline.warm_up()
+                # History summaries are applied under the same per-session lock as the turns
+                pipeline.chatbot.history_manager.run_locked = turn_coordinator.run_locked
+                _chat_pipeline = pipeline
+    return _chat_pipeline
+
+def chat_component(module):
+    """
+    Import a chatBot module after the pipeline has been loaded, e.g. chat_component("weather").
+    """
+    chat_pipeline()
+    return importlib.import_module(f".chatBot.{module}", __package__)
+
+def load_hike_catalog():
+    return chat_component("getHike").load_catalog()
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm the chatbot and the catalog in the background, the app accepts requests right away
+    warm_up = asyncio.create_task(asyncio.to_thread(chat_pipeline))
+    yield
+    if not warm_up.done():
+        warm_up.cancel()
+    elif _chat_pipeline is not None:
+        await chat_component("weather").weather_client.aclose()
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """
+    Gzip large responses, but leave Server-Sent Event streams alone so events are not buffered.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+class TracedORJSONResponse(ORJSONResponse):
+    """
+    ORJSONResponse whose rendering shows up as the "serialize" stage in Server-Timing.
+    """
+
+    def render(self, content):
+        with span("serialize"):
+            return super().render(content)
+
 # Initialize FastAPI app
-app = FastAPI(docs_url="/api/py/docs", openapi_url="/api/py/openapi.json")
+app = FastAPI(
+    docs_url="/api/py/docs",
+    openapi_url="/api/py/openapi.json",
+    default_response_class=TracedORJSONResponse,
+    lifespan=lifespan,
+)
+
+# Compress bodies above 1 KB (hike lists, recommendations)
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1024)
 
 # Add CORS middleware
 app.add_middleware(
@@ -26,12 +106,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so the trace covers the other middleware too
+app.add_middleware(ServerTimingMiddleware)
+
 # Include hike recommendation router
 app.include_router(recs_router, prefix="/api/py", tags=["recommendations"])
 
-# Load hike data during startup
-hikes = fetch_hike_data()
-print("Hikes loaded successfully!")
+# Serialises turns per session and merges duplicate in-flight messages
+turn_coordinator = SessionTurnCoordinator()
+
+# Rate limits and a bounded queue in front of the LLM-backed routes
+admission = AdmissionController()
+
+def admission_error(error):
+    return HTTPException(status_code=error.status_code, detail=error.detail,
+                         headers={"Retry-After": str(error.retry_after)})
+
+async def request_user_id(request: Request):
+    """
+    The user_id of a chat request body, falling back to the client address.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        body = {}
+    user_id = body.get("user_id") if isinstance(body, dict) else None
+    return str(user_id or (request.client.host if request.client else "anonymous"))
+
+async def chat_admission(request: Request):
+    """
+    Dependency for chat and groupchat: rate limits, then a concurrency slot for the whole turn.
+    """
+    try:
+        await admission.check(await request_user_id(request))
+        async with admission.slot():
+            yield
+    except AdmissionRejected as e:
+        raise admission_error(e)
+
+async def chat_stream_admission(request: Request):
+    """
+    Dependency for the streaming routes: rate limits only, the slot is held by the stream itself.
+    """
+    try:
+        await admission.check(await request_user_id(request))
+    except AdmissionRejected as e:
+        raise admission_error(e)
+
+def run_chatbot_loop(user_input, user_id, is_group_chat=False):
+    return chat_pipeline().chatbot_loop_api(user_input, user_id, is_group_chat)
 
 # Request models
 class ChatRequest(BaseModel):
@@ -42,8 +165,16 @@ class GroupChatRequest(BaseModel):
     user_id: str
     user_input: str
 
-@app.post("/api/py/chat")
-async def chat(request: ChatRequest):
+def shape_response(raw_response, fields=None):
+    """
+    Reduce hike records in a chatbot response to the card fields plus any requested `fields`.
+    """
+    if isinstance(raw_response, dict) and isinstance(raw_response.get("hikes"), list):
+        return {**raw_response, "hikes": project_hikes(raw_response["hikes"], extra_fields=parse_fields(fields))}
+    return raw_response
+
+@app.post("/api/py/chat", dependencies=[Depends(chat_admission)])
+async def chat(request: ChatRequest, fields: Optional[str] = None):
     """
     Handle chat requests via chatbot loop with user-specific memory.
     """
@@ -54,12 +185,12 @@ async def chat(request: ChatRequest):
             raise HTTPException(status_code=400, detail="No input provided")
 
         # Call chatbot logic with user_id
-        raw_response = chatbot_loop_api(user_input, user_id)
+        raw_response = await turn_coordinator.run(run_chatbot_loop, user_input, user_id)
 
         if isinstance(raw_response, dict) and raw_response.get("intent") == "hike_recommendation":
             # Process hike recommendations
             user_filters = raw_response.get("filters", {})
-            hike_recommendations = getHike(user_filters)
+            hike_recommendations = chat_component("getHike").getHike(user_filters)
             return {
                 "response": "Here are some hikes you might like.",
                 "hike_ids": hike_recommendations
@@ -69,14 +200,14 @@ async def chat(request: ChatRequest):
         if isinstance(raw_response, str):
             return {"response": raw_response}
         else:
-            return raw_response
+            return shape_response(raw_response, fields)
 
     except Exception as e:
         print(f"Error in chatbot endpoint: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@app.post("/api/py/groupchat")
-async def groupchat(request: GroupChatRequest):
+@app.post("/api/py/groupchat", dependencies=[Depends(chat_admission)])
+async def groupchat(request: GroupChatRequest, fields: Optional[str] = None):
     """
     Handle group chat requests via chatbot loop with filter reset after recommendation.
     """
@@ -86,13 +217,13 @@ async def groupchat(request: GroupChatRequest):
         if not user_input:
             raise HTTPException(status_code=400, detail="No input provided")
 
-        raw_response = chatbot_loop_api(user_input, user_id, is_group_chat=True)
+        raw_response = await turn_coordinator.run(run_chatbot_loop, user_input, user_id, is_group_chat=True)
         # Call chatbot logic with user_id
 
         if isinstance(raw_response, dict) and raw_response.get("intent") == "hike_recommendation":
             # Process hike recommendations
             user_filters = raw_response.get("filters", {})
-            hike_recommendations = getHike(user_filters)
+            hike_recommendations = chat_component("getHike").getHike(user_filters)
             return {
                 "response": "Here are some hikes you might like.",
                 "hike_ids": hike_recommendations
@@ -102,28 +233,154 @@ async def groupchat(request: GroupChatRequest):
         if isinstance(raw_response, str):
             return {"response": raw_response}
         else:
-            return raw_response
+            return shape_response(raw_response, fields)
 
     except Exception as e:
         print(f"Error in groupchat endpoint: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+async def sse_events(user_input, user_id, is_group_chat=False, fields=None):
+    """
+    Format the chatbot's streamed events as Server-Sent Events.
+    """
+    try:
+        async with admission.slot():
+            pipeline = await run_in_threadpool(chat_pipeline)
+            events = pipeline.chatbot_loop_stream(user_input, user_id, is_group_chat)
+            async for event, data in turn_coordinator.stream(events, user_id):
+                with span("serialize"):
+                    payload = orjson.dumps(shape_response(data, fields), option=orjson.OPT_SERIALIZE_NUMPY)
+                yield b"event: " + event.encode() + b"\ndata: " + payload + b"\n\n"
+    except AdmissionRejected as e:
+        yield f"event: error\ndata: {json.dumps({'detail': e.detail, 'retry_after': e.retry_after})}\n\n".encode()
+    except Exception as e:
+        print(f"Error in chatbot stream: {e}")
+        yield f"event: error\ndata: {json.dumps({'detail': 'Internal server error'})}\n\n".encode()
+
+def sse_response(request, is_group_chat=False, fields=None):
+    user_input = request.user_input.strip()
+    if not user_input:
+        raise HTTPException(status_code=400, detail="No input provided")
+    return StreamingResponse(
+        sse_events(user_input, request.user_id, is_group_chat, fields),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/api/py/chat/stream", dependencies=[Depends(chat_stream_admission)])
+def chat_stream(request: ChatRequest, fields: Optional[str] = None):
+    """
+    Streaming variant of /api/py/chat: GPT tokens are sent as they arrive,
+    hike recommendations as a separate event once the search has finished.
+    """
+    return sse_response(request, fields=fields)
+
+@app.post("/api/py/groupchat/stream", dependencies=[Depends(chat_stream_admission)])
+def groupchat_stream(request: GroupChatRequest, fields: Optional[str] = None):
+    """
+    Streaming variant of /api/py/groupchat.
+    """
+    return sse_response(request, is_group_chat=True, fields=fields)
+
+@app.get("/api/py/chat/stats")
+def chat_stats():
+    """
+    Report how often GPT calls are avoided by the local intent classifier and the LLM cache.
+    """
+    chatbot = chat_pipeline().chatbot
+    return {
+        "intent_classifier": chatbot.intent_classifier.stats(),
+        "llm_cache": chatbot.llm_cache.stats(),
+        "weather_cache": chat_component("weather").weather_client.stats(),
+        "session_turns": turn_coordinator.stats(),
+        "admission": admission.stats(),
+        "llm_calls": chat_component("chatbot").llm_caller.stats(),
+    }
+
+@app.get("/api/py/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus scrape endpoint: OpenAI latency, token and error metrics plus the cache counters.
+    """
+    body = llm_metrics.render()
+    body += render_gauges("hyking_session_turns", turn_coordinator.stats())
+    body += render_gauges("hyking_chat_admission", admission.stats())
+    # A scrape must not trigger the heavy imports, the chatbot counters appear once it is loaded
+    if _chat_pipeline is not None:
+        chatbot = _chat_pipeline.chatbot
+        body += render_gauges("hyking_intent_classifier", chatbot.intent_classifier.stats())
+        body += render_gauges("hyking_llm_cache", chatbot.llm_cache.stats())
+        body += render_gauges("hyking_weather_cache", chat_component("weather").weather_client.stats())
+        body += render_gauges("hyking_llm_calls", chat_component("chatbot").llm_caller.stats())
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.get("/api/py/hikes")
+def hikes_by_id(ids: str, request: Request, fields: Optional[str] = None):
+    """
+    Batched hike details for lazy loading in the frontend, e.g. ?ids=1,2&fields=descriptionLong.
+    Responses carry an ETag, so unchanged hikes are answered with 304 Not Modified.
+    """
+    hike_ids = [hike_id.strip() for hike_id in ids.split(",") if hike_id.strip()]
+    hikes_df = load_hike_catalog()
+    if hikes_df is None or hikes_df.empty:
+        raise HTTPException(status_code=503, detail="Hike data not loaded")
+
+    records = hikes_df[hikes_df["id"].astype(str).isin(hike_ids)].to_dict(orient="records")
+    body = orjson.dumps(
+        {"hikes": project_hikes(records, extra_fields=parse_fields(fields))},
+        option=orjson.OPT_SERIALIZE_NUMPY,
+    )
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/api/py/hikes/weather")
+async def hikes_weather(ids: str):
+    """
+    Current weather at the start points of the given hikes (comma-separated ids), fetched concurrently.
+    """
+    hike_ids = [hike_id.strip() for hike_id in ids.split(",") if hike_id.strip()]
+    hikes_df = await run_in_threadpool(load_hike_catalog)
+    if hikes_df is None or hikes_df.empty:
+        raise HTTPException(status_code=503, detail="Hike data not loaded")
+
+    selected = hikes_df[hikes_df["id"].astype(str).isin(hike_ids)].dropna(subset=["pointLat", "pointLon"])
+    points = list(zip(selected["pointLat"], selected["pointLon"]))
+    weather = await chat_component("weather").weather_client.fetch_many(points)
+    return {"weather": {str(hike_id): data for hike_id, data in zip(selected["id"], weather)}}
+
+def auth_busy(error):
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "1"})
+
 @app.post("/api/py/signup")
 async def signup(user: UserCreate):
-    if user.email in users_db:
+    users_db = get_users_db()
+    if await run_in_threadpool(users_db.get, user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = get_password_hash(user.password)
-    users_db[user.email] = {"email": user.email, "password": hashed_password}
+    # bcrypt runs in its own bounded pool, the event loop keeps serving other requests
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except AuthBusyError as e:
+        raise auth_busy(e)
+    if not await run_in_threadpool(users_db.create, user.email, hashed_password):
+        raise HTTPException(status_code=400, detail="Email already registered")
     return {"message": "User created successfully"}
 
 @app.post("/api/py/login")
 async def login(user: UserCreate):
-    if user.email not in users_db:
+    users_db = get_users_db()
+    stored_user = await run_in_threadpool(users_db.get, user.email)
+    if not stored_user:
         raise HTTPException(status_code=400, detail="Email not found")
 
-    stored_user = users_db[user.email]
-    if not verify_password(user.password, stored_user["password"]):
+    try:
+        password_ok = await password_hasher.verify(user.password, stored_user["password"])
+    except AuthBusyError as e:
+        raise auth_busy(e)
+    if not password_ok:
         raise HTTPException(status_code=400, detail="Incorrect password")
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -132,6 +389,30 @@ async def login(user: UserCreate):
     )
     return Token(access_token=access_token, token_type="bearer")
 
+@app.get("/api/py/me")
+def me(current_user: User = Depends(get_current_user)):
+    """
+    The user the bearer token belongs to.
+    """
+    return current_user
+
+@app.get("/api/py/ready")
+def ready():
+    """
+    Readiness probe: 200 once the chatbot is loaded and the hike catalog is in memory, 503 while warming up.
+    """
+    # Only look at the catalog once the pipeline import has finished, never trigger it from here
+    hike_catalog = chat_component("getHike") if _chat_pipeline is not None else None
+    catalog_ready = hike_catalog is not None and hike_catalog.catalog_loaded.is_set()
+    status = {
+        "chatbot": _chat_pipeline is not None,
+        "catalog": catalog_ready,
+        "hikes": len(hike_catalog.hikes_df) if catalog_ready else 0,
+    }
+    if not (status["chatbot"] and status["catalog"]):
+        return ORJSONResponse({"status": "warming_up", **status}, status_code=503)
+    return {"status": "ready", **status}
+
 @app.get("/api/py/helloFastApi")
 def hello_fast_api():
     print("helloFastApi called in the python api")
@@ -0,0 +1,247 @@
+"""
+Load test for the whole API: chat, groupchat, recommendations, signup and login.
+
+Starts uvicorn with api.loadHarnessApp (Supabase and OpenAI replaced by local fakes) and the given
+number of workers, then drives every route on its own at increasing concurrency and reports
+throughput and p50/p95/p99 per route and level. A probe hits /api/py/helloFastApi meanwhile;
+if its latency climbs with a route's load, that route is blocking the event loop.
+
+    python3 -m api.loadHarness --workers 2 --concurrency 1,4,16,64 --duration 10
+
+Pass --base-url to drive an already running server instead.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from .chatBot.loadTest import SAMPLE_MESSAGES, percentiles
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
+
+ROUTES = ["chat", "groupchat", "recommendations", "signup", "login"]
+PROBE_INTERVAL_SECONDS = 0.1
+HARNESS_PASSWORD = "load-harness-password"
+# Same default as api.loadHarnessApp, which is not imported here because it loads the whole app
+FAKE_PROFILES = int(os.getenv("FAKE_PROFILES", "200"))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_env(args, data_dir):
+    """
+    Replay backend, throwaway databases and, unless --keep-limits, admission limits high enough
+    that the harness measures the routes rather than the rate limiter.
+    """
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "replay",
+        "LLM_REPLAY_LATENCY_MS": str(args.llm_latency_ms),
+        "LLM_CACHE_ENABLED": "true" if args.llm_cache else "false",
+        "FAKE_SUPABASE_LATENCY_MS": str(args.supabase_latency_ms),
+        "AUTH_DB_PATH": os.path.join(data_dir, "users.db"),
+        "SESSION_DB_PATH": os.path.join(data_dir, "sessions.db"),
+        "LLM_CACHE_PATH": os.path.join(data_dir, "llm_cache.db"),
+        "ADMISSION_DB_PATH": os.path.join(data_dir, "admission.db"),
+        "INTENT_LOG_PATH": os.path.join(data_dir, "intent_log.jsonl"),
+        # Weather lookups fail fast instead of reaching OpenWeatherMap, the key only has to be present
+        "OPENWEATHERMAP_BASE_URL": "http://127.0.0.1:9",
+        "OPENWEATHERMAP_API_KEY": os.environ.get("OPENWEATHERMAP_API_KEY", "load-harness"),
+    }
+    if not args.keep_limits:
+        env.update({
+            "CHAT_USER_RATE_PER_SECOND": "1000",
+            "CHAT_USER_BURST": "1000",
+            "CHAT_GLOBAL_RATE_PER_SECOND": "100000",
+            "CHAT_GLOBAL_BURST": "100000",
+            "CHAT_MAX_QUEUE": "10000",
+        })
+    return env
+
+
+def start_server(args, data_dir):
+    port = free_port()
+    command = [sys.executable, "-m", "uvicorn", "api.loadHarnessApp:app", "--host", "127.0.0.1",
+               "--port", str(port), "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"]
+    server = subprocess.Popen(command, cwd=PROJECT_ROOT, env=server_env(args, data_dir))
+    return server, f"http://127.0.0.1:{port}"
+
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+async def wait_until_ready(client, server, timeout):
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+        try:
+            if (await client.get("/api/py/ready")).status_code == 200:
+                return time.monotonic() - started
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"API not ready after {timeout}s")
+
+
+class RouteRequests:
+    """
+    Builds the next request for each route. Signups use fresh emails, logins a seeded account.
+    """
+
+    def __init__(self, run_id, group_sessions):
+        self.run_id = run_id
+        self.group_sessions = group_sessions
+        self.messages = itertools.cycle(SAMPLE_MESSAGES)
+        self.counter = itertools.count()
+        self.login = {"email": f"harness-{run_id}-login@example.com", "password": HARNESS_PASSWORD}
+
+    def build(self, route, worker_id):
+        n = next(self.counter)
+        if route == "chat":
+            return "POST", "/api/py/chat", {"json": {"user_id": f"harness-{worker_id}", "user_input": next(self.messages)}}
+        if route == "groupchat":
+            room = f"harness-room-{worker_id % self.group_sessions}"
+            return "POST", "/api/py/groupchat", {"json": {"user_id": room, "user_input": next(self.messages)}}
+        if route == "recommendations":
+            return "GET", "/api/py/recommendations", {"params": {"userID": f"fake-profile-{n % FAKE_PROFILES}"}}
+        if route == "signup":
+            email = f"harness-{self.run_id}-{n}@example.com"
+            return "POST", "/api/py/signup", {"json": {"email": email, "password": HARNESS_PASSWORD}}
+        if route == "login":
+            return "POST", "/api/py/login", {"json": self.login}
+        raise ValueError(f"Unknown route: {route}")
+
+
+async def route_worker(client, requests, route, worker_id, stop_at, samples):
+    while time.monotonic() < stop_at:
+        method, path, kwargs = requests.build(route, worker_id)
+        started = time.perf_counter()
+        try:
+            status = (await client.request(method, path, **kwargs)).status_code
+        except httpx.HTTPError:
+            status = None
+        samples.append((time.perf_counter() - started, status))
+
+
+async def probe(client, stop_at, latencies):
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        try:
+            await client.get("/api/py/helloFastApi")
+            latencies.append(time.perf_counter() - started)
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(PROBE_INTERVAL_SECONDS)
+
+
+async def measure(client, requests, route, concurrency, duration):
+    samples, probe_latencies = [], []
+    stop_at = time.monotonic() + duration
+    started = time.perf_counter()
+    await asyncio.gather(
+        probe(client, stop_at, probe_latencies),
+        *(route_worker(client, requests, route, worker_id, stop_at, samples) for worker_id in range(concurrency)),
+    )
+    elapsed = time.perf_counter() - started
+
+    ok = [latency for latency, status in samples if status == 200]
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "route": route,
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "ok": len(ok),
+        "throughput_rps": round(len(ok) / elapsed, 2),
+        **{f"{name}_ms": value for name, value in percentiles(ok).items()},
+        "statuses": statuses,
+        "probe_p99_ms": percentiles(probe_latencies)["p99"],
+    }
+
+
+async def run(args, base_url, server):
+    levels = [int(level) for level in args.concurrency.split(",")]
+    routes = [route.strip() for route in args.routes.split(",") if route.strip() in ROUTES]
+    requests = RouteRequests(run_id=int(time.time()), group_sessions=args.group_sessions)
+
+    limits = httpx.Limits(max_connections=max(levels) + 1)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        ready_seconds = await wait_until_ready(client, server, args.ready_timeout)
+        await client.post("/api/py/signup", json=requests.login)
+        # One request per route so lazy imports and first-use setup stay out of the numbers
+        for route in routes:
+            method, path, kwargs = requests.build(route, 0)
+            await client.request(method, path, **kwargs)
+
+        results = []
+        for concurrency in levels:
+            for route in routes:
+                result = await measure(client, requests, route, concurrency, args.duration)
+                results.append(result)
+                print(f"{route:>16} c={concurrency:<4} {result['throughput_rps']:>8} req/s  "
+                      f"p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  "
+                      f"probe p99 {result['probe_p99_ms']} ms  {result['statuses']}", flush=True)
+
+    return {
+        "workers": args.workers if server is not None else None,
+        "duration_seconds": args.duration,
+        "llm_latency_ms": args.llm_latency_ms,
+        "supabase_latency_ms": args.supabase_latency_ms,
+        "ready_seconds": round(ready_seconds, 2),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="comma separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per route and level")
+    parser.add_argument("--routes", default=",".join(ROUTES), help="comma separated: " + ", ".join(ROUTES))
+    parser.add_argument("--group-sessions", type=int, default=4, help="number of group chat rooms")
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="latency of the fake OpenAI")
+    parser.add_argument("--supabase-latency-ms", type=float, default=20, help="latency of the fake Supabase")
+    parser.add_argument("--llm-cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--keep-limits", action="store_true", help="keep the configured chat admission limits")
+    parser.add_argument("--base-url", help="drive a running server instead of starting uvicorn")
+    parser.add_argument("--ready-timeout", type=float, default=120)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--out", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="hyking-load-") as data_dir:
+        server, base_url = (None, args.base_url) if args.base_url else start_server(args, data_dir)
+        try:
+            report = asyncio.run(run(args, base_url, server))
+        finally:
+            if server is not None:
+                stop_server(server)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+The FastAPI app wired to local fakes, for load tests: Supabase is an in-memory dataset built from
+lib/updatedBavaria.json plus synthetic profiles, OpenAI is the replay backend (LLM_BACKEND=replay).
+Served by api.loadHarness, or directly:
+
+    LLM_BACKEND=replay python3 -m uvicorn api.loadHarnessApp:app --workers 2
+"""
+import json
+import os
+import random
+import re
+import time
+from types import SimpleNamespace
+
+from .resources import project_root, set_supabase_client
+
+ACTIVITY_PATH = os.getenv("FAKE_ACTIVITY_PATH", os.path.join(project_root, "lib", "updatedBavaria.json"))
+
+# Round trip of a real Supabase query, slept on every execute()
+FAKE_SUPABASE_LATENCY_MS = float(os.getenv("FAKE_SUPABASE_LATENCY_MS", "20"))
+FAKE_PROFILES = int(os.getenv("FAKE_PROFILES", "200"))
+
+# Skill excluded by the recommender queries, see recommender_system/utils.py
+EXCLUDED_SKILL_ID = "cm5plddd6000rjcyuzvn9d63f"
+SKILLS = ["Climbing", "Endurance", "Hiking"]
+SKILL_LEVELS = [("Beginner", 1), ("Intermediate", 2), ("Advanced", 3), ("Expert", 4), ("Pro", 5)]
+INTEREST_CATEGORIES = ["Culture", "Food", "Music", "Nature", "Sports"]
+INTERESTS_PER_CATEGORY = 4
+
+
+def camel_case(name):
+    return re.sub(r"_([a-z])", lambda match: match.group(1).upper(), name)
+
+
+def load_activities(path=ACTIVITY_PATH):
+    """
+    Crawled tours use snake_case keys, the Activity table uses camelCase columns.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        tours = json.load(file)["tours"]
+    return [{camel_case(key): value for key, value in tour.items()} for tour in tours]
+
+
+def build_profiles(count=FAKE_PROFILES, seed=42):
+    """
+    Synthetic profiles with skills, interests and swipes, shaped like the Supabase responses
+    including the embedded relations (SkillLevel, Skill, Interest).
+    """
+    rng = random.Random(seed)
+    profile_ids = [f"fake-profile-{i}" for i in range(count)]
+    interests = [
+        {"id": f"interest-{category.lower()}-{i}", "category": category}
+        for category in INTEREST_CATEGORIES for i in range(INTERESTS_PER_CATEGORY)
+    ]
+
+    user_skills, user_interests, swipes = [], [], []
+    for profile_id in profile_ids:
+        for skill_id, skill in [(f"skill-{name.lower()}", name) for name in SKILLS] + [(EXCLUDED_SKILL_ID, "Other")]:
+            level, value = rng.choice(SKILL_LEVELS)
+            user_skills.append({"profileId": profile_id, "skillId": skill_id,
+                                "SkillLevel": {"name": level, "numericValue": value}, "Skill": {"name": skill}})
+        for interest in rng.sample(interests, rng.randint(2, 6)):
+            user_interests.append({"profileId": profile_id, "interestId": interest["id"],
+                                   "Interest": {"category": interest["category"]}})
+        for receiver in rng.sample(profile_ids, min(10, count)):
+            if receiver != profile_id:
+                swipes.append({"senderId": profile_id, "receiverId": receiver})
+
+    return {
+        "Profile": [{"id": profile_id} for profile_id in profile_ids],
+        "UserSkill": user_skills,
+        "Interest": interests,
+        "UserInterest": user_interests,
+        "UserSwipe": swipes,
+    }
+
+
+class FakeQuery:
+    """
+    The subset of the supabase-py query builder the API uses: select, eq, neq, in_, order and execute.
+    Rows keep all their columns, callers only read the ones they selected.
+    """
+
+    def __init__(self, rows, latency):
+        self.rows = rows
+        self.latency = latency
+        self.filters = []
+        self.order_by = None
+
+    def select(self, *columns, **kwargs):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        # Embedded columns like "Skill(name)" sort by the nested field
+        match = re.fullmatch(r"(\w+)\((\w+)\)", column)
+        if match:
+            relation, field = match.groups()
+            self.order_by = (lambda row: (row.get(relation) or {}).get(field) or "", desc)
+        else:
+            self.order_by = (lambda row: row.get(column) or "", desc)
+        return self
+
+    def execute(self):
+        time.sleep(self.latency)
+        data = [row for row in self.rows if all(check(row) for check in self.filters)]
+        if self.order_by:
+            key, desc = self.order_by
+            data.sort(key=key, reverse=desc)
+        return SimpleNamespace(data=data, count=None)
+
+
+class FakeSupabaseClient:
+    """
+    In-memory stand-in for the Supabase client with a fixed latency per query.
+    """
+
+    def __init__(self, tables, latency_ms=FAKE_SUPABASE_LATENCY_MS):
+        self.tables = tables
+        self.latency = latency_ms / 1000
+
+    def table(self, name):
+        return FakeQuery(self.tables.get(name, []), self.latency)
+
+    from_ = table
+
+
+def create_fake_supabase_client():
+    return FakeSupabaseClient({"Activity": load_activities(), **build_profiles()})
+
+
+# Installed before api.index is imported, so every module gets the fake from get_supabase_client()
+os.environ.setdefault("LLM_BACKEND", "replay")
+set_supabase_client(create_fake_supabase_client())
+
+from . import index  # noqa: E402
+
+app = index.app
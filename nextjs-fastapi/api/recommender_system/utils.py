@@ -1,10 +1,17 @@
 import numpy as np
-from supabase import create_client, Client
-from dotenv import load_dotenv
-import os
+from supabase import Client
 from collections import Counter
 
-load_dotenv(".env.local")
+from ..resources import get_supabase_client
+from ..tracing import span
+
+
+def _execute(query, table):
+    """
+    Run a Supabase query as a "supabase" span of the current request.
+    """
+    with span("supabase", table=table):
+        return query.execute().data
 
 
 def get_user_skill_embedding(user_id: str):
@@ -18,16 +25,16 @@ def get_user_skill_embedding(user_id: str):
     - numpy Array: Array of the embedding
     """
 
-    url: str = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    key: str = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    supabase: Client = create_client(url, key)
+    supabase: Client = get_supabase_client()
 
-    response = supabase.table("UserSkill") \
-    .select("SkillLevel(name, numericValue), Skill(name)") \
-    .eq("profileId", user_id) \
-    .neq("skillId", "cm5plddd6000rjcyuzvn9d63f") \
-    .order("Skill(name)", desc=False) \
-    .execute().data
+    response = _execute(
+        supabase.table("UserSkill")
+        .select("SkillLevel(name, numericValue), Skill(name)")
+        .eq("profileId", user_id)
+        .neq("skillId", "cm5plddd6000rjcyuzvn9d63f")
+        .order("Skill(name)", desc=False),
+        "UserSkill",
+    )
     skills = np.array([item['SkillLevel']['numericValue'] for item in response if item['SkillLevel']])
     return np.pad(skills, (0, max(0, 3 - skills.shape[0])), mode='constant', constant_values=-1)
 
@@ -42,13 +49,11 @@ def get_user_direct_interest_embedding(user_id: int):
     Returns:
     - numpy Array: Array of the embedding
     """
-    url: str = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    key: str = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    supabase: Client = create_client(url, key)
+    supabase: Client = get_supabase_client()
 
-    response = supabase.table("UserInterest").select("interestId").eq("profileId", user_id).execute().data
+    response = _execute(supabase.table("UserInterest").select("interestId").eq("profileId", user_id), "UserInterest")
     user_interests = [item["interestId"] for item in response]
-    response = supabase.table("Interest").select("id").execute().data
+    response = _execute(supabase.table("Interest").select("id"), "Interest")
     all_interests = [item["id"] for item in response]
 
     interest_embedding = np.array([1 if interest in user_interests else 0 for interest in all_interests], dtype=float)
@@ -66,12 +71,10 @@ def get_user_indirect_interest_embedding(user_id: int):
     Returns:
     - numpy Array: Array of the embedding
     """
-    url: str = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    key: str = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    supabase: Client = create_client(url, key)
+    supabase: Client = get_supabase_client()
 
-    response = supabase.from_("UserInterest").select("Interest(category)").eq("profileId", user_id).execute().data
-    categories_response = supabase.from_("Interest").select("category").execute().data
+    response = _execute(supabase.from_("UserInterest").select("Interest(category)").eq("profileId", user_id), "UserInterest")
+    categories_response = _execute(supabase.from_("Interest").select("category"), "Interest")
 
     categories_in_user_interests = [interest['Interest']['category'] for interest in response]
     category_count = Counter(categories_in_user_interests)
@@ -112,14 +115,12 @@ def get_recommendations(user_id: int):
     - list of int: IDs of recommended users
     """
 
-    url: str = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    key: str = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    supabase: Client = create_client(url, key)
+    supabase: Client = get_supabase_client()
 
-    response = supabase.from_("Profile").select("id").neq("id", user_id).execute().data
+    response = _execute(supabase.from_("Profile").select("id").neq("id", user_id), "Profile")
     all_ids = [item["id"] for item in response]
 
-    response = supabase.from_("UserSwipe").select("receiverId").eq("senderId", user_id).execute().data
+    response = _execute(supabase.from_("UserSwipe").select("receiverId").eq("senderId", user_id), "UserSwipe")
     swiped_users = [item["receiverId"] for item in response]
     ids = [id for id in all_ids if id not in swiped_users]
 
@@ -155,16 +156,16 @@ def get_multiple_skill_embeddings(ids: list[str]):
     Returns:
     - Numpy Array: (User x 5) matrix, where each row represents the skill embedding of the respective user
     """
-    url: str = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    key: str = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    supabase: Client = create_client(url, key)
+    supabase: Client = get_supabase_client()
 
-    response = supabase.table("UserSkill") \
-    .select("profileId, SkillLevel(numericValue), Skill(name)") \
-    .in_("profileId", ids) \
-    .neq("skillId", "cm5plddd6000rjcyuzvn9d63f") \
-    .order("Skill(name)", desc=False) \
-    .execute().data
+    response = _execute(
+        supabase.table("UserSkill")
+        .select("profileId, SkillLevel(numericValue), Skill(name)")
+        .in_("profileId", ids)
+        .neq("skillId", "cm5plddd6000rjcyuzvn9d63f")
+        .order("Skill(name)", desc=False),
+        "UserSkill",
+    )
 
     # 2️⃣ Skills pro Nutzer in Dictionary speichern
     user_skills = {user_id: [] for user_id in ids}  # Sicherstellen, dass jeder User im Dict ist
@@ -193,16 +194,16 @@ def get_multiple_direct_interest_embeddings(ids: list[str]):
     Returns:
     - Numpy Array: (User x 5) matrix, where each row represents the direct interest embedding of the respective user
     """
-    url: str = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    key: str = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    supabase: Client = create_client(url, key)
+    supabase: Client = get_supabase_client()
 
-    response = supabase.table("UserInterest") \
-    .select("profileId, interestId") \
-    .in_("profileId", ids) \
-    .execute().data
+    response = _execute(
+        supabase.table("UserInterest")
+        .select("profileId, interestId")
+        .in_("profileId", ids),
+        "UserInterest",
+    )
 
-    all_interests_response = supabase.table("Interest").select("id").execute().data
+    all_interests_response = _execute(supabase.table("Interest").select("id"), "Interest")
     all_interests = [item["id"] for item in all_interests_response]
 
     user_interest_dict = {user_id: set() for user_id in ids}  # Leeres Set für jeden Nutzer
@@ -233,16 +234,16 @@ def get_multiple_indirect_interest_embeddings(ids: list[str]):
     Returns:
     - Numpy Array: (User x 5) matrix, where each row represents the indirect interest embedding of the respective user
     """
-    url: str = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    key: str = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    supabase: Client = create_client(url, key)
-
-    response = supabase.table("UserInterest") \
-        .select("profileId, Interest(category)") \
-        .in_("profileId", ids) \
-        .execute().data
+    supabase: Client = get_supabase_client()
+
+    response = _execute(
+        supabase.table("UserInterest")
+        .select("profileId, Interest(category)")
+        .in_("profileId", ids),
+        "UserInterest",
+    )
     
-    categories_response = supabase.table("Interest").select("category").execute().data
+    categories_response = _execute(supabase.table("Interest").select("category"), "Interest")
     categories = sorted(list(set([cat["category"] for cat in categories_response])))  # Sortierte Kategorie-Liste
 
     user_category_counts = {user_id: Counter() for user_id in ids}  
@@ -0,0 +1,48 @@
+import functools
+import os
+import threading
+
+from dotenv import load_dotenv
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
+env_path = os.path.join(project_root, ".env.local")
+
+
+@functools.lru_cache(maxsize=None)
+def load_environment():
+    """
+    Load .env.local once per process, however many modules ask for it.
+    """
+    load_dotenv(dotenv_path=env_path)
+
+
+_supabase_client = None
+_supabase_lock = threading.Lock()
+
+
+def get_supabase_client():
+    """
+    Shared Supabase client, created on first use.
+    """
+    global _supabase_client
+    if _supabase_client is None:
+        with _supabase_lock:
+            if _supabase_client is None:
+                # Imported here, the supabase package is slow to import and not every request needs it
+                from supabase import create_client
+
+                load_environment()
+                supabase_url = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
+                supabase_key = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+                if not supabase_url or not supabase_key:
+                    raise ValueError("Supabase URL or API Key is missing. Check your .env.local file.")
+                _supabase_client = create_client(supabase_url, supabase_key)
+    return _supabase_client
+
+
+def set_supabase_client(client):
+    """
+    Replace the shared client, e.g. with the in-process fake used by the load-test harness.
+    """
+    global _supabase_client
+    _supabase_client = client
@@ -0,0 +1,104 @@
+"""
+Measure cold-start costs of the FastAPI app: import time of api.index, latency of the first
+requests and the time until /api/py/ready reports ready. Every run uses a fresh interpreter.
+Exits with status 1 if a budget is exceeded, so it can guard against import-time regressions:
+
+    python3 -m api.startupTiming --runs 5 --max-import-seconds 1.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
+
+# Runs inside the fresh interpreter and prints one JSON line with the timings
+PROBE = r"""
+import json, time
+started = time.perf_counter()
+import api.index as index
+import_seconds = time.perf_counter() - started
+heavy = [name for name in ("pandas", "openai", "rapidfuzz", "supabase", "tabulate") if name in __import__("sys").modules]
+
+from fastapi.testclient import TestClient
+client = TestClient(index.app)
+
+started = time.perf_counter()
+client.get("/api/py/helloFastApi")
+first_request_seconds = time.perf_counter() - started
+
+started = time.perf_counter()
+client.post("/api/py/chat", json={"user_id": "startup-timing", "user_input": "Hi there!"})
+first_chat_seconds = time.perf_counter() - started
+
+print(json.dumps({
+    "import_seconds": import_seconds,
+    "first_request_seconds": first_request_seconds,
+    "first_chat_seconds": first_chat_seconds,
+    "heavy_modules_after_import": heavy,
+}))
+"""
+
+# Starts the app with its lifespan and polls the readiness probe
+READY_PROBE = r"""
+import json, time
+started = time.perf_counter()
+import api.index as index
+from fastapi.testclient import TestClient
+ready_seconds = None
+with TestClient(index.app) as client:
+    while time.perf_counter() - started < TIMEOUT:
+        if client.get("/api/py/ready").status_code == 200:
+            ready_seconds = time.perf_counter() - started
+            break
+        time.sleep(0.05)
+print(json.dumps({"ready_seconds": ready_seconds}))
+"""
+
+
+def run_probe(code, env):
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, env=env, capture_output=True,
+                            text=True, timeout=300)
+    lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(f"Probe failed:\n{result.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-import-seconds", type=float, default=None)
+    parser.add_argument("--max-first-request-seconds", type=float, default=None)
+    parser.add_argument("--ready-timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    # OpenAI is replaced by the replay backend, the first chat request measures our own start-up work
+    env = {**os.environ, "LLM_BACKEND": os.getenv("LLM_BACKEND", "replay")}
+
+    runs = [run_probe(PROBE, env) for _ in range(args.runs)]
+    ready = run_probe(READY_PROBE.replace("TIMEOUT", str(args.ready_timeout)), env)
+
+    report = {
+        key: round(statistics.median(run[key] for run in runs), 3)
+        for key in ("import_seconds", "first_request_seconds", "first_chat_seconds")
+    }
+    report["heavy_modules_after_import"] = runs[0]["heavy_modules_after_import"]
+    report["ready_seconds"] = round(ready["ready_seconds"], 3) if ready["ready_seconds"] is not None else None
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if args.max_import_seconds is not None and report["import_seconds"] > args.max_import_seconds:
+        failures.append(f"import took {report['import_seconds']}s (budget {args.max_import_seconds}s)")
+    if args.max_first_request_seconds is not None and report["first_request_seconds"] > args.max_first_request_seconds:
+        failures.append(f"first request took {report['first_request_seconds']}s "
+                        f"(budget {args.max_first_request_seconds}s)")
+    if failures:
+        print("❌ " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Lightweight per-request tracing. ServerTimingMiddleware opens a trace for every HTTP request,
+code marks its stages with `span("name")` or `@traced("name")`, and the response carries a
+Server-Timing header with the time per stage. A sample of the traces (and every slow one) is
+appended to a JSONL file (TRACE_LOG_PATH, in the temp dir by default); turn it into folded
+stacks for a flame graph with:
+
+    python3 -m api.tracing > traces.folded
+"""
+import argparse
+import contextvars
+import functools
+import itertools
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+# Share of traces written to TRACE_LOG_PATH, traces slower than TRACE_SLOW_MS are always written
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2000"))
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", os.path.join(tempfile.gettempdir(), "hyking_traces.jsonl"))
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Trace:
+    """
+    The spans of one request. Spans may be recorded from worker threads, the list is guarded by a lock.
+    """
+
+    def __init__(self, method, path):
+        self.trace_id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.spans = []
+        self.span_ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def record(self, span_id, parent_id, name, started, duration, attrs):
+        with self.lock:
+            self.spans.append({
+                "id": span_id,
+                "parent": parent_id,
+                "name": name,
+                "start_ms": round((started - self.started) * 1000, 3),
+                "duration_ms": round(duration * 1000, 3),
+                "thread": threading.current_thread().name,
+                **attrs,
+            })
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        """
+        Server-Timing header value: total time per stage name, plus the request so far.
+        """
+        totals = defaultdict(float)
+        with self.lock:
+            for span in self.spans:
+                totals[span["name"]] += span["duration_ms"]
+        entries = [f"{name};dur={duration:.1f}" for name, duration in totals.items()]
+        entries.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self, status):
+        return {
+            "trace_id": self.trace_id,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.elapsed_ms(), 3),
+            "spans": sorted(self.spans, key=lambda span: span["start_ms"]),
+        }
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time a block as a stage of the current request; does nothing outside of a traced request.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    span_id = next(trace.span_ids)
+    parent_id = _current_span.get()
+    token = _current_span.set(span_id)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.record(span_id, parent_id, name, started, time.perf_counter() - started, attrs)
+        _current_span.reset(token)
+
+
+def traced(name):
+    """
+    Decorator form of span().
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TraceWriter:
+    """
+    Appends sampled traces to a JSONL file on a background thread, off the event loop.
+    """
+
+    def __init__(self, path=TRACE_LOG_PATH, sample_rate=TRACE_SAMPLE_RATE, slow_ms=TRACE_SLOW_MS):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-writer")
+        self.written = 0
+
+    def should_write(self, trace):
+        return trace.elapsed_ms() >= self.slow_ms or random.random() < self.sample_rate
+
+    def submit(self, trace, status):
+        if self.should_write(trace):
+            self.executor.submit(self._write, trace.to_dict(status))
+
+    def _write(self, entry):
+        try:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.written += 1
+        except OSError as e:
+            print(f"⚠️ Could not write trace: {e}")
+
+
+class ServerTimingMiddleware:
+    """
+    Pure ASGI middleware, so streamed responses pass through unbuffered. The Server-Timing header
+    holds the stages finished before the response started; for streams the full trace is in the JSONL.
+    """
+
+    def __init__(self, app, writer=None, enabled=TRACING_ENABLED):
+        self.app = app
+        self.writer = writer or TraceWriter()
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope["method"], scope["path"])
+        token = _current_trace.set(trace)
+        status = None
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            self.writer.submit(trace, status)
+
+
+def folded_stacks(entries):
+    """
+    Self time per stack in microseconds, in the folded format read by flamegraph.pl and speedscope.
+    """
+    stacks = defaultdict(float)
+    for entry in entries:
+        root = f"{entry['method']} {entry['path']}"
+        spans = {span["id"]: span for span in entry["spans"]}
+        child_time = defaultdict(float)
+        for span in entry["spans"]:
+            child_time[span["parent"]] += span["duration_ms"]
+
+        def path_of(span):
+            names = []
+            while span is not None:
+                names.append(span["name"])
+                span = spans.get(span["parent"])
+            return ";".join([root] + names[::-1])
+
+        stacks[root] += max(0.0, entry["duration_ms"] - child_time[None])
+        for span in entry["spans"]:
+            stacks[path_of(span)] += max(0.0, span["duration_ms"] - child_time[span["id"]])
+    return {stack: round(ms * 1000) for stack, ms in stacks.items() if ms > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=TRACE_LOG_PATH, help="JSONL file written by TraceWriter")
+    parser.add_argument("--route", help="only traces of this path, e.g. /api/py/chat")
+    args = parser.parse_args()
+
+    with open(args.path, "r", encoding="utf-8") as file:
+        entries = [json.loads(line) for line in file if line.strip()]
+    if args.route:
+        entries = [entry for entry in entries if entry["path"] == args.route]
+    for stack, micros in sorted(folded_stacks(entries).items()):
+        print(f"{stack} {micros}")
+
+
+if __name__ == "__main__":
+    main()
@@ -194,9 +194,24 @@ export default function ChatWindow({ chatRoom: initialChatRoom, onBack }: ChatWi
   };
 
   // Handle hike card clicks
-  const handleHikeClick = (hike: HikeData) => {
+  const handleHikeClick = async (hike: HikeData) => {
     setSelectedHike(hike);
     setIsModalOpen(true);
+
+    // Chat responses only carry the card fields, the long description is loaded on demand
+    if (!hike.descriptionLong) {
+      try {
+        const response = await fetch(`/api/py/hikes?ids=${hike.id}&fields=descriptionLong`);
+        if (response.ok) {
+          const data = await response.json();
+          if (data.hikes?.[0]) {
+            setSelectedHike((current) => (current?.id === hike.id ? { ...current, ...data.hikes[0] } : current));
+          }
+        }
+      } catch (error) {
+        console.error('Error loading hike details:', error);
+      }
+    }
   };
 
   // Handle changing the group's hike
@@ -131,9 +131,24 @@ export default function HykingAIPage() {
     }
   };
 
-  const handleHikeClick = (hike: Hike) => {
+  const handleHikeClick = async (hike: Hike) => {
     setSelectedHike(hike);
     setIsModalOpen(true);
+
+    // Chat responses only carry the card fields, the long description is loaded on demand
+    if (!hike.descriptionLong) {
+      try {
+        const response = await fetch(`/api/py/hikes?ids=${hike.id}&fields=descriptionLong`);
+        if (response.ok) {
+          const data = await response.json();
+          if (data.hikes?.[0]) {
+            setSelectedHike((current) => (current?.id === hike.id ? { ...current, ...data.hikes[0] } : current));
+          }
+        }
+      } catch (error) {
+        console.error('Error loading hike details:', error);
+      }
+    }
   };
 
  const handleCreateGroup = async (hikeId: string) => {